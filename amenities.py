@@ -0,0 +1,95 @@
+"""
+Room amenities - the free-text rooms.amenities list, normalized for filtering
+
+Every distinct amenity gets a row in amenities and, for the first
+MAX_MASK_BITS of them, a bit. rooms.amenity_mask holds the bits of a
+room's amenities so a search for several amenities is one bitwise test
+per room; room_amenities lists every (room, amenity) pair, including
+amenities beyond the bitmask. Triggers in schema.sql reset amenity_mask
+to NULL whenever rooms.amenities is written, and sync_rooms() rebuilds
+those rooms, so whatever wrote the room only has to call it afterwards.
+"""
+
+import re
+
+# SQLite integers are signed 64-bit, so bit 63 is left alone
+MAX_MASK_BITS = 63
+
+_SPACES = re.compile(r'\s+')
+
+def parse(text):
+    """Distinct amenity names in text, in order, compared case-insensitively"""
+    names = {}
+    for part in (text or '').split(','):
+        name = _SPACES.sub(' ', part).strip()
+        if name and name.lower() not in names:
+            names[name.lower()] = name
+    return list(names.values())
+
+def _register(conn, names):
+    """amenity name (lower case) -> (amenity_id, bit), adding names not seen before"""
+    known = {row['name'].lower(): (row['amenity_id'], row['bit'])
+             for row in conn.execute('SELECT amenity_id, name, bit FROM amenities')}
+    next_bit = max((bit for _, bit in known.values() if bit is not None), default=-1) + 1
+    for name in names:
+        if name.lower() in known:
+            continue
+        bit = next_bit if next_bit < MAX_MASK_BITS else None
+        cursor = conn.execute('INSERT INTO amenities (name, bit) VALUES (?, ?)', (name, bit))
+        known[name.lower()] = (cursor.lastrowid, bit)
+        if bit is not None:
+            next_bit += 1
+    return known
+
+def sync_rooms(conn):
+    """Rebuild amenity_mask and room_amenities for rooms whose amenities changed.
+
+    Returns how many rooms were updated. Runs inside the caller's
+    transaction; the caller commits.
+    """
+    rooms = conn.execute('SELECT room_id, amenities FROM rooms WHERE amenity_mask IS NULL').fetchall()
+    if not rooms:
+        return 0
+    parsed = [(room['room_id'], parse(room['amenities'])) for room in rooms]
+    known = _register(conn, sorted({name for _, names in parsed for name in names}))
+
+    masks, pairs = [], []
+    for room_id, names in parsed:
+        mask = 0
+        for name in names:
+            amenity_id, bit = known[name.lower()]
+            pairs.append((room_id, amenity_id))
+            if bit is not None:
+                mask |= 1 << bit
+        masks.append((mask, room_id))
+    conn.executemany('DELETE FROM room_amenities WHERE room_id = ?', [(room_id,) for room_id, _ in parsed])
+    conn.executemany('INSERT OR IGNORE INTO room_amenities (room_id, amenity_id) VALUES (?, ?)', pairs)
+    conn.executemany('UPDATE rooms SET amenity_mask = ? WHERE room_id = ?', masks)
+    return len(parsed)
+
+def lookup(conn, names):
+    """(mask, amenity ids without a bit) for names, or None if any name is unknown"""
+    names = [name.lower() for name in names]
+    if not names:
+        return 0, []
+    rows = conn.execute(f'''
+        SELECT amenity_id, bit FROM amenities WHERE name IN ({','.join('?' * len(names))})
+    ''', names).fetchall()
+    if len(rows) < len(set(names)):
+        return None
+    mask = 0
+    unmasked = []
+    for row in rows:
+        if row['bit'] is None:
+            unmasked.append(row['amenity_id'])
+        else:
+            mask |= 1 << row['bit']
+    return mask, unmasked
+
+def names(conn):
+    """Every amenity some room has, alphabetically"""
+    return [row['name'] for row in conn.execute('''
+        SELECT name FROM amenities a
+        WHERE EXISTS (SELECT 1 FROM room_amenities ra WHERE ra.amenity_id = a.amenity_id)
+        ORDER BY name
+    ''')]
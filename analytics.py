@@ -0,0 +1,149 @@
+"""
+Revenue and occupancy analytics - occupancy rate, ADR and RevPAR
+
+Stays and their payments are loaded in bulk into NumPy columns, expanded
+into one entry per night with vectorized operations and summed into a
+room type x night grid, from which the daily, monthly and per-room-type
+figures are all derived.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+import cache
+
+# Longest report range, in nights
+ANALYTICS_MAX_DAYS = 3660
+
+# Bookings whose nights count as sold. Pending holds are not revenue,
+# cancelled bookings never happened and no-shows never used the room.
+SOLD_STATUSES = ('confirmed', 'checked_in', 'checked_out')
+
+# Both read live and archived rows through the views in schema.sql
+STAYS_SQL = f'''
+    SELECT b.booking_id, r.room_type, b.check_in_date, b.check_out_date, b.total_amount
+    FROM all_bookings b
+    JOIN rooms r ON b.room_id = r.room_id
+    WHERE b.status IN {SOLD_STATUSES}
+    AND b.check_in_date < ? AND b.check_out_date > ?
+'''
+
+PAYMENTS_SQL = f'''
+    SELECT p.booking_id, p.amount
+    FROM all_payments p
+    WHERE p.payment_status = 'completed'
+    AND p.booking_id IN (
+        SELECT b.booking_id FROM all_bookings b
+        WHERE b.status IN {SOLD_STATUSES}
+        AND b.check_in_date < ? AND b.check_out_date > ?
+    )
+'''
+
+def _columns(conn, sql, params, count):
+    """Result columns as tuples, skipping sqlite3.Row construction"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(sql, params).fetchall()
+    return list(zip(*rows)) if rows else [()] * count
+
+def _ratio(numerator, denominator):
+    numerator, denominator = np.asarray(numerator, dtype=np.float64), np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=denominator > 0)
+
+def _figures(labels, sold, available, revenue, paid):
+    """One dict per label from aligned arrays"""
+    occupancy = _ratio(sold, available)
+    adr = _ratio(revenue, sold)
+    revpar = _ratio(revenue, available)
+    return [
+        {'label': label, 'rooms_sold': int(s), 'rooms_available': int(a), 'occupancy': round(float(o), 4),
+         'revenue': round(float(r), 2), 'paid': round(float(p), 2), 'adr': round(float(d), 2),
+         'revpar': round(float(v), 2)}
+        for label, s, a, o, r, p, d, v in zip(labels, sold, available, occupancy, revenue, paid, adr, revpar)
+    ]
+
+def merge_figures(figures, label='total'):
+    """Figures from several reports (e.g. one per property) summed, with the ratios recomputed"""
+    return _figures([label], *[[sum(f[name] for f in figures)]
+                               for name in ('rooms_sold', 'rooms_available', 'revenue', 'paid')])[0]
+
+def build_report(conn, start, end):
+    """Occupancy, ADR and RevPAR for the nights start..end inclusive.
+
+    Each sold stay's total_amount (and whatever has been paid towards it)
+    is spread evenly over its nights. Rooms available per night are the
+    rooms not currently under maintenance.
+    """
+    days = (end - start).days + 1
+    window_end = (end + timedelta(days=1)).isoformat()
+    params = (window_end, start.isoformat())
+
+    inventory = dict(conn.execute('''
+        SELECT room_type, COUNT(*) FROM rooms WHERE status != 'maintenance' GROUP BY room_type
+    ''').fetchall())
+    booking_ids, types, check_ins, check_outs, amounts = _columns(conn, STAYS_SQL, params, 5)
+    paid_ids, paid_amounts = _columns(conn, PAYMENTS_SQL, params, 2)
+
+    room_types = sorted(set(inventory) | set(types))
+    type_codes = {room_type: i for i, room_type in enumerate(room_types)}
+    grid_size = len(room_types) * days
+
+    booking_ids = np.array(booking_ids, dtype=np.int64)
+    check_ins = np.array(check_ins, dtype='datetime64[D]')
+    check_outs = np.array(check_outs, dtype='datetime64[D]')
+    amounts = np.array(amounts, dtype=np.float64)
+    codes = np.array([type_codes[t] for t in types], dtype=np.int64)
+
+    # Completed payments summed per stay, dropping payments for stays not
+    # loaded (their room was deleted)
+    order = np.argsort(booking_ids)
+    paid = np.zeros(len(booking_ids))
+    if len(paid_ids) and len(booking_ids):
+        paid_ids = np.array(paid_ids, dtype=np.int64)
+        stay = order[np.searchsorted(booking_ids, paid_ids, sorter=order).clip(0, len(booking_ids) - 1)]
+        known = booking_ids[stay] == paid_ids
+        paid = np.bincount(stay[known], weights=np.array(paid_amounts, dtype=np.float64)[known],
+                           minlength=len(booking_ids))
+
+    # Every stay's nights inside the window, one entry per night
+    origin = np.datetime64(start.isoformat(), 'D')
+    length = np.maximum((check_outs - check_ins).astype(np.int64), 1)
+    first = (check_ins - origin).astype(np.int64).clip(0, days)
+    last = (check_outs - origin).astype(np.int64).clip(0, days)
+    nights = last - first
+    stay = np.repeat(np.arange(len(nights)), nights)
+    night = np.repeat(first - (np.cumsum(nights) - nights), nights) + np.arange(nights.sum())
+    cell = codes[stay] * days + night
+
+    shape = (len(room_types), days)
+    sold = np.bincount(cell, minlength=grid_size).reshape(shape)
+    revenue = np.bincount(cell, weights=(amounts / length)[stay], minlength=grid_size).reshape(shape)
+    collected = np.bincount(cell, weights=(paid / length)[stay], minlength=grid_size).reshape(shape)
+    available = np.repeat(np.array([inventory.get(t, 0) for t in room_types])[:, None], days, axis=1)
+
+    dates = origin + np.arange(days)
+    months, month_of_day = np.unique(dates.astype('datetime64[M]'), return_inverse=True)
+
+    def by_month(grid):
+        return np.bincount(month_of_day, weights=grid.sum(axis=0), minlength=len(months))
+
+    grids = (sold, available, revenue, collected)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': days,
+        'totals': _figures(['total'], *[[grid.sum()] for grid in grids])[0],
+        'by_room_type': _figures(room_types, *[grid.sum(axis=1) for grid in grids]),
+        'by_month': _figures([str(month) for month in months], *[by_month(grid) for grid in grids]),
+        'by_day': _figures([str(day) for day in dates], *[grid.sum(axis=0) for grid in grids]),
+    }
+
+def get_report(conn, start, end):
+    """build_report() through the response cache"""
+    key = ('analytics', start.isoformat(), (end + timedelta(days=1)).isoformat())
+    report = cache.responses.get(key)
+    if report is None:
+        report = build_report(conn, start, end)
+        cache.responses.set(key, report)
+    return report
@@ -1,504 +1,1004 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from datetime import datetime, date, timedelta
-import sqlite3
-import database as db
-
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-in-production'
-
-@app.route('/')
-def index():
-    """Home page - show available rooms"""
-    conn = db.get_db()
-    rooms = conn.execute('''
-        SELECT * FROM rooms 
-        WHERE status = 'available'
-        ORDER BY room_number
-    ''').fetchall()
-    conn.close()
-    return render_template('index.html', rooms=rooms)
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    """Staff login page"""
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        
-        conn = db.get_db()
-        staff = conn.execute('''
-            SELECT * FROM staff WHERE username = ?
-        ''', (username,)).fetchone()
-        conn.close()
-        
-        if staff and db.verify_password(password, staff['password_hash']):
-            session['user_id'] = staff['staff_id']
-            session['username'] = staff['username']
-            session['role'] = staff['role']
-            session['name'] = f"{staff['first_name']} {staff['last_name']}"
-            flash('Login successful!', 'success')
-            return redirect(url_for('admin_dashboard'))
-        else:
-            flash('Invalid username or password', 'error')
-    
-    return render_template('login.html')
-
-@app.route('/signup', methods=['GET', 'POST'])
-def signup():
-    """Staff sign up page"""
-    if request.method == 'POST':
-        first_name = request.form.get('first_name')
-        last_name = request.form.get('last_name')
-        email = request.form.get('email')
-        phone = request.form.get('phone')
-        role = request.form.get('role')
-        username = request.form.get('username')
-        password = request.form.get('password')
-        confirm_password = request.form.get('confirm_password')
-        
-        # Validate required fields
-        if not all([first_name, last_name, email, phone, role, username, password]):
-            flash('Please fill in all required fields', 'error')
-            return redirect(url_for('login'))
-        
-        # Validate password confirmation
-        if password != confirm_password:
-            flash('Passwords do not match', 'error')
-            return redirect(url_for('login'))
-        
-        # Validate password length
-        if len(password) < 6:
-            flash('Password must be at least 6 characters long', 'error')
-            return redirect(url_for('login'))
-        
-        password_hash = db.hash_password(password)
-        
-        conn = db.get_db()
-        try:
-            conn.execute('''
-                INSERT INTO staff (first_name, last_name, email, phone, role, username, password_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (first_name, last_name, email, phone, role, username, password_hash))
-            conn.commit()
-            conn.close()
-            flash('Account created successfully! You can now login.', 'success')
-            return redirect(url_for('login'))
-        except sqlite3.IntegrityError:
-            conn.close()
-            flash('Username or email already exists', 'error')
-            return redirect(url_for('login'))
-    
-    return redirect(url_for('login'))
-
-@app.route('/logout')
-def logout():
-    """Logout and clear session"""
-    session.clear()
-    flash('You have been logged out', 'info')
-    return redirect(url_for('index'))
-
-@app.route('/check_availability', methods=['POST'])
-def check_availability():
-    """Check room availability for given dates"""
-    check_in = request.form.get('check_in')
-    check_out = request.form.get('check_out')
-    
-    if not check_in or not check_out:
-        return jsonify({'error': 'Please provide check-in and check-out dates'}), 400
-    
-    try:
-        check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
-        check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
-        
-        if check_out_date <= check_in_date:
-            return jsonify({'error': 'Check-out date must be after check-in date'}), 400
-        
-        if check_in_date < date.today():
-            return jsonify({'error': 'Check-in date cannot be in the past'}), 400
-        
-    except ValueError:
-        return jsonify({'error': 'Invalid date format'}), 400
-    
-    conn = db.get_db()
-    available_rooms = []
-    
-    all_rooms = conn.execute('SELECT * FROM rooms WHERE status != "maintenance"').fetchall()
-    
-    for room in all_rooms:
-        if db.check_room_availability(room['room_id'], check_in, check_out):
-            total_amount = db.calculate_total_amount(room['room_id'], check_in, check_out)
-            room_dict = dict(room)
-            room_dict['total_amount'] = total_amount
-            available_rooms.append(room_dict)
-    
-    conn.close()
-    return jsonify({'rooms': available_rooms})
-
-@app.route('/book', methods=['GET', 'POST'])
-def book():
-    """Book a room"""
-    if request.method == 'POST':
-        # Get form data
-        first_name = request.form.get('first_name')
-        last_name = request.form.get('last_name')
-        email = request.form.get('email')
-        phone = request.form.get('phone')
-        room_id = request.form.get('room_id')
-        check_in = request.form.get('check_in')
-        check_out = request.form.get('check_out')
-        number_of_guests = request.form.get('number_of_guests')
-        special_requests = request.form.get('special_requests', '')
-        
-        # Validate
-        if not all([first_name, last_name, email, phone, room_id, check_in, check_out, number_of_guests]):
-            flash('Please fill in all required fields', 'error')
-            return redirect(url_for('book'))
-        
-        # Check availability
-        if not db.check_room_availability(room_id, check_in, check_out):
-            flash('Room is not available for the selected dates', 'error')
-            return redirect(url_for('book'))
-        
-        conn = db.get_db()
-        
-        # Get or create customer
-        customer = conn.execute('SELECT customer_id FROM customers WHERE email = ?', (email,)).fetchone()
-        if customer:
-            customer_id = customer['customer_id']
-            # Update customer info
-            conn.execute('''
-                UPDATE customers SET first_name = ?, last_name = ?, phone = ?
-                WHERE customer_id = ?
-            ''', (first_name, last_name, phone, customer_id))
-        else:
-            cursor = conn.execute('''
-                INSERT INTO customers (first_name, last_name, email, phone)
-                VALUES (?, ?, ?, ?)
-            ''', (first_name, last_name, email, phone))
-            customer_id = cursor.lastrowid
-        
-        # Calculate total amount
-        total_amount = db.calculate_total_amount(room_id, check_in, check_out)
-        
-        # Create booking
-        cursor = conn.execute('''
-            INSERT INTO bookings (customer_id, room_id, check_in_date, check_out_date, 
-                                number_of_guests, total_amount, special_requests, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
-        ''', (customer_id, room_id, check_in, check_out, number_of_guests, total_amount, special_requests))
-        
-        booking_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        flash(f'Booking created successfully! Booking ID: {booking_id}', 'success')
-        return redirect(url_for('payment', booking_id=booking_id))
-    
-    # GET request - show booking form
-    room_id = request.args.get('room_id')
-    check_in = request.args.get('check_in')
-    check_out = request.args.get('check_out')
-    
-    conn = db.get_db()
-    room = None
-    if room_id:
-        room = conn.execute('SELECT * FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
-    conn.close()
-    
-    return render_template('book.html', room=room, check_in=check_in, check_out=check_out)
-
-@app.route('/payment/<int:booking_id>', methods=['GET', 'POST'])
-def payment(booking_id):
-    """Payment page"""
-    conn = db.get_db()
-    booking = conn.execute('''
-        SELECT b.*, r.room_number, r.room_type, c.first_name, c.last_name, c.email
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.room_id
-        JOIN customers c ON b.customer_id = c.customer_id
-        WHERE b.booking_id = ?
-    ''', (booking_id,)).fetchone()
-    conn.close()
-    
-    if not booking:
-        flash('Booking not found', 'error')
-        return redirect(url_for('index'))
-    
-    if request.method == 'POST':
-        payment_method = request.form.get('payment_method')
-        
-        if not payment_method:
-            flash('Please select a payment method', 'error')
-            return redirect(url_for('payment', booking_id=booking_id))
-        
-        conn = db.get_db()
-        
-        # Create payment record
-        conn.execute('''
-            INSERT INTO payments (booking_id, amount, payment_method, payment_status, transaction_id)
-            VALUES (?, ?, ?, 'completed', ?)
-        ''', (booking_id, booking['total_amount'], payment_method, f'TXN{booking_id}{datetime.now().strftime("%Y%m%d%H%M%S")}'))
-        
-        # Update booking status
-        conn.execute('''
-            UPDATE bookings SET status = 'confirmed' WHERE booking_id = ?
-        ''', (booking_id,))
-        
-        conn.commit()
-        conn.close()
-        
-        flash('Payment successful! Your booking is confirmed.', 'success')
-        return redirect(url_for('booking_confirmation', booking_id=booking_id))
-    
-    return render_template('payment.html', booking=booking)
-
-@app.route('/booking_confirmation/<int:booking_id>')
-def booking_confirmation(booking_id):
-    """Booking confirmation page"""
-    conn = db.get_db()
-    booking = conn.execute('''
-        SELECT b.*, r.room_number, r.room_type, c.*, p.payment_method, p.transaction_id
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.room_id
-        JOIN customers c ON b.customer_id = c.customer_id
-        LEFT JOIN payments p ON b.booking_id = p.booking_id
-        WHERE b.booking_id = ?
-    ''', (booking_id,)).fetchone()
-    conn.close()
-    
-    if not booking:
-        flash('Booking not found', 'error')
-        return redirect(url_for('index'))
-    
-    return render_template('confirmation.html', booking=booking)
-
-@app.route('/admin')
-@db.login_required
-def admin_dashboard():
-    """Admin dashboard"""
-    if session.get('role') != 'admin':
-        flash('Access denied. Admin privileges required.', 'error')
-        return redirect(url_for('index'))
-    
-    conn = db.get_db()
-    
-    # Statistics
-    total_rooms = conn.execute('SELECT COUNT(*) as count FROM rooms').fetchone()['count']
-    available_rooms = conn.execute("SELECT COUNT(*) as count FROM rooms WHERE status = 'available'").fetchone()['count']
-    total_bookings = conn.execute('SELECT COUNT(*) as count FROM bookings').fetchone()['count']
-    pending_bookings = conn.execute("SELECT COUNT(*) as count FROM bookings WHERE status = 'pending'").fetchone()['count']
-    total_revenue = conn.execute("SELECT COALESCE(SUM(amount), 0) as total FROM payments WHERE payment_status = 'completed'").fetchone()['total']
-    
-    # Recent bookings
-    recent_bookings = conn.execute('''
-        SELECT b.*, r.room_number, r.room_type, c.first_name, c.last_name, c.email
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.room_id
-        JOIN customers c ON b.customer_id = c.customer_id
-        ORDER BY b.created_at DESC
-        LIMIT 10
-    ''').fetchall()
-    
-    conn.close()
-    
-    return render_template('admin/dashboard.html', 
-                         total_rooms=total_rooms,
-                         available_rooms=available_rooms,
-                         total_bookings=total_bookings,
-                         pending_bookings=pending_bookings,
-                         total_revenue=total_revenue,
-                         recent_bookings=recent_bookings)
-
-@app.route('/admin/rooms')
-@db.admin_required
-def admin_rooms():
-    """Manage rooms"""
-    conn = db.get_db()
-    rooms = conn.execute('SELECT * FROM rooms ORDER BY room_number').fetchall()
-    conn.close()
-    return render_template('admin/rooms.html', rooms=rooms)
-
-@app.route('/admin/rooms/add', methods=['GET', 'POST'])
-@db.admin_required
-def add_room():
-    """Add new room"""
-    if request.method == 'POST':
-        room_number = request.form.get('room_number')
-        room_type = request.form.get('room_type')
-        price_per_night = request.form.get('price_per_night')
-        capacity = request.form.get('capacity')
-        amenities = request.form.get('amenities', '')
-        status = request.form.get('status', 'available')
-        
-        conn = db.get_db()
-        try:
-            conn.execute('''
-                INSERT INTO rooms (room_number, room_type, price_per_night, capacity, amenities, status)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (room_number, room_type, price_per_night, capacity, amenities, status))
-            conn.commit()
-            flash('Room added successfully!', 'success')
-        except sqlite3.IntegrityError:
-            flash('Room number already exists', 'error')
-        conn.close()
-        return redirect(url_for('admin_rooms'))
-    
-    return render_template('admin/add_room.html')
-
-@app.route('/admin/rooms/edit/<int:room_id>', methods=['GET', 'POST'])
-@db.admin_required
-def edit_room(room_id):
-    """Edit room"""
-    conn = db.get_db()
-    
-    if request.method == 'POST':
-        room_number = request.form.get('room_number')
-        room_type = request.form.get('room_type')
-        price_per_night = request.form.get('price_per_night')
-        capacity = request.form.get('capacity')
-        amenities = request.form.get('amenities', '')
-        status = request.form.get('status')
-        
-        conn.execute('''
-            UPDATE rooms SET room_number = ?, room_type = ?, price_per_night = ?, 
-                           capacity = ?, amenities = ?, status = ?
-            WHERE room_id = ?
-        ''', (room_number, room_type, price_per_night, capacity, amenities, status, room_id))
-        conn.commit()
-        conn.close()
-        flash('Room updated successfully!', 'success')
-        return redirect(url_for('admin_rooms'))
-    
-    room = conn.execute('SELECT * FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
-    conn.close()
-    
-    if not room:
-        flash('Room not found', 'error')
-        return redirect(url_for('admin_rooms'))
-    
-    return render_template('admin/edit_room.html', room=room)
-
-@app.route('/admin/rooms/delete/<int:room_id>')
-@db.admin_required
-def delete_room(room_id):
-    """Delete room"""
-    conn = db.get_db()
-    conn.execute('DELETE FROM rooms WHERE room_id = ?', (room_id,))
-    conn.commit()
-    conn.close()
-    flash('Room deleted successfully!', 'success')
-    return redirect(url_for('admin_rooms'))
-
-@app.route('/admin/bookings')
-@db.admin_required
-def admin_bookings():
-    """Manage bookings"""
-    conn = db.get_db()
-    bookings = conn.execute('''
-        SELECT b.*, r.room_number, r.room_type, c.first_name, c.last_name, c.email, c.phone
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.room_id
-        JOIN customers c ON b.customer_id = c.customer_id
-        ORDER BY b.created_at DESC
-    ''').fetchall()
-    conn.close()
-    return render_template('admin/bookings.html', bookings=bookings)
-
-@app.route('/admin/bookings/update_status/<int:booking_id>', methods=['POST'])
-@db.admin_required
-def update_booking_status(booking_id):
-    """Update booking status"""
-    new_status = request.form.get('status')
-    
-    conn = db.get_db()
-    conn.execute('UPDATE bookings SET status = ? WHERE booking_id = ?', (new_status, booking_id))
-    
-    # If checking in, update room status
-    if new_status == 'checked_in':
-        booking = conn.execute('SELECT room_id FROM bookings WHERE booking_id = ?', (booking_id,)).fetchone()
-        if booking:
-            conn.execute('UPDATE rooms SET status = "occupied" WHERE room_id = ?', (booking['room_id'],))
-    
-    # If checking out, update room status and create payment if needed
-    if new_status == 'checked_out':
-        booking = conn.execute('SELECT room_id FROM bookings WHERE booking_id = ?', (booking_id,)).fetchone()
-        if booking:
-            conn.execute('UPDATE rooms SET status = "available" WHERE room_id = ?', (booking['room_id'],))
-        
-        # Check if payment exists
-        payment = conn.execute('SELECT payment_id FROM payments WHERE booking_id = ?', (booking_id,)).fetchone()
-        if not payment:
-            booking_info = conn.execute('SELECT total_amount FROM bookings WHERE booking_id = ?', (booking_id,)).fetchone()
-            conn.execute('''
-                INSERT INTO payments (booking_id, amount, payment_method, payment_status, transaction_id)
-                VALUES (?, ?, 'cash', 'completed', ?)
-            ''', (booking_id, booking_info['total_amount'], f'TXN{booking_id}{datetime.now().strftime("%Y%m%d%H%M%S")}'))
-    
-    conn.commit()
-    conn.close()
-    flash('Booking status updated successfully!', 'success')
-    return redirect(url_for('admin_bookings'))
-
-@app.route('/admin/staff')
-@db.admin_required
-def admin_staff():
-    """Manage staff"""
-    conn = db.get_db()
-    staff_members = conn.execute('SELECT * FROM staff ORDER BY role, last_name').fetchall()
-    conn.close()
-    return render_template('admin/staff.html', staff=staff_members)
-
-@app.route('/admin/staff/add', methods=['GET', 'POST'])
-@db.admin_required
-def add_staff():
-    """Add new staff member"""
-    if request.method == 'POST':
-        first_name = request.form.get('first_name')
-        last_name = request.form.get('last_name')
-        email = request.form.get('email')
-        phone = request.form.get('phone')
-        role = request.form.get('role')
-        username = request.form.get('username')
-        password = request.form.get('password')
-        
-        password_hash = db.hash_password(password)
-        
-        conn = db.get_db()
-        try:
-            conn.execute('''
-                INSERT INTO staff (first_name, last_name, email, phone, role, username, password_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (first_name, last_name, email, phone, role, username, password_hash))
-            conn.commit()
-            flash('Staff member added successfully!', 'success')
-        except sqlite3.IntegrityError:
-            flash('Username or email already exists', 'error')
-        conn.close()
-        return redirect(url_for('admin_staff'))
-    
-    return render_template('admin/add_staff.html')
-
-@app.route('/admin/staff/delete/<int:staff_id>')
-@db.admin_required
-def delete_staff(staff_id):
-    """Delete staff member"""
-    if staff_id == session.get('user_id'):
-        flash('You cannot delete your own account', 'error')
-        return redirect(url_for('admin_staff'))
-    
-    conn = db.get_db()
-    conn.execute('DELETE FROM staff WHERE staff_id = ?', (staff_id,))
-    conn.commit()
-    conn.close()
-    flash('Staff member deleted successfully!', 'success')
-    return redirect(url_for('admin_staff'))
-
-if __name__ == '__main__':
-    # Initialize database on first run
-    import os
-    if not os.path.exists('hotel_booking.db'):
-        db.init_db()
-        print("Database initialized!")
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
-
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, abort, g
+from datetime import datetime, date, timedelta
+import os
+import sqlite3
+import time
+import database as db
+import availability
+import analytics
+import pricing
+import amenities as room_amenities
+import search
+import assets
+import occupancy
+import stats
+import cache
+import bulk_io
+import night_audit
+import archive
+import properties
+import shards
+import feed
+import throttle
+import metrics
+
+# /healthz reports the database as degraded above this round trip, in ms
+HEALTH_MAX_DB_MS = 250
+
+app = Flask(__name__)
+app.secret_key = 'your-secret-key-change-in-production'
+app.teardown_appcontext(db.close_db)
+app.before_request(metrics.start_request)
+app.after_request(metrics.finish_request)
+assets.init_app(app)
+
+# Set once warm_up() has run in this process
+warmed_up = False
+
+@app.before_request
+def select_property():
+    """Route the request to a property's database: ?property=, else the session's, else the main one"""
+    requested = request.args.get('property')
+    prop = properties.get_property(requested or session.get('property_id', properties.DEFAULT_PROPERTY))
+    if prop is None:
+        if requested:
+            abort(404)
+        # The session's property is no longer registered
+        prop = properties.get_property(properties.DEFAULT_PROPERTY)
+    if requested and session.get('property_id') != prop['property_id']:
+        session['property_id'] = prop['property_id']
+    g.property = prop
+    g.database = prop['database']
+
+@app.context_processor
+def inject_properties():
+    return {'current_property': g.get('property'), 'all_properties': properties.all_properties()}
+
+@app.route('/')
+def index():
+    """Home page - show available rooms"""
+    page = cache.responses.get(('index',))
+    if page is None:
+        conn = db.get_db()
+        rooms = [dict(room) for room in conn.execute('''
+            SELECT * FROM rooms 
+            WHERE status = 'available'
+            ORDER BY room_number
+        ''')]
+        # Choices for the search filters
+        room_types = [row['room_type'] for row in conn.execute('SELECT DISTINCT room_type FROM rooms ORDER BY room_type')]
+        page = {'rooms': rooms, 'room_types': room_types, 'amenities': room_amenities.names(conn)}
+        conn.close()
+        cache.responses.set(('index',), page)
+    # Live updates come from the feed server (feed.py), not from this app's threads
+    return render_template('index.html', feed_url=feed.stream_url(request.host, g.property['property_id']), **page)
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    """Staff login page"""
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        conn = db.get_staff_db()
+        staff = conn.execute('''
+            SELECT * FROM staff WHERE username = ?
+        ''', (username,)).fetchone()
+        conn.close()
+        
+        if staff and db.verify_password(password, staff['password_hash']):
+            session['user_id'] = staff['staff_id']
+            session['username'] = staff['username']
+            session['role'] = staff['role']
+            session['name'] = f"{staff['first_name']} {staff['last_name']}"
+            flash('Login successful!', 'success')
+            return redirect(url_for('admin_dashboard'))
+        else:
+            flash('Invalid username or password', 'error')
+    
+    return render_template('login.html')
+
+@app.route('/signup', methods=['GET', 'POST'])
+def signup():
+    """Staff sign up page"""
+    if request.method == 'POST':
+        first_name = request.form.get('first_name')
+        last_name = request.form.get('last_name')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        role = request.form.get('role')
+        username = request.form.get('username')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        
+        # Validate required fields
+        if not all([first_name, last_name, email, phone, role, username, password]):
+            flash('Please fill in all required fields', 'error')
+            return redirect(url_for('login'))
+        
+        # Validate password confirmation
+        if password != confirm_password:
+            flash('Passwords do not match', 'error')
+            return redirect(url_for('login'))
+        
+        # Validate password length
+        if len(password) < 6:
+            flash('Password must be at least 6 characters long', 'error')
+            return redirect(url_for('login'))
+        
+        password_hash = db.hash_password(password)
+        
+        conn = db.get_staff_db()
+        try:
+            conn.execute('''
+                INSERT INTO staff (first_name, last_name, email, phone, role, username, password_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (first_name, last_name, email, phone, role, username, password_hash))
+            conn.commit()
+            conn.close()
+            flash('Account created successfully! You can now login.', 'success')
+            return redirect(url_for('login'))
+        except sqlite3.IntegrityError:
+            conn.close()
+            flash('Username or email already exists', 'error')
+            return redirect(url_for('login'))
+    
+    return redirect(url_for('login'))
+
+@app.route('/logout')
+def logout():
+    """Logout and clear session"""
+    session.clear()
+    flash('You have been logged out', 'info')
+    return redirect(url_for('index'))
+
+@app.route('/check_availability', methods=['POST'])
+def check_availability():
+    """Check room availability for given dates"""
+    check_in = request.form.get('check_in')
+    check_out = request.form.get('check_out')
+    
+    if not check_in or not check_out:
+        return jsonify({'error': 'Please provide check-in and check-out dates'}), 400
+    
+    try:
+        check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
+        check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
+        
+        if check_out_date <= check_in_date:
+            return jsonify({'error': 'Check-out date must be after check-in date'}), 400
+        
+        if check_in_date < date.today():
+            return jsonify({'error': 'Check-in date cannot be in the past'}), 400
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    try:
+        filters = availability.parse_filters(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Normalize so equivalent searches share a cache entry
+    check_in, check_out = check_in_date.isoformat(), check_out_date.isoformat()
+    key = ('search', check_in, check_out, availability.filter_key(filters))
+    available_rooms = cache.responses.get(key)
+    if available_rooms is None:
+        # Identical searches of the same property arriving together wait for one computation
+        available_rooms = throttle.searches.do(
+            (g.database,) + key, lambda: _search_available_rooms(key, check_in, check_out, filters))
+    return jsonify({'rooms': available_rooms})
+
+def _search_available_rooms(key, check_in, check_out, filters):
+    with throttle.search_limiter.slot():
+        conn = db.get_db()
+        available_rooms = availability.search_available_rooms(conn, check_in, check_out, filters)
+        conn.close()
+    cache.responses.set(key, available_rooms)
+    return available_rooms
+
+@app.errorhandler(throttle.Overloaded)
+def overloaded(e):
+    """Shed requests get a fast 503 the client can retry"""
+    headers = {'Retry-After': str(throttle.RETRY_AFTER)}
+    message = 'We are receiving a lot of requests right now. Please try again in a moment.'
+    if request.endpoint == 'check_availability':
+        return jsonify({'error': message}), 503, headers
+    return Response(message, status=503, headers=headers, mimetype='text/plain')
+
+@app.route('/availability_calendar')
+def availability_calendar():
+    """Room x night availability matrix with nightly prices"""
+    start = request.args.get('start') or date.today().isoformat()
+    days = request.args.get('days', 30, type=int)
+    
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    if not days or days < 1 or days > availability.CALENDAR_MAX_DAYS:
+        return jsonify({'error': f'Days must be between 1 and {availability.CALENDAR_MAX_DAYS}'}), 400
+    
+    key = ('calendar', start_date.isoformat(), (start_date + timedelta(days=days)).isoformat())
+    calendar = cache.responses.get(key)
+    if calendar is None:
+        conn = db.get_db()
+        calendar = availability.availability_calendar(conn, start_date, days)
+        conn.close()
+        cache.responses.set(key, calendar)
+    return jsonify(calendar)
+
+@app.route('/book', methods=['GET', 'POST'])
+def book():
+    """Book a room"""
+    if request.method == 'POST':
+        # Get form data
+        first_name = request.form.get('first_name')
+        last_name = request.form.get('last_name')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        room_id = request.form.get('room_id')
+        check_in = request.form.get('check_in')
+        check_out = request.form.get('check_out')
+        number_of_guests = request.form.get('number_of_guests')
+        special_requests = request.form.get('special_requests', '')
+        
+        # Validate
+        if not all([first_name, last_name, email, phone, room_id, check_in, check_out, number_of_guests]):
+            flash('Please fill in all required fields', 'error')
+            return redirect(url_for('book'))
+        
+        try:
+            check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
+            check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
+        except ValueError:
+            flash('Invalid date format', 'error')
+            return redirect(url_for('book'))
+        
+        if check_out_date <= check_in_date:
+            flash('Check-out date must be after check-in date', 'error')
+            return redirect(url_for('book'))
+        
+        # Check availability
+        if not db.check_room_availability(room_id, check_in, check_out):
+            flash('Room is not available for the selected dates', 'error')
+            return redirect(url_for('book'))
+        
+        customer = {'first_name': first_name, 'last_name': last_name, 'email': email, 'phone': phone}
+        
+        with throttle.booking_limiter.slot():
+            conn = db.get_db()
+            try:
+                booking_id = db.create_booking(conn, customer, room_id, check_in, check_out,
+                                               number_of_guests, special_requests)
+            except sqlite3.OperationalError:
+                conn.close()
+                flash('We are receiving a lot of bookings right now. Please try again.', 'error')
+                return redirect(url_for('book'))
+            occupancy.index.follow(conn)
+            conn.close()
+        
+        # Another booking won the room after our availability check
+        if booking_id is None:
+            flash('Room is not available for the selected dates', 'error')
+            return redirect(url_for('book'))
+        
+        cache.invalidate_stay(check_in, check_out)
+        
+        flash(f'Booking created successfully! Booking ID: {booking_id}', 'success')
+        return redirect(url_for('payment', booking_id=booking_id))
+    
+    # GET request - show booking form
+    room_id = request.args.get('room_id')
+    check_in = request.args.get('check_in')
+    check_out = request.args.get('check_out')
+    
+    conn = db.get_db()
+    room = None
+    if room_id:
+        room = conn.execute('SELECT * FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
+    conn.close()
+    
+    return render_template('book.html', room=room, check_in=check_in, check_out=check_out)
+
+@app.route('/payment/<int:booking_id>', methods=['GET', 'POST'])
+def payment(booking_id):
+    """Payment page"""
+    conn = db.get_db()
+    booking = conn.execute('''
+        SELECT b.*, r.room_number, r.room_type, c.first_name, c.last_name, c.email
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.room_id
+        JOIN customers c ON b.customer_id = c.customer_id
+        WHERE b.booking_id = ?
+    ''', (booking_id,)).fetchone()
+    conn.close()
+    
+    if not booking:
+        flash('Booking not found', 'error')
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        payment_method = request.form.get('payment_method')
+        
+        if not payment_method:
+            flash('Please select a payment method', 'error')
+            return redirect(url_for('payment', booking_id=booking_id))
+        
+        conn = db.get_db()
+        
+        # Update booking status, unless the night audit already released the hold
+        updated = conn.execute('''
+            UPDATE bookings SET status = 'confirmed' WHERE booking_id = ? AND status != 'cancelled'
+        ''', (booking_id,)).rowcount
+        if not updated:
+            conn.rollback()
+            conn.close()
+            flash('This booking has expired. Please book the room again.', 'error')
+            return redirect(url_for('index'))
+        
+        # Create payment record
+        conn.execute('''
+            INSERT INTO payments (booking_id, amount, payment_method, payment_status, transaction_id)
+            VALUES (?, ?, ?, 'completed', ?)
+        ''', (booking_id, booking['total_amount'], payment_method, f'TXN{booking_id}{datetime.now().strftime("%Y%m%d%H%M%S")}'))
+        feed.stays_changed(conn, [(booking_id, booking['room_id'], booking['check_in_date'],
+                                   booking['check_out_date'])])
+        
+        conn.commit()
+        occupancy.index.follow(conn)
+        conn.close()
+        cache.invalidate_stay(booking['check_in_date'], booking['check_out_date'])
+        
+        flash('Payment successful! Your booking is confirmed.', 'success')
+        return redirect(url_for('booking_confirmation', booking_id=booking_id))
+    
+    return render_template('payment.html', booking=booking)
+
+@app.route('/booking_confirmation/<int:booking_id>')
+def booking_confirmation(booking_id):
+    """Booking confirmation page"""
+    conn = db.get_db()
+    # Old bookings may have been moved to the archive
+    for bookings, payments in archive.TABLES:
+        booking = conn.execute(f'''
+            SELECT b.*, r.room_number, r.room_type, c.*, p.payment_method, p.transaction_id
+            FROM {bookings} b
+            JOIN rooms r ON b.room_id = r.room_id
+            JOIN customers c ON b.customer_id = c.customer_id
+            LEFT JOIN {payments} p ON b.booking_id = p.booking_id
+            WHERE b.booking_id = ?
+        ''', (booking_id,)).fetchone()
+        if booking:
+            break
+    conn.close()
+    
+    if not booking:
+        flash('Booking not found', 'error')
+        return redirect(url_for('index'))
+    
+    return render_template('confirmation.html', booking=booking)
+
+@app.route('/admin')
+@db.login_required
+def admin_dashboard():
+    """Admin dashboard"""
+    if session.get('role') != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('index'))
+    
+    conn = db.get_db()
+    
+    # Statistics
+    counters = stats.get_counters(conn)
+    
+    # Recent bookings
+    recent_bookings = conn.execute('''
+        SELECT b.*, r.room_number, r.room_type, c.first_name, c.last_name, c.email
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.room_id
+        JOIN customers c ON b.customer_id = c.customer_id
+        ORDER BY b.created_at DESC
+        LIMIT 10
+    ''').fetchall()
+    
+    conn.close()
+    
+    return render_template('admin/dashboard.html', 
+                         total_rooms=counters['total_rooms'],
+                         available_rooms=counters['available_rooms'],
+                         total_bookings=counters['total_bookings'],
+                         pending_bookings=counters['pending_bookings'],
+                         total_revenue=counters['total_revenue'],
+                         recent_bookings=recent_bookings)
+
+def _report_range():
+    """(start, end, error) from the start/end query parameters, last 30 days by default"""
+    today = date.today()
+    try:
+        start = datetime.strptime(request.args.get('start') or (today - timedelta(days=30)).isoformat(), '%Y-%m-%d').date()
+        end = datetime.strptime(request.args.get('end') or today.isoformat(), '%Y-%m-%d').date()
+    except ValueError:
+        return None, None, 'Invalid date format'
+    if end < start:
+        return None, None, 'End date must not be before start date'
+    if (end - start).days >= analytics.ANALYTICS_MAX_DAYS:
+        return None, None, f'Reports cover at most {analytics.ANALYTICS_MAX_DAYS} days'
+    return start, end, None
+
+@app.route('/admin/reports')
+@db.admin_required
+def admin_reports():
+    """Occupancy, ADR and RevPAR reports"""
+    start, end, error = _report_range()
+    if error:
+        flash(error, 'error')
+        return redirect(url_for('admin_reports'))
+    
+    conn = db.get_db()
+    report = analytics.get_report(conn, start, end)
+    conn.close()
+    return render_template('admin/reports.html', report=report)
+
+@app.route('/admin/api/reports')
+@db.admin_required
+def admin_reports_api():
+    """The same reports as JSON"""
+    start, end, error = _report_range()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    conn = db.get_db()
+    report = analytics.get_report(conn, start, end)
+    conn.close()
+    return jsonify(report)
+
+@app.route('/admin/rooms')
+@db.admin_required
+def admin_rooms():
+    """Manage rooms"""
+    conn = db.get_db()
+    rooms = conn.execute('SELECT * FROM rooms ORDER BY room_number').fetchall()
+    conn.close()
+    return render_template('admin/rooms.html', rooms=rooms)
+
+@app.route('/admin/rooms/add', methods=['GET', 'POST'])
+@db.admin_required
+def add_room():
+    """Add new room"""
+    if request.method == 'POST':
+        room_number = request.form.get('room_number')
+        room_type = request.form.get('room_type')
+        price_per_night = request.form.get('price_per_night')
+        capacity = request.form.get('capacity')
+        amenities = request.form.get('amenities', '')
+        status = request.form.get('status', 'available')
+        
+        conn = db.get_db()
+        try:
+            cursor = conn.execute('''
+                INSERT INTO rooms (room_number, room_type, price_per_night, capacity, amenities, status)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (room_number, room_type, price_per_night, capacity, amenities, status))
+            room_amenities.sync_rooms(conn)
+            feed.rooms_changed(conn, [(cursor.lastrowid, status)])
+            conn.commit()
+            occupancy.index.follow(conn)
+            cache.invalidate_rooms()
+            flash('Room added successfully!', 'success')
+        except sqlite3.IntegrityError:
+            flash('Room number already exists', 'error')
+        conn.close()
+        return redirect(url_for('admin_rooms'))
+    
+    return render_template('admin/add_room.html')
+
+@app.route('/admin/rooms/edit/<int:room_id>', methods=['GET', 'POST'])
+@db.admin_required
+def edit_room(room_id):
+    """Edit room"""
+    conn = db.get_db()
+    
+    if request.method == 'POST':
+        room_number = request.form.get('room_number')
+        room_type = request.form.get('room_type')
+        price_per_night = request.form.get('price_per_night')
+        capacity = request.form.get('capacity')
+        amenities = request.form.get('amenities', '')
+        status = request.form.get('status')
+        
+        conn.execute('''
+            UPDATE rooms SET room_number = ?, room_type = ?, price_per_night = ?, 
+                           capacity = ?, amenities = ?, status = ?
+            WHERE room_id = ?
+        ''', (room_number, room_type, price_per_night, capacity, amenities, status, room_id))
+        room_amenities.sync_rooms(conn)
+        feed.rooms_changed(conn, [(room_id, status)])
+        conn.commit()
+        occupancy.index.follow(conn)
+        conn.close()
+        cache.invalidate_rooms()
+        flash('Room updated successfully!', 'success')
+        return redirect(url_for('admin_rooms'))
+    
+    room = conn.execute('SELECT * FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
+    conn.close()
+    
+    if not room:
+        flash('Room not found', 'error')
+        return redirect(url_for('admin_rooms'))
+    
+    return render_template('admin/edit_room.html', room=room)
+
+@app.route('/admin/rooms/delete/<int:room_id>')
+@db.admin_required
+def delete_room(room_id):
+    """Delete room"""
+    conn = db.get_db()
+    conn.execute('DELETE FROM rooms WHERE room_id = ?', (room_id,))
+    conn.execute('DELETE FROM room_rates WHERE room_id = ?', (room_id,))
+    feed.rooms_changed(conn, [(room_id, None)])
+    conn.commit()
+    occupancy.index.follow(conn)
+    conn.close()
+    cache.invalidate_rooms()
+    flash('Room deleted successfully!', 'success')
+    return redirect(url_for('admin_rooms'))
+
+@app.route('/admin/bookings')
+@db.admin_required
+def admin_bookings():
+    """Manage bookings"""
+    filters = {
+        'status': request.args.get('status', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', ''),
+        'room_number': request.args.get('room_number', '').strip(),
+        'email': request.args.get('email', '').strip(),
+    }
+    page_size = min(request.args.get('per_page', db.BOOKINGS_PAGE_SIZE, type=int) or db.BOOKINGS_PAGE_SIZE,
+                    db.BOOKINGS_MAX_PAGE_SIZE)
+    
+    conn = db.get_db()
+    bookings, next_cursor = db.list_bookings(conn, filters, request.args.get('cursor'), page_size)
+    conn.close()
+    active_filters = {key: value for key, value in filters.items() if value}
+    return render_template('admin/bookings.html', bookings=bookings, filters=filters,
+                           active_filters=active_filters, next_cursor=next_cursor,
+                           is_first_page=not request.args.get('cursor'),
+                           statuses=db.BOOKING_STATUSES, transitions=db.BOOKING_TRANSITIONS)
+
+def _search_every_property(query, limit):
+    """search_bookings() on every property at once, best matches first.
+
+    Returns (bookings, ids of the properties that could not be searched).
+    Each booking carries property_id and property_name.
+    """
+    results = properties.fan_out(lambda conn: [dict(booking) for booking in search.search_bookings(conn, query, limit)])
+    bookings = [dict(booking, property_id=prop['property_id'], property_name=prop['name'])
+                for prop, found, error in results for booking in found or []]
+    bookings.sort(key=lambda booking: booking['score'])
+    return bookings[:limit], [prop['property_id'] for prop, found, error in results if error]
+
+@app.route('/admin/search')
+@db.login_required
+def admin_search():
+    """Front desk search over guests and bookings, of this property or all of them"""
+    query = request.args.get('q', '').strip()
+    every_property = request.args.get('scope') == 'all'
+    bookings = []
+    if query and every_property:
+        bookings, failed = _search_every_property(query, search.SEARCH_LIMIT)
+        if failed:
+            flash(f"Could not search {', '.join(failed)}", 'error')
+    elif query:
+        conn = db.get_db()
+        bookings = search.search_bookings(conn, query)
+        conn.close()
+    return render_template('admin/search.html', query=query, bookings=bookings, every_property=every_property)
+
+@app.route('/admin/api/search')
+@db.login_required
+def admin_search_api():
+    """The same search as JSON; scope=all searches every property"""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', search.SEARCH_LIMIT, type=int) or search.SEARCH_LIMIT, search.SEARCH_LIMIT)
+    if request.args.get('scope') == 'all':
+        bookings, failed = _search_every_property(query, limit)
+        return jsonify({'bookings': bookings, 'failed_properties': failed})
+    conn = db.get_db()
+    bookings = search.search_bookings(conn, query, limit)
+    conn.close()
+    return jsonify({'bookings': [dict(booking) for booking in bookings]})
+
+@app.route('/admin/bookings/update_status/<int:booking_id>', methods=['POST'])
+@db.admin_required
+def update_booking_status(booking_id):
+    """Update booking status"""
+    new_status = request.form.get('status')
+    if new_status not in db.BOOKING_STATUSES:
+        flash('Invalid booking status', 'error')
+        return redirect(url_for('admin_bookings'))
+    
+    conn = db.get_db()
+    results, changed, room_statuses = db.transition_bookings(conn, [booking_id], new_status)
+    occupancy.index.follow(conn)
+    conn.close()
+    
+    _publish_transitions(changed, room_statuses)
+    outcome = results[0]['outcome']
+    if outcome == 'not_found':
+        flash('Booking not found', 'error')
+    elif outcome == 'not_allowed':
+        previous = results[0]['previous_status'].replace('_', ' ')
+        flash(f"A {previous} booking cannot be changed to {new_status.replace('_', ' ')}", 'error')
+    elif outcome == 'conflict':
+        flash('Room is no longer available for these dates', 'error')
+    else:
+        flash('Booking status updated successfully!', 'success')
+    return redirect(url_for('admin_bookings'))
+
+@app.route('/admin/api/bookings/status', methods=['POST'])
+@db.admin_required
+def bulk_update_booking_status():
+    """Check in, check out or cancel a group of bookings at once.
+
+    Takes {"booking_ids": [...], "status": "checked_in"} and returns each
+    booking's outcome.
+    """
+    payload = request.get_json(silent=True) or {}
+    new_status = payload.get('status')
+    booking_ids = payload.get('booking_ids')
+    if new_status not in db.BOOKING_STATUSES:
+        return jsonify({'error': f"status must be one of {', '.join(db.BOOKING_STATUSES)}"}), 400
+    if (not isinstance(booking_ids, list) or not booking_ids
+            or not all(isinstance(booking_id, int) for booking_id in booking_ids)):
+        return jsonify({'error': 'booking_ids must be a non-empty list of booking ids'}), 400
+    if len(booking_ids) > db.BULK_STATUS_MAX_BOOKINGS:
+        return jsonify({'error': f'At most {db.BULK_STATUS_MAX_BOOKINGS} bookings per request'}), 400
+    
+    conn = db.get_db()
+    results, changed, room_statuses = db.transition_bookings(conn, booking_ids, new_status)
+    occupancy.index.follow(conn)
+    conn.close()
+    
+    _publish_transitions(changed, room_statuses)
+    return jsonify({'status': new_status, 'updated': len(changed), 'results': results})
+
+def _publish_transitions(changed, room_statuses):
+    """Bring the response cache up to date after a status change"""
+    for booking in changed:
+        cache.invalidate_stay(booking['check_in_date'], booking['check_out_date'],
+                              room_status_changed=bool(room_statuses))
+
+@app.route('/admin/export/<dataset>.<fmt>')
+@db.admin_required
+def export_data(dataset, fmt):
+    """Stream bookings or payments as CSV or JSON"""
+    if dataset not in bulk_io.EXPORT_QUERIES or fmt not in ('csv', 'json'):
+        abort(404)
+    
+    stream = bulk_io.stream_csv if fmt == 'csv' else bulk_io.stream_json
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/json'
+    # The body is generated after the request has ended, so name the property's database now
+    return Response(stream(dataset, request.args.get('from', ''), request.args.get('to', ''), g.database),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={dataset}.{fmt}'})
+
+def _uploaded_rows(key):
+    """(rows, error) from a JSON body, a text/csv body or a CSV upload named file"""
+    upload = request.files.get('file')
+    try:
+        if upload:
+            rows = bulk_io.read_rows(upload.read().decode('utf-8-sig'), True, key)
+        else:
+            rows = bulk_io.read_rows(request.get_data(as_text=True), request.mimetype == 'text/csv', key)
+    except (ValueError, UnicodeDecodeError) as e:
+        return None, f'Invalid payload: {e}'
+    if not rows:
+        return None, f'No {key} given'
+    return rows, None
+
+@app.route('/admin/api/rooms/bulk', methods=['POST'])
+@db.admin_required
+def bulk_rooms():
+    """Create, update, reprice or change the status of many rooms at once.
+
+    Takes a JSON list (or {"rooms": [...]}), a text/csv body, or a CSV file
+    upload named "file". Nothing is changed unless every row is valid.
+    """
+    rows, error = _uploaded_rows('rooms')
+    if error:
+        return jsonify({'error': error}), 400
+    
+    conn = db.get_db()
+    applied, results = bulk_io.apply_room_changes(conn, rows)
+    occupancy.index.follow(conn)
+    conn.close()
+    
+    if not applied:
+        return jsonify({'applied': False, 'results': results}), 400
+    cache.invalidate_rooms()
+    created = sum(1 for result in results if result['action'] == 'create')
+    return jsonify({'applied': True, 'created': created, 'updated': len(results) - created, 'results': results})
+
+@app.route('/admin/rates')
+@db.admin_required
+def admin_rates():
+    """Manage rate plans"""
+    conn = db.get_db()
+    plans = conn.execute('SELECT * FROM rate_plans ORDER BY start_date, priority DESC').fetchall()
+    room_types = [row['room_type'] for row in conn.execute('SELECT DISTINCT room_type FROM rooms ORDER BY room_type')]
+    conn.close()
+    return render_template('admin/rates.html', plans=plans, room_types=room_types)
+
+@app.route('/admin/rates/add', methods=['POST'])
+@db.admin_required
+def add_rate_plan():
+    """Add a seasonal rate plan"""
+    name = request.form.get('name', '').strip()
+    room_type = request.form.get('room_type') or None
+    start_date = request.form.get('start_date')
+    end_date = request.form.get('end_date')
+    price_per_night = request.form.get('price_per_night')
+    priority = request.form.get('priority', 0, type=int)
+    
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        price = float(price_per_night)
+    except (TypeError, ValueError):
+        flash('Please provide valid dates and a price', 'error')
+        return redirect(url_for('admin_rates'))
+    if not name or end <= start or price < 0:
+        flash('Please provide a name, an end date after the start date and a price', 'error')
+        return redirect(url_for('admin_rates'))
+    
+    conn = db.get_db()
+    conn.execute('''
+        INSERT INTO rate_plans (name, room_type, start_date, end_date, price_per_night, priority)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (name, room_type, start.isoformat(), end.isoformat(), price, priority))
+    feed.rates_changed(conn, start, end)
+    conn.commit()
+    conn.close()
+    pricing.plans.invalidate()
+    cache.invalidate_stay(start, end)
+    flash('Rate plan added successfully!', 'success')
+    return redirect(url_for('admin_rates'))
+
+@app.route('/admin/rates/delete/<int:plan_id>')
+@db.admin_required
+def delete_rate_plan(plan_id):
+    """Delete a rate plan"""
+    conn = db.get_db()
+    plan = conn.execute('SELECT start_date, end_date FROM rate_plans WHERE plan_id = ?', (plan_id,)).fetchone()
+    conn.execute('DELETE FROM rate_plans WHERE plan_id = ?', (plan_id,))
+    if plan:
+        feed.rates_changed(conn, plan['start_date'], plan['end_date'])
+    conn.commit()
+    conn.close()
+    if plan:
+        pricing.plans.invalidate()
+        cache.invalidate_stay(plan['start_date'], plan['end_date'])
+    flash('Rate plan deleted successfully!', 'success')
+    return redirect(url_for('admin_rates'))
+
+@app.route('/admin/api/room_rates', methods=['POST'])
+@db.admin_required
+def set_room_rates():
+    """Set or clear per-night prices for individual rooms, all or nothing"""
+    rows, error = _uploaded_rows('rates')
+    if error:
+        return jsonify({'error': error}), 400
+    
+    conn = db.get_db()
+    applied, results, window = bulk_io.apply_room_rates(conn, rows)
+    conn.close()
+    
+    if not applied:
+        return jsonify({'applied': False, 'results': results}), 400
+    cache.invalidate_stay(*window)
+    return jsonify({'applied': True, 'results': results})
+
+def _property_overview(days=30):
+    """Dashboard counters and the last days' report totals for every property, and for the chain.
+
+    The properties are read in parallel; one that fails is listed with its
+    error and left out of the chain figures.
+    """
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    results = properties.fan_out(lambda conn: {'counters': stats.get_counters(conn),
+                                               'totals': analytics.get_report(conn, start, end)['totals']})
+    rows = [dict(result or {}, property=prop, error=error) for prop, result, error in results]
+    answered = [row for row in rows if not row['error']]
+    chain = {
+        'counters': {name: sum(row['counters'][name] for row in answered) for name in stats.COUNTER_QUERIES},
+        'totals': analytics.merge_figures([row['totals'] for row in answered]),
+    }
+    return {'start': start.isoformat(), 'end': end.isoformat(), 'properties': rows, 'chain': chain}
+
+@app.route('/admin/properties')
+@db.admin_required
+def admin_properties():
+    """Every property side by side"""
+    return render_template('admin/properties.html', overview=_property_overview())
+
+@app.route('/admin/api/properties')
+@db.admin_required
+def admin_properties_api():
+    """The same overview as JSON"""
+    return jsonify(_property_overview())
+
+@app.route('/admin/properties/add', methods=['POST'])
+@db.admin_required
+def add_property():
+    """Register a property and create its database"""
+    try:
+        prop = properties.registry.register(request.form.get('property_id'), request.form.get('name'))
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('admin_properties'))
+    flash(f"Property {prop['name']} added. Switch to it to add its rooms.", 'success')
+    return redirect(url_for('admin_properties'))
+
+@app.route('/admin/api/stats')
+@db.admin_required
+def admin_stats():
+    """Internal counters as JSON"""
+    return jsonify({'property': g.property['property_id'], 'bookings': db.booking_stats(),
+                    'cache': cache.responses.stats(), 'throttle': throttle.stats(), 'feed': feed.stats()})
+
+@app.route('/healthz')
+def healthz():
+    """Readiness check: 200 once this process is warmed up and the database answers quickly"""
+    started = time.perf_counter()
+    try:
+        conn = db.get_db()
+        conn.execute('SELECT COUNT(*) FROM stats').fetchone()
+        conn.close()
+    except sqlite3.Error as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    database_ms = (time.perf_counter() - started) * 1000
+    
+    status = 'ok'
+    if not warmed_up:
+        status = 'starting'
+    elif database_ms > HEALTH_MAX_DB_MS:
+        status = 'degraded'
+    return jsonify({'status': status, 'database_ms': round(database_ms, 2), 'pid': os.getpid()}), \
+        200 if status == 'ok' else 503
+
+@app.route('/metrics')
+@db.admin_required
+def metrics_endpoint():
+    """Request, SQL, booking and cache metrics in Prometheus text format"""
+    body = metrics.render({
+        'hotel_booking_pipeline': db.booking_stats(),
+        'hotel_response_cache': cache.responses.stats(),
+        'hotel_search_coalescing': throttle.searches.stats(),
+        'hotel_search_admission': throttle.search_limiter.stats(),
+        'hotel_booking_admission': throttle.booking_limiter.stats(),
+        'hotel_availability_feed': feed.stats(),
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/staff')
+@db.admin_required
+def admin_staff():
+    """Manage staff"""
+    conn = db.get_staff_db()
+    staff_members = conn.execute('SELECT * FROM staff ORDER BY role, last_name').fetchall()
+    conn.close()
+    return render_template('admin/staff.html', staff=staff_members)
+
+@app.route('/admin/staff/add', methods=['GET', 'POST'])
+@db.admin_required
+def add_staff():
+    """Add new staff member"""
+    if request.method == 'POST':
+        first_name = request.form.get('first_name')
+        last_name = request.form.get('last_name')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        role = request.form.get('role')
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        password_hash = db.hash_password(password)
+        
+        conn = db.get_staff_db()
+        try:
+            conn.execute('''
+                INSERT INTO staff (first_name, last_name, email, phone, role, username, password_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (first_name, last_name, email, phone, role, username, password_hash))
+            conn.commit()
+            flash('Staff member added successfully!', 'success')
+        except sqlite3.IntegrityError:
+            flash('Username or email already exists', 'error')
+        conn.close()
+        return redirect(url_for('admin_staff'))
+    
+    return render_template('admin/add_staff.html')
+
+@app.route('/admin/staff/delete/<int:staff_id>')
+@db.admin_required
+def delete_staff(staff_id):
+    """Delete staff member"""
+    if staff_id == session.get('user_id'):
+        flash('You cannot delete your own account', 'error')
+        return redirect(url_for('admin_staff'))
+    
+    conn = db.get_staff_db()
+    conn.execute('DELETE FROM staff WHERE staff_id = ?', (staff_id,))
+    conn.commit()
+    conn.close()
+    flash('Staff member deleted successfully!', 'success')
+    return redirect(url_for('admin_staff'))
+
+def prepare_database():
+    """Create the database, or bring an existing one up to date with schema.sql.
+
+    Run once before serving, by app.py's __main__ or the gunicorn master.
+    Every registered property's database gets the same schema changes.
+    """
+    if not os.path.exists(db.DATABASE):
+        db.init_db()
+        print("Database initialized!")
+    else:
+        db.apply_schema()
+    for database in properties.databases()[1:]:
+        db.apply_schema(db.connect(database))
+    
+    # Check the dashboard counters before serving
+    for database in properties.databases():
+        conn = db.connect(database)
+        stats.reconcile(conn)
+        conn.close()
+
+def warm_up(connections=db.POOL_SIZE):
+    """Prime this process, for every property, before it takes traffic.
+
+    Opens a pool's worth of connections (which also pulls the hot pages
+    into SQLite's cache), builds the occupancy index, loads the rate plans
+    and renders the home page and tonight's availability search once, so
+    templates are compiled and both are cached.
+    """
+    global warmed_up
+    client = app.test_client()
+    for prop in properties.all_properties():
+        database = prop['database']
+        conns = [db.pool.acquire(database) for _ in range(connections)]
+        for conn in conns:
+            conn.execute('SELECT COUNT(*) FROM stats').fetchone()
+            db.pool.release(conn, database)
+        
+        with shards.using(database):
+            occupancy.index.refresh_if_stale(lambda: db.connect(database))
+            conn = db.connect()
+            pricing.plans.get(conn)
+            conn.close()
+        
+        client.get('/', query_string={'property': prop['property_id']})
+        client.post('/check_availability', query_string={'property': prop['property_id']},
+                    data={'check_in': date.today().isoformat(),
+                          'check_out': (date.today() + timedelta(days=1)).isoformat()})
+    warmed_up = True
+
+def start_background_jobs():
+    """Reconcile dashboard counters, run the night audit and archive old bookings periodically"""
+    stats.start_reconciler()
+    night_audit.start_worker()
+    archive.start_worker()
+
+if __name__ == '__main__':
+    # Development server; see gunicorn.conf.py for production
+    prepare_database()
+    warm_up()
+    start_background_jobs()
+    feed.start()
+    
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,130 @@
+"""
+Booking archive - moves closed bookings and their payments out of the live tables
+
+Bookings that were checked out, cancelled or no-shows more than
+ARCHIVE_AFTER_DAYS ago are copied, with their payments, into
+bookings_archive and payments_archive and deleted from bookings and
+payments, one short write transaction per ARCHIVE_CHUNK_SIZE bookings. Availability checks, the
+admin lists and the dashboard then only work through current business.
+Reports and exports read the all_bookings and all_payments views, and
+confirmation pages fall back to the archive, so archived rows are still
+found. Dashboard totals keep counting archived rows (see the triggers in
+schema.sql); archived bookings leave the front desk search.
+
+Run directly to archive once:
+    python archive.py
+    python archive.py --dry-run
+"""
+
+import argparse
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+import database as db
+import properties
+
+logger = logging.getLogger(__name__)
+
+# Closed bookings are archived once they checked out this many days ago
+ARCHIVE_AFTER_DAYS = 365
+
+# Bookings moved per write transaction, and the pause between transactions
+ARCHIVE_CHUNK_SIZE = 200
+ARCHIVE_CHUNK_PAUSE = 0.05
+
+# How often the background worker runs, in seconds
+ARCHIVE_INTERVAL = 86400
+
+# (bookings table, payments table), live first
+TABLES = (('bookings', 'payments'), ('bookings_archive', 'payments_archive'))
+
+BOOKING_COLUMNS = ('booking_id, customer_id, room_id, check_in_date, check_out_date, number_of_guests, '
+                   'total_amount, status, special_requests, created_at')
+PAYMENT_COLUMNS = 'payment_id, booking_id, amount, payment_method, payment_status, transaction_id, payment_date'
+
+# Bookings that no longer hold a room (occupancy.RELEASED_STATUSES)
+ARCHIVABLE = '''
+    status IN ('cancelled', 'checked_out', 'no_show') AND check_out_date < :cutoff
+'''
+
+def _archive_chunk(conn, params):
+    """Move one chunk of bookings; returns (bookings moved, payments moved)"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        ids = [row[0] for row in conn.execute(f'''
+            SELECT booking_id FROM bookings WHERE {ARCHIVABLE} LIMIT :limit
+        ''', params)]
+        if not ids:
+            conn.rollback()
+            return 0, 0
+        placeholders = ','.join('?' * len(ids))
+        payments = conn.execute(f'''
+            INSERT INTO payments_archive ({PAYMENT_COLUMNS})
+            SELECT {PAYMENT_COLUMNS} FROM payments WHERE booking_id IN ({placeholders})
+        ''', ids).rowcount
+        conn.execute(f'''
+            INSERT INTO bookings_archive ({BOOKING_COLUMNS})
+            SELECT {BOOKING_COLUMNS} FROM bookings WHERE booking_id IN ({placeholders})
+        ''', ids)
+        conn.execute(f'DELETE FROM payments WHERE booking_id IN ({placeholders})', ids)
+        conn.execute(f'DELETE FROM bookings WHERE booking_id IN ({placeholders})', ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(ids), payments
+
+def run_archive(conn, today=None, after_days=ARCHIVE_AFTER_DAYS, chunk_size=ARCHIVE_CHUNK_SIZE,
+                pause=ARCHIVE_CHUNK_PAUSE, dry_run=False):
+    """Archive every closed booking old enough; returns {'bookings': n, 'payments': n}"""
+    params = {'cutoff': ((today or date.today()) - timedelta(days=after_days)).isoformat(), 'limit': chunk_size}
+    if dry_run:
+        bookings = conn.execute(f'SELECT COUNT(*) FROM bookings WHERE {ARCHIVABLE}', params).fetchone()[0]
+        payments = conn.execute(f'''
+            SELECT COUNT(*) FROM payments WHERE booking_id IN (SELECT booking_id FROM bookings WHERE {ARCHIVABLE})
+        ''', params).fetchone()[0]
+        return {'bookings': bookings, 'payments': payments}
+
+    moved = {'bookings': 0, 'payments': 0}
+    while True:
+        bookings, payments = _archive_chunk(conn, params)
+        moved['bookings'] += bookings
+        moved['payments'] += payments
+        if bookings < chunk_size:
+            break
+        time.sleep(pause)
+    if moved['bookings']:
+        logger.info('archived %d bookings and %d payments', moved['bookings'], moved['payments'])
+    return moved
+
+def start_worker(interval=ARCHIVE_INTERVAL):
+    """Archive every interval seconds on a daemon thread"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            properties.for_each(run_archive, 'booking archive')
+
+    threading.Thread(target=run, name='booking-archive', daemon=True).start()
+    return stop
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old closed bookings and their payments to the archive')
+    parser.add_argument('--database', default=db.DATABASE)
+    parser.add_argument('--date', type=date.fromisoformat, help='archive as of this date (default today)')
+    parser.add_argument('--after-days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help='archive bookings that checked out more than this many days ago')
+    parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='only count the rows that would move')
+    args = parser.parse_args()
+
+    conn = db.connect(args.database)
+    moved = run_archive(conn, args.date, args.after_days, args.chunk_size, dry_run=args.dry_run)
+    conn.close()
+    verb = 'would move' if args.dry_run else 'moved'
+    print(f"  {moved['bookings']} bookings and {moved['payments']} payments {verb} to the archive")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Static asset pipeline - fingerprinted file names, gzip precompression and
+long-lived caching
+
+At startup every file under static/ is hashed and, if worth it, gzipped in
+memory. url_for('static', filename='css/style.css') then produces
+/static/css/style.<hash>.css, which is served from memory with an ETag and
+an immutable Cache-Control header: a changed file gets a new name, so
+browsers never need to revalidate the old one.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import request, send_from_directory
+
+# Fingerprinted assets never change, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Plain (unfingerprinted) names can change under the same URL
+PLAIN_MAX_AGE = 300
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+GZIP_MIN_SIZE = 512
+HASH_LENGTH = 12
+
+class Asset:
+    """One static file, in memory"""
+
+    def __init__(self, path, filename):
+        with open(path, 'rb') as f:
+            self.body = f.read()
+        self.digest = hashlib.sha256(self.body).hexdigest()[:HASH_LENGTH]
+        root, ext = os.path.splitext(filename)
+        self.fingerprinted = f'{root}.{self.digest}{ext}'
+        self.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        self.gzipped = None
+        if len(self.body) >= GZIP_MIN_SIZE and self.mimetype.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if len(compressed) < len(self.body):
+                self.gzipped = compressed
+
+class Manifest:
+    """Maps static file names to their fingerprinted names and back"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.by_name = {}
+        self.by_fingerprint = {}
+        self._mtimes = None
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        mtimes = {}
+        for directory, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(directory, name)
+                filename = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                mtimes[filename] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def build(self):
+        """Hash and compress every file; returns how many there are"""
+        with self._lock:
+            mtimes = self._scan()
+            by_name = {filename: Asset(os.path.join(self.folder, filename), filename) for filename in mtimes}
+            self.by_name = by_name
+            self.by_fingerprint = {asset.fingerprinted: asset for asset in by_name.values()}
+            self._mtimes = mtimes
+            return len(by_name)
+
+    def refresh_if_changed(self):
+        """Rebuild when a file was added, removed or edited (used in debug mode)"""
+        if self._scan() != self._mtimes:
+            self.build()
+
+def init_app(app):
+    """Fingerprint app's static files and serve them through the manifest"""
+    manifest = Manifest(app.static_folder)
+    manifest.build()
+    app.extensions['assets'] = manifest
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint != 'static' or 'filename' not in values:
+            return
+        if app.debug:
+            manifest.refresh_if_changed()
+        asset = manifest.by_name.get(values['filename'])
+        if asset is not None:
+            values['filename'] = asset.fingerprinted
+
+    def static(filename):
+        asset = manifest.by_fingerprint.get(filename)
+        if asset is None:
+            # Plain names still work, with ordinary revalidation
+            return send_from_directory(app.static_folder, filename, max_age=PLAIN_MAX_AGE)
+
+        etag = asset.digest
+        use_gzip = asset.gzipped is not None and request.accept_encodings.quality('gzip') > 0
+        if use_gzip:
+            etag += '-gz'
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(asset.gzipped if use_gzip else asset.body, mimetype=asset.mimetype)
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        if asset.gzipped is not None:
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    app.view_functions['static'] = static
+    return manifest
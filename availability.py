@@ -0,0 +1,218 @@
+"""
+Availability engine - answers date-range searches for all rooms at once
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import amenities
+import pricing
+
+# Longest calendar a single request may ask for
+CALENDAR_MAX_DAYS = 365
+
+# Result orders for searches; the price orders use each room's average
+# nightly rate for the stay
+SEARCH_SORTS = {
+    'room_number': 'r.room_number',
+    'capacity': 'r.capacity, r.room_number',
+    'price': 'r.room_number',
+    'price_desc': 'r.room_number',
+}
+SEARCH_MAX_LIMIT = 500
+
+# A search with no filters, in the order filter_key() lists them
+NO_FILTERS = {'guests': None, 'room_type': None, 'min_price': None, 'max_price': None,
+              'amenities': (), 'sort': 'room_number', 'limit': None}
+
+# A booking blocks a room until it is cancelled, checked out or a no-show.
+# Two stays overlap when each one starts before the other one ends.
+# {filters} adds conditions on the room itself, ahead of the booking check.
+AVAILABLE_ROOMS_SQL = '''
+    SELECT r.*
+    FROM rooms r
+    WHERE r.status != 'maintenance'{filters}
+    AND NOT EXISTS (
+        SELECT 1 FROM bookings b
+        WHERE b.room_id = r.room_id
+        AND b.status NOT IN ('cancelled', 'checked_out', 'no_show')
+        AND b.check_in_date < ?
+        AND b.check_out_date > ?
+    )
+    ORDER BY {order}{limit}
+'''
+
+def count_nights(check_in, check_out):
+    """Number of nights between two YYYY-MM-DD dates"""
+    check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
+    check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
+    return (check_out_date - check_in_date).days
+
+def _number(args, name, kind, minimum):
+    value = args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        value = kind(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name.replace("_", " ")}')
+    if value < minimum:
+        raise ValueError(f'{name.replace("_", " ").capitalize()} must be at least {minimum}')
+    return value
+
+def parse_filters(args):
+    """Search filters from request form or query args.
+
+    amenities may be repeated or comma-separated. Raises ValueError with a
+    message for the client.
+    """
+    names = []
+    for value in args.getlist('amenities'):
+        names += amenities.parse(value)
+    filters = {
+        'guests': _number(args, 'guests', int, 1),
+        'room_type': args.get('room_type', '').strip() or None,
+        'min_price': _number(args, 'min_price', float, 0),
+        'max_price': _number(args, 'max_price', float, 0),
+        'amenities': tuple(sorted({name.lower() for name in names})),
+        'sort': args.get('sort') or 'room_number',
+        'limit': _number(args, 'limit', int, 1),
+    }
+    if filters['sort'] not in SEARCH_SORTS:
+        raise ValueError(f"Sort must be one of {', '.join(SEARCH_SORTS)}")
+    if filters['limit'] is not None and filters['limit'] > SEARCH_MAX_LIMIT:
+        raise ValueError(f'Limit must be at most {SEARCH_MAX_LIMIT}')
+    if None not in (filters['min_price'], filters['max_price']) and filters['min_price'] > filters['max_price']:
+        raise ValueError('Minimum price must not be above maximum price')
+    return filters
+
+def filter_key(filters):
+    """Hashable form of filters, for cache keys"""
+    return tuple(filters[name] for name in NO_FILTERS)
+
+def search_available_rooms(conn, check_in, check_out, filters=None):
+    """Return every bookable room for the stay that matches filters, priced together in one batch.
+
+    Guest count, room type and amenities are tested in the room query
+    (amenities as one bitwise test on amenity_mask). Price filters and
+    price orders need the priced stay, so they are applied after pricing,
+    and only without them is the limit pushed into the query.
+    """
+    filters = filters or NO_FILTERS
+    conditions, params = [], []
+    if filters['guests']:
+        conditions.append('r.capacity >= ?')
+        params.append(filters['guests'])
+    if filters['room_type']:
+        conditions.append('r.room_type = ?')
+        params.append(filters['room_type'])
+    if filters['amenities']:
+        wanted = amenities.lookup(conn, filters['amenities'])
+        if wanted is None:
+            return []
+        mask, unmasked = wanted
+        if mask:
+            conditions.append('r.amenity_mask & ? = ?')
+            params += [mask, mask]
+        for amenity_id in unmasked:
+            conditions.append('EXISTS (SELECT 1 FROM room_amenities ra WHERE ra.room_id = r.room_id AND ra.amenity_id = ?)')
+            params.append(amenity_id)
+
+    by_price = (filters['min_price'] is not None or filters['max_price'] is not None
+                or filters['sort'] in ('price', 'price_desc'))
+    sql_limit = filters['limit'] if filters['limit'] and not by_price else None
+    sql = AVAILABLE_ROOMS_SQL.format(filters=''.join(f'\n    AND {condition}' for condition in conditions),
+                                     order=SEARCH_SORTS[filters['sort']],
+                                     limit='\n    LIMIT ?' if sql_limit else '')
+    params += [check_out, check_in] + ([sql_limit] if sql_limit else [])
+
+    nights = count_nights(check_in, check_out)
+    rows = conn.execute(sql, params).fetchall()
+    prices = pricing.nightly_prices(conn, rows, check_in, nights)
+    totals = prices.sum(axis=1)
+    rates = totals / nights
+
+    order = np.arange(len(rows))
+    if by_price:
+        keep = np.ones(len(rows), dtype=bool)
+        if filters['min_price'] is not None:
+            keep &= rates >= filters['min_price']
+        if filters['max_price'] is not None:
+            keep &= rates <= filters['max_price']
+        order = order[keep]
+        if filters['sort'] == 'price':
+            order = order[np.argsort(rates[order], kind='stable')]
+        elif filters['sort'] == 'price_desc':
+            order = order[np.argsort(-rates[order], kind='stable')]
+        order = order[:filters['limit']]
+
+    available_rooms = []
+    for i in order:
+        room_dict = dict(rows[i])
+        room_dict['total_amount'] = float(totals[i])
+        room_dict['average_rate'] = float(rates[i])
+        available_rooms.append(room_dict)
+    return available_rooms
+
+def availability_calendar(conn, start, days):
+    """Room x night availability and prices for days nights from start.
+
+    Active bookings overlapping the window are read in one query. Each stay
+    becomes a +1 at its first night and a -1 after its last night in a
+    per-room difference array; a cumulative sum along the nights then
+    gives how many bookings hold each room on each night.
+    """
+    end = start + timedelta(days=days)
+    rooms = conn.execute('''
+        SELECT room_id, room_number, room_type, price_per_night, capacity, status
+        FROM rooms ORDER BY room_number
+    ''').fetchall()
+    bookings = conn.execute('''
+        SELECT room_id, check_in_date, check_out_date FROM bookings
+        WHERE status NOT IN ('cancelled', 'checked_out', 'no_show')
+        AND check_in_date < ? AND check_out_date > ?
+    ''', (end.isoformat(), start.isoformat())).fetchall()
+
+    room_ids = np.array([room['room_id'] for room in rooms], dtype=np.int64)
+    occupied = np.zeros((len(rooms), days), dtype=bool)
+
+    if bookings and len(rooms):
+        booked_rooms = np.array([b['room_id'] for b in bookings], dtype=np.int64)
+        check_ins = np.array([b['check_in_date'] for b in bookings], dtype='datetime64[D]')
+        check_outs = np.array([b['check_out_date'] for b in bookings], dtype='datetime64[D]')
+
+        # Map room ids to matrix rows, dropping bookings for deleted rooms
+        order = np.argsort(room_ids)
+        pos = np.searchsorted(room_ids, booked_rooms, sorter=order).clip(0, len(rooms) - 1)
+        rows = order[pos]
+        known = room_ids[rows] == booked_rooms
+
+        origin = np.datetime64(start.isoformat(), 'D')
+        first = ((check_ins - origin).astype(np.int64)).clip(0, days)[known]
+        last = ((check_outs - origin).astype(np.int64)).clip(0, days)[known]
+        rows = rows[known]
+
+        diff = np.zeros((len(rooms), days + 1), dtype=np.int32)
+        np.add.at(diff, (rows, first), 1)
+        np.add.at(diff, (rows, last), -1)
+        occupied = np.cumsum(diff[:, :days], axis=1) > 0
+
+    statuses = np.array([room['status'] for room in rooms], dtype=object)
+    occupied[statuses == 'maintenance'] = True
+
+    prices = pricing.nightly_prices(conn, rooms, start, days)
+
+    calendar_rooms = []
+    for i, room in enumerate(rooms):
+        room_dict = dict(room)
+        room_dict['available'] = (~occupied[i]).tolist()
+        room_dict['prices'] = prices[i].tolist()
+        calendar_rooms.append(room_dict)
+
+    return {
+        'start': start.isoformat(),
+        'days': days,
+        'dates': [(start + timedelta(days=n)).isoformat() for n in range(days)],
+        'rooms': calendar_rooms,
+    }
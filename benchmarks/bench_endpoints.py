@@ -0,0 +1,203 @@
+"""
+Endpoint benchmarks - drive the main routes through Flask's test client
+
+Bulk-loads a synthetic database (or reuses one given with --database) and
+reports p50/p95/p99 latency, throughput and SQL statements per request for
+each endpoint. Run from the project root:
+    python benchmarks/bench_endpoints.py --rooms 5000 --customers 200000 --bookings 1000000
+    python benchmarks/bench_endpoints.py --database big.db --save-baseline
+    python benchmarks/bench_endpoints.py --database big.db --check
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # schema.sql and templates are looked up relative to here
+
+import database as db
+import init_sample_data
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+_statements = threading.local()
+
+def _count_statement(sql):
+    # Statements run by triggers are reported as "-- TRIGGER ..." comments
+    if not sql.startswith('--'):
+        _statements.count = getattr(_statements, 'count', 0) + 1
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def prepare_database(args):
+    """Path of the database to benchmark, generating one if needed"""
+    if args.database and os.path.exists(args.database):
+        return args.database
+    path = args.database or os.path.join(tempfile.mkdtemp(), 'bench.db')
+    db.DATABASE = path
+    db.init_db()
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA synchronous = OFF')
+    started = time.perf_counter()
+    counts = init_sample_data.generate_data(conn, args.rooms, args.customers, args.bookings, args.seed)
+    conn.close()
+    print(f"Generated {counts['bookings']} bookings for {counts['rooms']} rooms and "
+          f"{counts['customers']} customers in {time.perf_counter() - started:.1f}s")
+    return path
+
+def build_scenarios(app, rng):
+    """Name -> callable issuing one request, in the order they are run"""
+    conn = db.connect()
+    room_ids = [row['room_id'] for row in conn.execute("SELECT room_id FROM rooms WHERE status != 'maintenance'")]
+    conn.close()
+
+    public = app.test_client()
+    admin = app.test_client()
+    admin.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    today = date.today()
+    pending = []
+
+    def stay(earliest, latest):
+        check_in = today + timedelta(days=rng.randint(earliest, latest))
+        return check_in.isoformat(), (check_in + timedelta(days=rng.randint(1, 7))).isoformat()
+
+    def index():
+        return public.get('/')
+
+    def check_availability():
+        check_in, check_out = stay(1, 180)
+        return public.post('/check_availability', data={'check_in': check_in, 'check_out': check_out})
+
+    def book():
+        # Past the generated booking horizon so most attempts find the room free
+        check_in, check_out = stay(init_sample_data.FUTURE_DAYS + 10, init_sample_data.FUTURE_DAYS + 700)
+        response = public.post('/book', data={
+            'first_name': 'Bench', 'last_name': 'Mark', 'email': f'bench{rng.randrange(10 ** 9)}@example.com',
+            'phone': '5550000000', 'room_id': rng.choice(room_ids), 'check_in': check_in,
+            'check_out': check_out, 'number_of_guests': 1,
+        })
+        if '/payment/' in response.headers.get('Location', ''):
+            pending.append(response.headers['Location'].rsplit('/', 1)[1])
+        return response
+
+    def payment():
+        booking_id = pending.pop() if pending else 1
+        return public.post(f'/payment/{booking_id}', data={'payment_method': 'credit_card'})
+
+    def admin_dashboard():
+        return admin.get('/admin')
+
+    def admin_bookings():
+        if rng.random() < 0.5:
+            return admin.get('/admin/bookings')
+        return admin.get('/admin/bookings?status=' + rng.choice(['pending', 'confirmed', 'checked_in']))
+
+    return [
+        ('index', index),
+        ('check_availability', check_availability),
+        ('book', book),
+        ('payment', payment),
+        ('admin_dashboard', admin_dashboard),
+        ('admin_bookings', admin_bookings),
+    ]
+
+def run(scenarios, requests, warmup):
+    """Time each scenario; returns {name: metrics}"""
+    results = {}
+    for name, issue in scenarios:
+        for _ in range(warmup):
+            issue()
+        latencies = []
+        statements = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            _statements.count = 0
+            t0 = time.perf_counter()
+            response = issue()
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statements += _statements.count
+            if response.status_code >= 500:
+                raise RuntimeError(f'{name} returned {response.status_code}')
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        results[name] = {
+            'p50_ms': round(_percentile(latencies, 0.50), 3),
+            'p95_ms': round(_percentile(latencies, 0.95), 3),
+            'p99_ms': round(_percentile(latencies, 0.99), 3),
+            'throughput_rps': round(requests / elapsed, 1),
+            'queries_per_request': round(statements / requests, 2),
+        }
+    return results
+
+def report(results, baseline, tolerance):
+    """Print the results table; returns the endpoints whose p95 regressed"""
+    regressions = []
+    print(f"\n{'endpoint':<20} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8}  vs baseline p95")
+    for name, metrics in results.items():
+        line = (f"{name:<20} {metrics['p50_ms']:>9.2f} {metrics['p95_ms']:>9.2f} {metrics['p99_ms']:>9.2f} "
+                f"{metrics['throughput_rps']:>9.1f} {metrics['queries_per_request']:>8.2f}")
+        base = baseline.get(name)
+        if base:
+            change = (metrics['p95_ms'] - base['p95_ms']) / base['p95_ms'] if base['p95_ms'] else 0
+            line += f"  {change:+.0%}"
+            if change > tolerance or metrics['queries_per_request'] > base['queries_per_request']:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the main endpoints at production-sized volumes')
+    parser.add_argument('--database', help='existing database to use, or where to generate one')
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--customers', type=int, default=200000)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='exit non-zero if p95 or query count regressed')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown before flagging')
+    args = parser.parse_args()
+
+    db.DATABASE = prepare_database(args)
+    db.apply_schema()
+    db.on_connect.append(lambda conn: conn.set_trace_callback(_count_statement))
+
+    import app as app_module
+    import cache
+    if args.no_cache:
+        cache.responses.max_entries = 0
+
+    rng = random.Random(args.seed)
+    results = run(build_scenarios(app_module.app, rng), args.requests, args.warmup)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = report(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+    if args.check and regressions:
+        print(f"\nRegressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
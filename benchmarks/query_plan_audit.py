@@ -0,0 +1,240 @@
+"""
+Query-plan audit - flags full table scans and temp B-tree sorts
+
+Drives every route against a generated database (the live availability
+stream's query is run directly rather than holding a stream open), then
+the background jobs: night audit, archive, occupancy rebuild and stats
+reconcile. Captures each distinct SQL statement the app runs and reports
+its EXPLAIN QUERY PLAN. Exits non-zero when a statement that is not on the
+ALLOWED list scans a table or sorts through a temporary B-tree, so a query
+that regresses to a scan fails the check. Run from the project root:
+    python benchmarks/query_plan_audit.py
+    python benchmarks/query_plan_audit.py --database bench.db --verbose
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bench_endpoints  # also puts the project root on sys.path
+from bench_endpoints import db
+
+# Statements that are allowed to scan or sort, matched by regex against the
+# normalized SQL, with the reason they are acceptable
+ALLOWED = {
+    r'^SELECT room_id, status FROM rooms$':
+        'occupancy index build reads every room once',
+    r'^SELECT booking_id, room_id, check_in_date, check_out_date FROM bookings WHERE status NOT IN':
+        'occupancy index build reads every active booking once',
+    r'^SELECT COUNT\(\*\) FROM \w+$|^SELECT \(SELECT COUNT\(\*\) FROM bookings\) \+':
+        'stats reconciliation recounts the real tables on purpose',
+    r'^SELECT COALESCE\(SUM\(amount\), \?\) FROM all_payments':
+        'stats reconciliation re-adds live and archived revenue on purpose',
+    r'FROM rooms( r)? ORDER BY (r\.)?room_number$':
+        'admin room list and calendar cover every room, in index order',
+    r'^SELECT \* FROM staff ORDER BY role, last_name':
+        'staff list; staff is small',
+    r'^SELECT r\.\* FROM rooms r WHERE r\.status != \? AND NOT EXISTS':
+        'availability search looks at every bookable room by design',
+    r'^SELECT name FROM amenities a WHERE EXISTS':
+        'search form lists every amenity in use; amenities is small',
+    r'^SELECT amenity_id, name, bit FROM amenities$':
+        'room writes load the amenity vocabulary once; amenities is small',
+    r'^SELECT room_id, amenities FROM rooms WHERE amenity_mask IS NULL$':
+        'the partial index idx_rooms_amenities_pending holds only rooms whose amenities changed',
+    r'^SELECT room_type, COUNT\(\*\) FROM rooms WHERE status != \? GROUP BY room_type':
+        'report inventory counts rooms per type once per report; rooms is small',
+    r'FROM rate_plans ORDER BY priority, plan_id$':
+        'the pricing engine loads every rate plan into its in-memory cache',
+    r'^SELECT \* FROM rate_plans ORDER BY start_date|^SELECT DISTINCT room_type FROM rooms':
+        'rate plans page lists every plan and room type; both tables are small',
+    r'bm25\(booking_search':
+        'search ranks only the full-text matches by bm25 score',
+    r'^SELECT k, v FROM \?\.\?$':
+        'FTS5 reads its one-row config table',
+    r'^SELECT name(, value)? FROM stats':
+        'stats holds one row per counter',
+}
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r'\s+')
+_AUDITED = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+def normalize(sql):
+    """Statement text with literals replaced by ?, used to group executions"""
+    return _LITERALS.sub('?', _WHITESPACE.sub(' ', sql).strip())
+
+class StatementCollector:
+    """Trace callback that keeps the first concrete instance of every statement"""
+
+    def __init__(self):
+        self.statements = {}
+        self.paused = False
+        self._lock = threading.Lock()
+
+    def __call__(self, sql):
+        if self.paused or not sql.lstrip().upper().startswith(_AUDITED):
+            return
+        key = normalize(sql)
+        with self._lock:
+            self.statements.setdefault(key, sql)
+
+def drive_routes(app, rng, collector):
+    """Exercise every page, API and background job at least once"""
+    # The audit's own lookups are not part of the app
+    collector.paused = True
+    scenarios = bench_endpoints.build_scenarios(app, rng)
+    conn = db.connect()
+    booking = conn.execute('SELECT booking_id, room_id FROM bookings ORDER BY booking_id DESC LIMIT 1').fetchone()
+    customer = conn.execute('SELECT email FROM customers LIMIT 1').fetchone()
+    room = conn.execute('SELECT room_id, room_number, room_type FROM rooms LIMIT 1').fetchone()
+    conn.close()
+    collector.paused = False
+
+    for _, issue in scenarios:
+        for _ in range(3):
+            issue()
+
+    admin = app.test_client()
+    admin.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    public = app.test_client()
+
+    public.get('/availability_calendar?days=90')
+    stay = {'check_in': (date.today() + timedelta(days=30)).isoformat(),
+            'check_out': (date.today() + timedelta(days=33)).isoformat()}
+    for filters in ({'guests': '2', 'room_type': room['room_type'], 'amenities': 'WiFi, TV', 'limit': '20'},
+                    {'guests': '2', 'sort': 'capacity', 'limit': '20'},
+                    {'min_price': '50', 'max_price': '200', 'sort': 'price'}):
+        public.post('/check_availability', data={**stay, **filters})
+    public.get(f"/book?room_id={room['room_id']}")
+    public.get(f"/booking_confirmation/{booking['booking_id']}")
+    public.get('/login')
+
+    for query in ('', 'status=pending', f"room_number={room['room_number']}", f"email={customer['email']}",
+                  'date_from=2000-01-01&date_to=2100-01-01', 'status=confirmed&date_from=2000-01-01'):
+        page = admin.get('/admin/bookings?' + query).data.decode()
+        cursor = re.search(r'cursor=([^&"]+)', page)
+        if cursor:
+            admin.get(f'/admin/bookings?cursor={cursor.group(1)}&{query}')
+    for status in ('checked_in', 'checked_out', 'cancelled'):
+        admin.post(f"/admin/bookings/update_status/{booking['booking_id']}", data={'status': status})
+    admin.post('/admin/api/bookings/status', json={'booking_ids': [booking['booking_id']], 'status': 'cancelled'})
+    for path in ('/admin', '/admin/rooms', '/admin/staff', f"/admin/rooms/edit/{room['room_id']}", '/admin/reports', '/admin/rates',
+                 '/admin/search?q=' + customer['email'], '/admin/api/search?q=' + customer['email'] + '&scope=all',
+                 '/admin/api/reports', '/admin/properties', '/admin/api/properties', '/admin/rooms/add', '/admin/staff/add',
+                 '/admin/api/stats', '/metrics', '/healthz', '/signup',
+                 '/admin/export/bookings.csv', '/admin/export/payments.json'):
+        admin.get(path)
+
+    # Inventory and price changes, on a room and a rate plan made for the audit
+    admin.post('/admin/rooms/add', data={'room_number': 'AUDIT-1', 'room_type': room['room_type'],
+                                         'price_per_night': '120', 'capacity': '2', 'amenities': 'WiFi'})
+    admin.post('/admin/api/rooms/bulk', json=[{'room_number': 'AUDIT-1', 'price_per_night': '130'},
+                                              {'room_number': 'AUDIT-2', 'room_type': room['room_type'],
+                                               'price_per_night': '110', 'capacity': '2'}])
+    admin.post('/admin/api/room_rates', json=[{'room_number': 'AUDIT-1', 'start_date': stay['check_in'],
+                                               'end_date': stay['check_out'], 'price_per_night': '150'}])
+    admin.post('/admin/rates/add', data={'name': 'Audit', 'start_date': stay['check_in'],
+                                         'end_date': stay['check_out'], 'price_per_night': '99'})
+    collector.paused = True
+    conn = db.connect()
+    audit_rooms = [row['room_id'] for row in conn.execute("SELECT room_id FROM rooms WHERE room_number LIKE 'AUDIT-%'")]
+    plan = conn.execute("SELECT plan_id FROM rate_plans WHERE name = 'Audit'").fetchone()
+    conn.close()
+    collector.paused = False
+    for room_id in audit_rooms:
+        admin.get(f'/admin/rooms/delete/{room_id}')
+    if plan:
+        admin.get(f"/admin/rates/delete/{plan['plan_id']}")
+    admin.get('/logout')
+
+    # The availability stream's feed query, then the background jobs, each as a dry run and for real
+    import archive
+    import feed
+    import night_audit
+    import occupancy
+    import stats
+    conn = db.connect()
+    feed.changes.poll(conn)
+    for dry_run in (True, False):
+        night_audit.run_audit(conn, pause=0, dry_run=dry_run)
+        archive.run_archive(conn, pause=0, dry_run=dry_run)
+    occupancy.index.build(conn)
+    stats.reconcile(conn)
+    conn.close()
+
+def plan_problems(sql, plan):
+    """Full scans and temp B-trees in an EXPLAIN QUERY PLAN result.
+
+    Walking an index in ORDER BY order is fine when the statement has a
+    LIMIT and sorts nothing itself: it stops after LIMIT rows.
+    """
+    bounded = (re.search(r'\bLIMIT\b', sql, re.IGNORECASE)
+               and not any('USE TEMP B-TREE' in detail for detail in plan))
+    problems = []
+    for detail in plan:
+        if detail.startswith('SCAN ') and 'CONSTANT ROW' not in detail and 'VIRTUAL TABLE INDEX' not in detail:
+            if not (bounded and ' USING ' in detail and 'INDEX' in detail):
+                problems.append(detail)
+        elif 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+def allowed_reason(statement):
+    for pattern, reason in ALLOWED.items():
+        if re.search(pattern, statement):
+            return reason
+    return None
+
+def audit(statements, verbose=False):
+    """Print the report; returns the statements with unexpected problems"""
+    conn = db.connect()
+    failures = []
+    for key, sql in sorted(statements.items()):
+        plan = [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+        problems = plan_problems(sql, plan)
+        reason = allowed_reason(key) if problems else None
+        if problems and not reason:
+            failures.append(key)
+        if verbose or (problems and not reason):
+            marker = 'FAIL' if problems and not reason else ('allowed' if problems else 'ok')
+            print(f"[{marker}] {key}")
+            for detail in plan:
+                print(f"         {detail}")
+            if reason:
+                print(f"         allowed: {reason}")
+    conn.close()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Flag queries that scan tables or sort without an index')
+    parser.add_argument('--database', help='existing database to use, or where to generate one')
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='print every plan, not just failures')
+    args = parser.parse_args()
+
+    db.DATABASE = bench_endpoints.prepare_database(args)
+    db.apply_schema()
+    collector = StatementCollector()
+    db.on_connect.append(lambda conn: conn.set_trace_callback(collector))
+
+    import app as app_module
+    import cache
+    cache.responses.max_entries = 0  # every request must reach the database
+    drive_routes(app_module.app, random.Random(args.seed), collector)
+
+    failures = audit(collector.statements, args.verbose)
+    print(f"\n{len(collector.statements)} statements audited, {len(failures)} with unexpected scans or sorts")
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,494 @@
+"""
+Bulk export and import of rooms, customers, bookings and payments
+
+Exports stream rows from a server-side cursor in fetchmany() batches, so
+memory stays flat however many rows there are. Imports load CSV files in
+batched transactions and report errors per row. Room changes (creates,
+updates, repricing, status changes) are applied all-or-nothing in one
+transaction.
+
+    python bulk_io.py export bookings --format csv > bookings.csv
+    python bulk_io.py import customers customers.csv
+    python bulk_io.py rooms room_changes.csv
+"""
+
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import amenities
+import database as db
+import feed
+import pricing
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 500
+
+# Exports include archived rows; each view arm streams in index order
+EXPORT_QUERIES = {
+    'bookings': '''
+        SELECT b.booking_id, b.created_at, b.status, r.room_number, r.room_type,
+               c.first_name, c.last_name, c.email, c.phone,
+               b.check_in_date, b.check_out_date, b.number_of_guests, b.total_amount, b.special_requests
+        FROM all_bookings b
+        LEFT JOIN rooms r ON b.room_id = r.room_id
+        LEFT JOIN customers c ON b.customer_id = c.customer_id
+        WHERE b.created_at >= ? AND b.created_at < ?
+        ORDER BY b.created_at, b.booking_id
+    ''',
+    'payments': '''
+        SELECT p.payment_id, p.payment_date, p.booking_id, p.amount, p.payment_method,
+               p.payment_status, p.transaction_id
+        FROM all_payments p
+        WHERE p.payment_date >= ? AND p.payment_date < ?
+        ORDER BY p.payment_date, p.payment_id
+    ''',
+}
+
+ROOM_STATUSES = ('available', 'occupied', 'maintenance')
+ROOM_ACTIONS = ('create', 'update')
+
+# Room numbers looked up per IN (...) query, well under SQLite's variable limit
+LOOKUP_BATCH_SIZE = 500
+
+def export_rows(dataset, date_from='', date_to='', database=None):
+    """Yield the column names, then the rows in fetchmany() batches.
+
+    Uses its own connection so it can keep streaming after the request that
+    started it has finished.
+    """
+    conn = db.connect(database)
+    try:
+        cursor = conn.execute(EXPORT_QUERIES[dataset], (date_from or '', date_to or '9999-12-31'))
+        yield [column[0] for column in cursor.description]
+        while True:
+            batch = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not batch:
+                break
+            yield batch
+    finally:
+        conn.close()
+
+def stream_csv(dataset, date_from='', date_to='', database=None):
+    """CSV text chunks, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = export_rows(dataset, date_from, date_to, database)
+    writer.writerow(next(rows))
+    for batch in rows:
+        writer.writerows(tuple(row) for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_json(dataset, date_from='', date_to='', database=None):
+    """A JSON array of objects, in chunks"""
+    rows = export_rows(dataset, date_from, date_to, database)
+    columns = next(rows)
+    yield '['
+    separator = ''
+    for batch in rows:
+        yield separator + ','.join(json.dumps(dict(zip(columns, row)), default=str) for row in batch)
+        separator = ','
+    yield ']'
+
+class RowError(ValueError):
+    """A row that cannot be imported"""
+
+def _cell(row, field):
+    # CSV cells are strings, JSON values may be numbers or null
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+def _required(row, field):
+    value = _cell(row, field)
+    if not value:
+        raise RowError(f'{field} is required')
+    return value
+
+def _number(row, field, cast=float, required=True):
+    value = _cell(row, field)
+    if not value:
+        if required:
+            raise RowError(f'{field} is required')
+        return None
+    try:
+        number = cast(value)
+    except ValueError:
+        raise RowError(f'{field} must be a number')
+    if number < 0:
+        raise RowError(f'{field} cannot be negative')
+    return number
+
+def _date(row, field):
+    value = _required(row, field)
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        raise RowError(f'{field} must be YYYY-MM-DD')
+
+def _choice(row, field, choices, default):
+    value = _cell(row, field) or default
+    if value is not None and value not in choices:
+        raise RowError(f"{field} must be one of {', '.join(choices)}")
+    return value
+
+def _parse_room(row):
+    return (_required(row, 'room_number'), _required(row, 'room_type'),
+            _number(row, 'price_per_night'), _number(row, 'capacity', int),
+            _cell(row, 'amenities'), _choice(row, 'status', ROOM_STATUSES, 'available'))
+
+def _parse_customer(row):
+    return (_required(row, 'first_name'), _required(row, 'last_name'), _required(row, 'email'),
+            _required(row, 'phone'), (row.get('address') or '').strip() or None)
+
+def _parse_booking(row):
+    check_in, check_out = _date(row, 'check_in_date'), _date(row, 'check_out_date')
+    if check_out <= check_in:
+        raise RowError('check_out_date must be after check_in_date')
+    return {
+        'email': _required(row, 'customer_email'),
+        'room_number': _required(row, 'room_number'),
+        'check_in': check_in,
+        'check_out': check_out,
+        'guests': _number(row, 'number_of_guests', int),
+        'total_amount': _number(row, 'total_amount', required=False),
+        'status': _choice(row, 'status', db.BOOKING_STATUSES, 'confirmed'),
+        'special_requests': (row.get('special_requests') or '').strip(),
+        'created_at': (row.get('created_at') or '').strip() or None,
+    }
+
+INSERTS = {
+    'rooms': ('''
+        INSERT INTO rooms (room_number, room_type, price_per_night, capacity, amenities, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', _parse_room),
+    'customers': ('''
+        INSERT INTO customers (first_name, last_name, email, phone, address)
+        VALUES (?, ?, ?, ?, ?)
+    ''', _parse_customer),
+}
+
+def import_csv(conn, kind, lines, batch_size=IMPORT_BATCH_SIZE):
+    """Load rooms, customers or bookings from CSV lines.
+
+    Rows are validated first, then written batch_size at a time, each batch
+    in its own transaction. Returns (imported_count, errors) where errors is
+    a list of (line_number, message).
+    """
+    reader = csv.DictReader(lines)
+    imported = 0
+    errors = []
+    batch = []
+    for row in reader:
+        batch.append((reader.line_num, row))
+        if len(batch) >= batch_size:
+            imported += _import_batch(conn, kind, batch, errors)
+            batch = []
+    if batch:
+        imported += _import_batch(conn, kind, batch, errors)
+    return imported, sorted(errors)
+
+def _import_batch(conn, kind, batch, errors):
+    parsed = []
+    parse = _parse_booking if kind == 'bookings' else INSERTS[kind][1]
+    for line, row in batch:
+        try:
+            parsed.append((line, parse(row)))
+        except RowError as e:
+            errors.append((line, str(e)))
+    if not parsed:
+        return 0
+
+    if kind == 'bookings':
+        return _import_bookings(conn, parsed, errors)
+
+    sql = INSERTS[kind][0]
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(sql, [values for _, values in parsed])
+        if kind == 'rooms':
+            amenities.sync_rooms(conn)
+        conn.commit()
+        return len(parsed)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+
+    # Some row clashed with existing data: redo the batch row by row to find it
+    imported = 0
+    conn.execute('BEGIN IMMEDIATE')
+    for line, values in parsed:
+        try:
+            conn.execute(sql, values)
+            imported += 1
+        except sqlite3.IntegrityError as e:
+            errors.append((line, f'duplicate or invalid value ({e})'))
+    if kind == 'rooms':
+        amenities.sync_rooms(conn)
+    conn.commit()
+    return imported
+
+def _import_bookings(conn, parsed, errors):
+    emails = {values['email'] for _, values in parsed}
+    room_numbers = {values['room_number'] for _, values in parsed}
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        customers = {row['email']: row['customer_id'] for row in conn.execute(
+            f"SELECT email, customer_id FROM customers WHERE email IN ({','.join('?' * len(emails))})",
+            list(emails))}
+        rooms = {row['room_number']: row for row in conn.execute(
+            f"SELECT room_number, room_id, room_type, price_per_night FROM rooms WHERE room_number IN ({','.join('?' * len(room_numbers))})",
+            list(room_numbers))}
+
+        imported = []
+        for line, values in parsed:
+            customer_id = customers.get(values['email'])
+            room = rooms.get(values['room_number'])
+            if customer_id is None:
+                errors.append((line, f"no customer with email {values['email']}"))
+                continue
+            if room is None:
+                errors.append((line, f"no room {values['room_number']}"))
+                continue
+            if values['status'] not in ('cancelled', 'checked_out', 'no_show'):
+                clash = conn.execute('''
+                    SELECT booking_id FROM bookings
+                    WHERE room_id = ? AND status NOT IN ('cancelled', 'checked_out', 'no_show')
+                    AND check_in_date < ? AND check_out_date > ?
+                    LIMIT 1
+                ''', (room['room_id'], values['check_out'], values['check_in'])).fetchone()
+                if clash:
+                    errors.append((line, f"room {values['room_number']} is already booked (booking {clash['booking_id']})"))
+                    continue
+
+            total_amount = values['total_amount']
+            if total_amount is None:
+                total_amount = pricing.quote(conn, room, values['check_in'], values['check_out'])
+            cursor = conn.execute('''
+                INSERT INTO bookings (customer_id, room_id, check_in_date, check_out_date, number_of_guests,
+                                      total_amount, status, special_requests, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ''', (customer_id, room['room_id'], values['check_in'], values['check_out'], values['guests'],
+                  total_amount, values['status'], values['special_requests'], values['created_at']))
+            imported.append((cursor.lastrowid, room['room_id'], values['check_in'], values['check_out']))
+        feed.stays_changed(conn, imported)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(imported)
+
+ROOM_UPDATE_SQL = '''
+    UPDATE rooms SET room_type = COALESCE(?, room_type), price_per_night = COALESCE(?, price_per_night),
+                     capacity = COALESCE(?, capacity), amenities = COALESCE(?, amenities),
+                     status = COALESCE(?, status)
+    WHERE room_id = ?
+'''
+
+def _parse_room_update(row):
+    # Blank fields keep their current value
+    values = (_cell(row, 'room_type') or None, _number(row, 'price_per_night', required=False),
+              _number(row, 'capacity', int, required=False), _cell(row, 'amenities') or None,
+              _choice(row, 'status', ROOM_STATUSES, None))
+    if all(value is None for value in values):
+        raise RowError('nothing to change')
+    return values
+
+def apply_room_changes(conn, rows):
+    """Create or update many rooms in one transaction.
+
+    Each row names a room_number and the fields to set. action may be
+    'create' or 'update'; when blank, existing rooms are updated (only the
+    fields given) and new ones created. Every row is validated before
+    anything is written and nothing is written unless all rows are valid.
+    Returns (applied, results) with one result dict per row, in order.
+    """
+    rows = list(rows)
+    results = [{'row': position, 'room_number': _cell(row, 'room_number')}
+               for position, row in enumerate(rows, 1)]
+
+    conn.execute('BEGIN IMMEDIATE')
+    numbers = sorted({result['room_number'] for result in results if result['room_number']})
+    existing = {}
+    for start in range(0, len(numbers), LOOKUP_BATCH_SIZE):
+        chunk = numbers[start:start + LOOKUP_BATCH_SIZE]
+        for room in conn.execute(
+                f"SELECT room_number, room_id, status FROM rooms WHERE room_number IN ({','.join('?' * len(chunk))})",
+                chunk):
+            existing[room['room_number']] = room
+
+    creates, updates = [], []
+    seen = set()
+    for row, result in zip(rows, results):
+        number = result['room_number']
+        try:
+            if not number:
+                raise RowError('room_number is required')
+            if number in seen:
+                raise RowError(f'room {number} appears more than once')
+            seen.add(number)
+            room = existing.get(number)
+            action = _choice(row, 'action', ROOM_ACTIONS, 'update' if room else 'create')
+            if action == 'create':
+                if room:
+                    raise RowError(f'room {number} already exists')
+                values = _parse_room(row)
+                creates.append((number,) + values[1:])
+                result.update(action='create', status=values[5])
+            else:
+                if not room:
+                    raise RowError(f'no room {number}')
+                values = _parse_room_update(row)
+                updates.append(values + (room['room_id'],))
+                result.update(action='update', room_id=room['room_id'], status=values[4] or room['status'])
+        except RowError as e:
+            result['error'] = str(e)
+
+    if any('error' in result for result in results):
+        conn.rollback()
+        return False, results
+
+    conn.executemany(INSERTS['rooms'][0], creates)
+    conn.executemany(ROOM_UPDATE_SQL, updates)
+    created = [result for result in results if result['action'] == 'create']
+    for start in range(0, len(created), LOOKUP_BATCH_SIZE):
+        chunk = {result['room_number']: result for result in created[start:start + LOOKUP_BATCH_SIZE]}
+        for room in conn.execute(
+                f"SELECT room_number, room_id FROM rooms WHERE room_number IN ({','.join('?' * len(chunk))})",
+                list(chunk)):
+            chunk[room['room_number']]['room_id'] = room['room_id']
+    amenities.sync_rooms(conn)
+    feed.rooms_changed(conn, [(result['room_id'], result['status']) for result in results])
+    conn.commit()
+    return True, results
+
+def apply_room_rates(conn, rows):
+    """Set or clear rate calendar prices in one transaction.
+
+    Each row gives a room_number, a start_date, an optional end_date (the
+    first night not covered; defaults to the night after start_date) and
+    a price_per_night, or a blank price to fall back to the rate plans.
+    Like apply_room_changes(), nothing is written unless every row is
+    valid. Returns (applied, results, (first_night, last_night)).
+    """
+    rows = list(rows)
+    results = [{'row': position, 'room_number': _cell(row, 'room_number')}
+               for position, row in enumerate(rows, 1)]
+
+    conn.execute('BEGIN IMMEDIATE')
+    numbers = sorted({result['room_number'] for result in results if result['room_number']})
+    room_ids = {}
+    for start in range(0, len(numbers), LOOKUP_BATCH_SIZE):
+        chunk = numbers[start:start + LOOKUP_BATCH_SIZE]
+        for room in conn.execute(
+                f"SELECT room_number, room_id FROM rooms WHERE room_number IN ({','.join('?' * len(chunk))})", chunk):
+            room_ids[room['room_number']] = room['room_id']
+
+    prices, cleared = [], []
+    window = None
+    for row, result in zip(rows, results):
+        try:
+            room_id = room_ids.get(result['room_number'])
+            if room_id is None:
+                raise RowError(f"no room {result['room_number']}" if result['room_number'] else 'room_number is required')
+            first = datetime.strptime(_date(row, 'start_date'), '%Y-%m-%d').date()
+            last = first + timedelta(days=1)
+            if _cell(row, 'end_date'):
+                last = datetime.strptime(_date(row, 'end_date'), '%Y-%m-%d').date()
+                if last <= first:
+                    raise RowError('end_date must be after start_date')
+            price = _number(row, 'price_per_night', required=False)
+        except RowError as e:
+            result['error'] = str(e)
+            continue
+        nights = [(first + timedelta(days=n)).isoformat() for n in range((last - first).days)]
+        if price is None:
+            cleared += [(room_id, night) for night in nights]
+        else:
+            prices += [(room_id, night, price) for night in nights]
+        result.update(room_id=room_id, nights=len(nights))
+        window = (min(window[0], first), max(window[1], last)) if window else (first, last)
+
+    if any('error' in result for result in results):
+        conn.rollback()
+        return False, results, None
+
+    conn.executemany('INSERT OR REPLACE INTO room_rates (room_id, rate_date, price_per_night) VALUES (?, ?, ?)', prices)
+    conn.executemany('DELETE FROM room_rates WHERE room_id = ? AND rate_date = ?', cleared)
+    feed.rates_changed(conn, *window)
+    conn.commit()
+    return True, results, window
+
+def read_rows(text, is_csv, key):
+    """Rows from a CSV document or a JSON list (or {key: [...]})"""
+    if is_csv:
+        return list(csv.DictReader(io.StringIO(text)))
+    payload = json.loads(text)
+    if isinstance(payload, dict):
+        payload = payload.get(key)
+    if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+        raise ValueError('expected a list of objects')
+    return payload
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk export and import hotel data')
+    parser.add_argument('--database', default=db.DATABASE)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='write bookings or payments to stdout')
+    export.add_argument('dataset', choices=sorted(EXPORT_QUERIES))
+    export.add_argument('--format', choices=['csv', 'json'], default='csv')
+    export.add_argument('--from', dest='date_from', default='', help='earliest creation/payment date')
+    export.add_argument('--to', dest='date_to', default='', help='creation/payment date to stop before')
+
+    load = commands.add_parser('import', help='load rooms, customers or bookings from a CSV file')
+    load.add_argument('kind', choices=['rooms', 'customers', 'bookings'])
+    load.add_argument('file')
+    load.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    rooms = commands.add_parser('rooms', help='create or update rooms from a CSV or JSON file, all or nothing')
+    rooms.add_argument('file')
+    args = parser.parse_args()
+
+    db.DATABASE = args.database
+    if args.command == 'export':
+        stream = stream_csv if args.format == 'csv' else stream_json
+        for chunk in stream(args.dataset, args.date_from, args.date_to):
+            sys.stdout.write(chunk)
+        return
+
+    if args.command == 'rooms':
+        with open(args.file, newline='') as f:
+            changes = read_rows(f.read(), not args.file.endswith('.json'), 'rooms')
+        conn = db.connect()
+        applied, results = apply_room_changes(conn, changes)
+        conn.close()
+        for result in results:
+            if 'error' in result:
+                print(f"  row {result['row']}: {result['error']}", file=sys.stderr)
+        if not applied:
+            print('No rooms changed', file=sys.stderr)
+            sys.exit(1)
+        created = sum(1 for result in results if result['action'] == 'create')
+        print(f"Created {created} rooms, updated {len(results) - created}")
+        return
+
+    conn = db.connect()
+    conn.isolation_level = None  # batches manage their own transactions
+    with open(args.file, newline='') as f:
+        imported, errors = import_csv(conn, args.kind, f, args.batch_size)
+    conn.close()
+    for line, message in errors:
+        print(f"  line {line}: {message}", file=sys.stderr)
+    print(f"Imported {imported} {args.kind}, {len(errors)} rows rejected")
+    if errors:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Response cache - bounded LRU/TTL cache for public pages and availability searches
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import shards
+
+# Entries live at most this long, which also bounds how stale a result can
+# get when another process changes the database
+CACHE_TTL = 30
+CACHE_MAX_ENTRIES = 1024
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, predicate):
+        """Drop every entry whose key matches predicate(key)"""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            self._counters['invalidations'] += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            return stats
+
+# Keys are ('index',) for the home page room list,
+# ('search', check_in, check_out, filters) for availability searches,
+# ('calendar', start, end) for availability calendars and
+# ('analytics', start, end) for revenue reports; one cache per property
+responses = shards.PerShard(LRUCache)
+
+def invalidate_rooms():
+    """A room was added, edited or deleted: every room list may change"""
+    responses.invalidate(lambda key: key[0] in ('index', 'search', 'calendar', 'analytics'))
+
+def invalidate_stay(check_in, check_out, room_status_changed=False):
+    """A booking for [check_in, check_out) changed: drop overlapping searches, calendars and reports"""
+    check_in, check_out = str(check_in), str(check_out)
+
+    def affected(key):
+        if key[0] in ('search', 'calendar', 'analytics'):
+            return key[1] < check_out and key[2] > check_in
+        return room_status_changed and key[0] == 'index'
+
+    responses.invalidate(affected)
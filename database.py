@@ -1,108 +1,566 @@
-import sqlite3
-import hashlib
-from datetime import datetime, date
-from functools import wraps
-from flask import session, redirect, url_for
-
-DATABASE = 'hotel_booking.db'
-
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    """Initialize database with schema"""
-    conn = get_db()
-    with open('schema.sql', 'r') as f:
-        conn.executescript(f.read())
-    conn.commit()
-    conn.close()
-    
-    # Create default admin user
-    create_default_admin()
-
-def create_default_admin():
-    """Create default admin user"""
-    conn = get_db()
-    password_hash = hashlib.sha256('admin123'.encode()).hexdigest()
-    try:
-        conn.execute('''
-            INSERT INTO staff (first_name, last_name, email, phone, role, username, password_hash)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', ('Admin', 'User', 'admin@hotel.com', '1234567890', 'admin', 'admin', password_hash))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass  # Admin already exists
-    conn.close()
-
-def hash_password(password):
-    """Hash password using SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(password, password_hash):
-    """Verify password against hash"""
-    return hash_password(password) == password_hash
-
-def login_required(f):
-    """Decorator to require login"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def admin_required(f):
-    """Decorator to require admin role"""
-    @wraps(f)
-    @login_required
-    def decorated_function(*args, **kwargs):
-        if session.get('role') != 'admin':
-            return redirect(url_for('index'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def check_room_availability(room_id, check_in, check_out):
-    """Check if room is available for given dates"""
-    conn = get_db()
-    check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
-    check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
-    
-    # Check if room exists and is not in maintenance
-    room = conn.execute('SELECT status FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
-    if not room or room['status'] == 'maintenance':
-        conn.close()
-        return False
-    
-    # Check for overlapping bookings
-    overlapping = conn.execute('''
-        SELECT COUNT(*) as count FROM bookings
-        WHERE room_id = ? 
-        AND status NOT IN ('cancelled', 'checked_out')
-        AND (
-            (check_in_date <= ? AND check_out_date > ?) OR
-            (check_in_date < ? AND check_out_date >= ?) OR
-            (check_in_date >= ? AND check_out_date <= ?)
-        )
-    ''', (room_id, check_in_date, check_in_date, check_out_date, check_out_date, check_in_date, check_out_date)).fetchone()
-    
-    conn.close()
-    return overlapping['count'] == 0
-
-def calculate_total_amount(room_id, check_in, check_out):
-    """Calculate total amount for booking"""
-    conn = get_db()
-    room = conn.execute('SELECT price_per_night FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
-    conn.close()
-    
-    if not room:
-        return 0
-    
-    check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
-    check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
-    nights = (check_out_date - check_in_date).days
-    
-    return float(room['price_per_night']) * nights
-
+import sqlite3
+import hashlib
+import queue
+import random
+import threading
+import time
+from datetime import datetime, date
+from functools import wraps
+from flask import session, redirect, url_for, g, has_app_context
+import occupancy
+import metrics
+import pricing
+import amenities
+import feed
+import shards
+
+DATABASE = 'hotel_booking.db'
+
+# Connection tuning
+BUSY_TIMEOUT_MS = 5000          # wait this long for the write lock before SQLITE_BUSY
+CACHE_SIZE_KB = 20000           # page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024   # memory-map the first 256 MB of the file
+STATEMENT_CACHE_SIZE = 256      # prepared statements kept per connection
+POOL_SIZE = 16                  # idle connections kept per database file
+
+# Admin bookings listing
+BOOKINGS_PAGE_SIZE = 50
+BOOKINGS_MAX_PAGE_SIZE = 200
+
+# Keyset columns of the admin bookings list, see bookings_order()
+BOOKINGS_ORDER_BY_CREATED = ('created_at', 'booking_id')
+BOOKINGS_ORDER_BY_CHECK_IN = ('check_in_date', 'check_out_date', 'booking_id')
+
+# Booking statuses, and the most bookings one bulk status change may name
+BOOKING_STATUSES = ('pending', 'confirmed', 'checked_in', 'checked_out', 'cancelled', 'no_show')
+BULK_STATUS_MAX_BOOKINGS = 500
+
+# The statuses a booking may move to from each status
+BOOKING_TRANSITIONS = {
+    'pending': ('confirmed', 'checked_in', 'cancelled'),
+    'confirmed': ('checked_in', 'cancelled', 'no_show'),
+    'checked_in': ('checked_out',),
+    'checked_out': (),
+    'cancelled': ('pending', 'confirmed'),
+    'no_show': ('checked_in', 'cancelled'),
+}
+
+# Booking transaction retries when the write lock stays busy
+BOOKING_MAX_RETRIES = 5
+BOOKING_BACKOFF_BASE = 0.01     # seconds, doubled on every retry
+BOOKING_BACKOFF_MAX = 0.25
+BOOKING_BUSY_TIMEOUT_MS = 250   # lock wait per attempt, instead of BUSY_TIMEOUT_MS
+BOOKING_MAX_WAIT = 2.0          # seconds across all attempts before giving up
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports how long each statement took"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.record_query(sql, time.perf_counter() - started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements all go through InstrumentedCursor"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class PooledConnection(InstrumentedConnection):
+    """Connection shared by everything that runs in one request.
+
+    Handlers and helpers call close() when they are done with it; that is a
+    no-op here and the connection goes back to the pool in close_db().
+    """
+
+    def close(self):
+        pass
+
+class ConnectionPool:
+    """Idle connections kept per database file and reused across requests"""
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, database):
+        with self._lock:
+            idle = self._idle.setdefault(database, queue.LifoQueue(maxsize=self.size))
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            return connect(database, factory=PooledConnection)
+
+    def release(self, conn, database):
+        if conn.in_transaction:
+            conn.rollback()  # uncommitted work is discarded, as with close()
+        try:
+            self._idle[database].put_nowait(conn)
+        except queue.Full:
+            sqlite3.Connection.close(conn)
+
+    def clear(self):
+        """Close every idle connection, e.g. after DATABASE changes"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            while not conns.empty():
+                sqlite3.Connection.close(conns.get_nowait())
+
+pool = ConnectionPool()
+
+# Callables run with every newly opened connection, e.g. to trace its SQL
+on_connect = []
+
+def connect(database=None, factory=InstrumentedConnection):
+    """Open a new tuned connection, to the current property's database by default"""
+    conn = sqlite3.connect(database or shards.current_database(), timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=STATEMENT_CACHE_SIZE, factory=factory,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers keep going while a booking is being written
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    for callback in on_connect:
+        callback(conn)
+    metrics.record_connection()
+    return conn
+
+def get_db():
+    """Get database connection, shared for the rest of the request"""
+    if not has_app_context():
+        return connect()
+    if 'db' not in g:
+        g.db_path = shards.current_database()
+        g.db = pool.acquire(g.db_path)
+    return g.db
+
+def close_db(exception=None):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn, g.pop('db_path'))
+
+def init_db():
+    """Initialize database with schema"""
+    apply_schema()
+    
+    # Create default admin user
+    create_default_admin()
+
+def migrate(conn):
+    """Schema changes CREATE ... IF NOT EXISTS cannot make to databases created before them"""
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(rooms)')}
+    if columns and 'amenity_mask' not in columns:
+        conn.execute('ALTER TABLE rooms ADD COLUMN amenity_mask INTEGER')
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(availability_events)')}
+    if columns and 'booking_id' not in columns:
+        conn.execute('ALTER TABLE availability_events ADD COLUMN booking_id INTEGER')
+        conn.execute('ALTER TABLE availability_events ADD COLUMN booking_status VARCHAR(20)')
+    table = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bookings'").fetchone()
+    if table and "'no_show'" not in table['sql']:
+        _widen_check(conn, 'bookings', table['sql'].replace("'cancelled')", "'cancelled', 'no_show')", 1))
+
+def _widen_check(conn, table, sql):
+    """Replace a table's CREATE statement with one whose CHECK accepts more values.
+
+    SQLite cannot alter a CHECK constraint, but loosening one by editing the
+    schema in place is safe (see "Making Other Kinds Of Table Schema Changes"
+    in the ALTER TABLE documentation): every existing row still satisfies it.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = conn.execute('PRAGMA schema_version').fetchone()[0]
+        conn.execute('PRAGMA writable_schema = ON')
+        conn.execute("UPDATE sqlite_master SET sql = ? WHERE type = 'table' AND name = ?", (sql, table))
+        conn.execute(f'PRAGMA schema_version = {version + 1}')
+        conn.execute('PRAGMA writable_schema = OFF')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def apply_schema(conn=None):
+    """Run schema.sql; every statement in it is safe to re-run on an existing database"""
+    conn = conn or get_db()
+    migrate(conn)
+    with open('schema.sql', 'r') as f:
+        conn.executescript(f.read())
+    # Index amenities of rooms written while the app was not running
+    amenities.sync_rooms(conn)
+    conn.commit()
+    conn.close()
+
+def get_staff_db():
+    """Connection for staff accounts, which every property shares from the main database"""
+    return connect(DATABASE)
+
+def create_default_admin():
+    """Create default admin user"""
+    conn = get_db()
+    password_hash = hashlib.sha256('admin123'.encode()).hexdigest()
+    try:
+        conn.execute('''
+            INSERT INTO staff (first_name, last_name, email, phone, role, username, password_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ('Admin', 'User', 'admin@hotel.com', '1234567890', 'admin', 'admin', password_hash))
+        conn.commit()
+    except sqlite3.IntegrityError:
+        pass  # Admin already exists
+    conn.close()
+
+def hash_password(password):
+    """Hash password using SHA256"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def verify_password(password, password_hash):
+    """Verify password against hash"""
+    return hash_password(password) == password_hash
+
+def login_required(f):
+    """Decorator to require login"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def admin_required(f):
+    """Decorator to require admin role"""
+    @wraps(f)
+    @login_required
+    def decorated_function(*args, **kwargs):
+        if session.get('role') != 'admin':
+            return redirect(url_for('index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def room_is_free(conn, room_id, check_in, check_out, booking_id=None):
+    """True if the room exists, is bookable and no active booking overlaps the stay, per the database.
+
+    booking_id, if given, is left out of the overlap check.
+    """
+    room = conn.execute('SELECT status FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
+    if not room or room['status'] == 'maintenance':
+        return False
+    overlapping = conn.execute('''
+        SELECT 1 FROM bookings
+        WHERE room_id = ?
+        AND status NOT IN ('cancelled', 'checked_out', 'no_show')
+        AND check_in_date < ? AND check_out_date > ?
+        AND booking_id IS NOT ?
+        LIMIT 1
+    ''', (room_id, check_out, check_in, booking_id)).fetchone()
+    return overlapping is None
+
+def check_room_availability(room_id, check_in, check_out):
+    """Check if room is available for given dates.
+
+    Answered from the in-memory occupancy index, which follows every
+    process's changes through availability_events; create_booking() checks
+    again inside its write transaction.
+    """
+    check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
+    check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
+    
+    try:
+        room_id = int(room_id)
+    except (TypeError, ValueError):
+        return False
+    
+    check_in, check_out = check_in_date.isoformat(), check_out_date.isoformat()
+    database = shards.current_database()
+    occupancy.index.refresh_if_stale(lambda: connect(database))
+    return occupancy.index.is_available(room_id, check_in, check_out)
+
+def calculate_total_amount(room_id, check_in, check_out, conn=None):
+    """Calculate total amount for booking from the room's nightly rates"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db()
+    room = conn.execute('SELECT room_id, room_type, price_per_night FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
+    total_amount = pricing.quote(conn, room, check_in, check_out) if room else 0
+    if own_conn:
+        conn.close()
+    return total_amount
+
+booking_counters = {
+    'attempts': 0,      # create_booking calls
+    'created': 0,       # bookings committed
+    'conflicts': 0,     # room taken by the time the write lock was held
+    'retries': 0,       # transactions retried after SQLITE_BUSY
+    'busy_failures': 0, # gave up after BOOKING_MAX_RETRIES
+}
+_booking_counters_lock = threading.Lock()
+
+def _count(name):
+    with _booking_counters_lock:
+        booking_counters[name] += 1
+
+def booking_stats():
+    """Snapshot of the booking pipeline counters"""
+    with _booking_counters_lock:
+        return dict(booking_counters)
+
+def _is_busy(error):
+    """True if an OperationalError means the database was locked"""
+    return (getattr(error, 'sqlite_errorcode', None) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+            or 'database is locked' in str(error))
+
+def create_booking(conn, customer, room_id, check_in, check_out, number_of_guests, special_requests=''):
+    """Check availability and insert a pending booking in one write transaction.
+
+    BEGIN IMMEDIATE takes the write lock before the overlap check, so no
+    other booking can land between the check and the insert. Returns the
+    new booking id, or None if the room is not available. Each attempt
+    waits at most BOOKING_BUSY_TIMEOUT_MS for the lock and all of them
+    together about BOOKING_MAX_WAIT; after that sqlite3.OperationalError
+    is raised.
+    """
+    _count('attempts')
+    deadline = time.monotonic() + BOOKING_MAX_WAIT
+    try:
+        for attempt in range(BOOKING_MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            conn.execute(f'PRAGMA busy_timeout = {max(1, int(min(BOOKING_BUSY_TIMEOUT_MS, remaining * 1000)))}')
+            try:
+                return _create_booking(conn, customer, room_id, check_in, check_out,
+                                       number_of_guests, special_requests)
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e):
+                    raise
+                if attempt == BOOKING_MAX_RETRIES or time.monotonic() >= deadline:
+                    _count('busy_failures')
+                    raise
+                _count('retries')
+                # Exponential backoff with full jitter so retries spread out
+                backoff = random.uniform(0, min(BOOKING_BACKOFF_MAX, BOOKING_BACKOFF_BASE * 2 ** attempt))
+                time.sleep(max(0, min(backoff, deadline - time.monotonic())))
+    finally:
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+
+def _create_booking(conn, customer, room_id, check_in, check_out, number_of_guests, special_requests):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        booking_id = _insert_booking(conn, customer, room_id, check_in, check_out,
+                                     number_of_guests, special_requests)
+        if booking_id is None:
+            conn.rollback()
+            _count('conflicts')
+            return None
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _count('created')
+    return booking_id
+    
+def _insert_booking(conn, customer, room_id, check_in, check_out, number_of_guests, special_requests):
+    """The body of the booking transaction; returns None if the room is taken"""
+    if not room_is_free(conn, room_id, check_in, check_out):
+        return None
+    
+    # Get or create customer
+    existing = conn.execute('SELECT customer_id FROM customers WHERE email = ?', (customer['email'],)).fetchone()
+    if existing:
+        customer_id = existing['customer_id']
+        # Update customer info
+        conn.execute('''
+            UPDATE customers SET first_name = ?, last_name = ?, phone = ?
+            WHERE customer_id = ?
+        ''', (customer['first_name'], customer['last_name'], customer['phone'], customer_id))
+    else:
+        cursor = conn.execute('''
+            INSERT INTO customers (first_name, last_name, email, phone)
+            VALUES (?, ?, ?, ?)
+        ''', (customer['first_name'], customer['last_name'], customer['email'], customer['phone']))
+        customer_id = cursor.lastrowid
+    
+    total_amount = calculate_total_amount(room_id, check_in, check_out, conn)
+    
+    cursor = conn.execute('''
+        INSERT INTO bookings (customer_id, room_id, check_in_date, check_out_date, 
+                            number_of_guests, total_amount, special_requests, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+    ''', (customer_id, room_id, check_in, check_out, number_of_guests, total_amount, special_requests))
+    
+    booking_id = cursor.lastrowid
+    feed.stays_changed(conn, [(booking_id, room_id, check_in, check_out)])
+    return booking_id
+
+def transition_bookings(conn, booking_ids, new_status):
+    """Move many bookings to new_status in one write transaction.
+
+    Bookings are taken in the order given. Only the moves in
+    BOOKING_TRANSITIONS are made, and a cancelled or no-show booking takes
+    its room back only if no other active booking overlaps it. Checking in marks the rooms occupied; checking out frees rooms
+    nobody else is staying in and records a cash payment for every booking
+    that has none. Each side effect is one set-based statement for the
+    whole group. Returns (results, changed, room_statuses): a result
+    dict per requested id with its outcome ('updated', 'unchanged',
+    'not_allowed', 'conflict' or 'not_found'), the booking rows that
+    changed (as they were before), and the new status of every room whose
+    status was touched.
+    """
+    booking_ids = list(dict.fromkeys(booking_ids))
+    placeholders = ','.join('?' * len(booking_ids))
+    outcomes = {}
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        bookings = {row['booking_id']: row for row in conn.execute(f'''
+            SELECT booking_id, room_id, check_in_date, check_out_date, status FROM bookings
+            WHERE booking_id IN ({placeholders})
+        ''', booking_ids)}
+        changed = []
+        for row in (bookings[booking_id] for booking_id in booking_ids if booking_id in bookings):
+            if row['status'] == new_status:
+                outcomes[row['booking_id']] = 'unchanged'
+            elif new_status not in BOOKING_TRANSITIONS[row['status']]:
+                outcomes[row['booking_id']] = 'not_allowed'
+            elif (row['status'] in occupancy.RELEASED_STATUSES and new_status not in occupancy.RELEASED_STATUSES
+                    and not room_is_free(conn, row['room_id'], row['check_in_date'], row['check_out_date'],
+                                         row['booking_id'])):
+                outcomes[row['booking_id']] = 'conflict'
+            else:
+                outcomes[row['booking_id']] = 'updated'
+                changed.append(row)
+                if row['status'] in occupancy.RELEASED_STATUSES:
+                    # Hold the room now so a later booking in this group sees it taken
+                    conn.execute('UPDATE bookings SET status = ? WHERE booking_id = ?', (new_status, row['booking_id']))
+        ids = [row['booking_id'] for row in changed]
+        room_ids = list({row['room_id'] for row in changed})
+        room_statuses = {}
+        if ids:
+            in_ids = ','.join('?' * len(ids))
+            in_rooms = ','.join('?' * len(room_ids))
+            conn.execute(f'UPDATE bookings SET status = ? WHERE booking_id IN ({in_ids})', [new_status] + ids)
+            if new_status == 'checked_in':
+                conn.execute(f"UPDATE rooms SET status = 'occupied' WHERE room_id IN ({in_rooms})", room_ids)
+            elif new_status == 'checked_out':
+                conn.execute(f'''
+                    UPDATE rooms SET status = 'available'
+                    WHERE room_id IN ({in_rooms})
+                    AND NOT EXISTS (
+                        SELECT 1 FROM bookings b WHERE b.room_id = rooms.room_id AND b.status = 'checked_in'
+                    )
+                ''', room_ids)
+                conn.execute(f'''
+                    INSERT INTO payments (booking_id, amount, payment_method, payment_status, transaction_id)
+                    SELECT booking_id, total_amount, 'cash', 'completed', 'TXN' || booking_id || ?
+                    FROM bookings b
+                    WHERE booking_id IN ({in_ids})
+                    AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.booking_id = b.booking_id)
+                ''', [datetime.now().strftime("%Y%m%d%H%M%S")] + ids)
+            if new_status in ('checked_in', 'checked_out'):
+                room_statuses = dict(conn.execute(
+                    f'SELECT room_id, status FROM rooms WHERE room_id IN ({in_rooms})', room_ids).fetchall())
+            feed.rooms_changed(conn, room_statuses.items())
+            feed.stays_changed(conn, [(row['booking_id'], row['room_id'], row['check_in_date'], row['check_out_date'])
+                                      for row in changed])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    results = []
+    for booking_id in booking_ids:
+        booking = bookings.get(booking_id)
+        if booking is None:
+            results.append({'booking_id': booking_id, 'outcome': 'not_found'})
+        else:
+            results.append({'booking_id': booking_id, 'previous_status': booking['status'],
+                            'outcome': outcomes[booking_id]})
+    return results, changed, room_statuses
+
+def bookings_order(filters):
+    """Sort key columns of the bookings list for these filters, descending.
+
+    Newest bookings first, except that a check-in range lists the latest
+    check-ins first, so the range is read from idx_bookings_dates (or
+    idx_bookings_status_dates) in order rather than sorted.
+    """
+    if filters.get('date_from') or filters.get('date_to'):
+        return BOOKINGS_ORDER_BY_CHECK_IN
+    return BOOKINGS_ORDER_BY_CREATED
+
+def list_bookings(conn, filters, cursor=None, page_size=BOOKINGS_PAGE_SIZE):
+    """One page of bookings, in bookings_order(filters), using keyset pagination.
+
+    filters may hold status, date_from/date_to (check-in date range),
+    room_number and email. cursor is the value returned as next_cursor for
+    the previous page. Returns (bookings, next_cursor); next_cursor is None
+    on the last page.
+    """
+    conditions = []
+    params = []
+    if filters.get('status'):
+        conditions.append('b.status = ?')
+        params.append(filters['status'])
+    if filters.get('date_from'):
+        conditions.append('b.check_in_date >= ?')
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        conditions.append('b.check_in_date <= ?')
+        params.append(filters['date_to'])
+    if filters.get('room_number'):
+        conditions.append('b.room_id = (SELECT room_id FROM rooms WHERE room_number = ?)')
+        params.append(filters['room_number'])
+    if filters.get('email'):
+        conditions.append('b.customer_id = (SELECT customer_id FROM customers WHERE email = ?)')
+        params.append(filters['email'])
+    
+    order = bookings_order(filters)
+    position = _parse_bookings_cursor(cursor, len(order))
+    if position:
+        conditions.append(f"(b.{', b.'.join(order)}) < ({', '.join('?' * len(order))})")
+        params.extend(position)
+    
+    where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+    rows = conn.execute(f'''
+        SELECT b.*, r.room_number, r.room_type, c.first_name, c.last_name, c.email, c.phone
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.room_id
+        JOIN customers c ON b.customer_id = c.customer_id
+        {where}
+        ORDER BY {', '.join(f'b.{column} DESC' for column in order)}
+        LIMIT ?
+    ''', params + [page_size + 1]).fetchall()
+    
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = '|'.join(str(last[column]) for column in order)
+    return rows, next_cursor
+
+def _parse_bookings_cursor(cursor, size):
+    """Key values from a cursor of size columns, the last being booking_id, or None"""
+    if not cursor:
+        return None
+    values = cursor.split('|')
+    if len(values) != size:
+        return None  # from a list sorted another way
+    try:
+        return values[:-1] + [int(values[-1])]
+    except ValueError:
+        return None
@@ -0,0 +1,438 @@
+"""
+Availability change feed - pushed to browsers as Server-Sent Events
+
+Every change to inventory (a booking held, released or moved to another
+status, a room edited or removed, prices changed) is written once to the
+availability_events table, so it reaches every worker process whichever
+one (or whichever job) made it. Event ids are the table's, so a browser
+that reconnects to another worker resumes where it left off; one that
+falls further behind than a process's buffer is told to reset and search
+again.
+
+Streams are not served by the app's request threads. Each process runs
+one FeedServer: an asyncio loop on its own port (FEED_BIND, shared by the
+workers through SO_REUSEPORT) holding every open stream as a socket and a
+cursor, and one follower thread that tails availability_events for the
+databases being followed, one query per POLL_INTERVAL however many
+browsers listen, and hands new events to the loop to write out. The
+same thread keeps this process's occupancy indexes (see occupancy.py)
+current with changes made by other processes.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import database as db
+import occupancy
+import properties
+import shards
+
+# Where each process serves streams, and the URL browsers use when a proxy
+# puts the feed somewhere else (by default, this port on the page's host)
+FEED_BIND = os.environ.get('HOTEL_FEED_BIND', '0.0.0.0:8001')
+FEED_URL = os.environ.get('HOTEL_FEED_URL', '')
+STREAM_PATH = '/availability/stream'
+
+# Events kept per process for subscribers that are behind or reconnecting
+FEED_BUFFER_SIZE = 1024
+
+# Events kept in availability_events, pruned every FEED_PRUNE_EVERY events
+FEED_RETAIN_EVENTS = 10000
+FEED_PRUNE_EVERY = 500
+
+# How often the follower looks for new events, in seconds
+POLL_INTERVAL = 0.5
+
+# Open streams per process beyond this many are refused with a 503. A
+# stream costs a socket and a few kilobytes, not a thread
+MAX_STREAMS = 2000
+
+# Bytes a stream may have waiting to be sent before it is dropped; the
+# browser reconnects and resumes from its last event
+MAX_BACKLOG = 256 * 1024
+
+# Seconds a client has to send its request line and headers
+REQUEST_TIMEOUT = 10
+
+# Comment lines sent on idle streams so proxies keep them open, in seconds
+HEARTBEAT_INTERVAL = 15
+
+# Streams are closed after this many seconds; EventSource reconnects on its
+# own with Last-Event-ID, so nothing is missed and workers share the load
+STREAM_MAX_SECONDS = 300
+
+# Reconnection delay suggested to EventSource, in milliseconds
+STREAM_RETRY_MS = 3000
+
+class ChangeFeed:
+    """Ring buffer of numbered SSE frames tailed from one database's availability_events"""
+
+    def __init__(self, size=FEED_BUFFER_SIZE):
+        self._frames = deque(maxlen=size)
+        self._last_id = None  # until the first poll
+        self._lock = threading.Lock()
+        self._counters = {'polls': 0, 'loaded': 0, 'resets': 0}
+
+    def poll(self, conn):
+        """Load the events committed since the last poll; returns True if there were any.
+
+        The first poll starts from the most recent buffer's worth.
+        """
+        with self._lock:
+            after = self._last_id
+            if after is None:
+                head = conn.execute('SELECT COALESCE(MAX(event_id), 0) FROM availability_events').fetchone()[0]
+                after = max(head - self._frames.maxlen, 0)
+            rows = conn.execute('''
+                SELECT event_id, event, data FROM availability_events
+                WHERE event_id > ? ORDER BY event_id LIMIT ?
+            ''', (after, self._frames.maxlen)).fetchall()
+            for event_id, event, data in rows:
+                self._frames.append((event_id, f'id: {event_id}\nevent: {event}\ndata: {data}\n\n'))
+            self._last_id = rows[-1][0] if rows else after
+            self._counters['polls'] += 1
+            self._counters['loaded'] += len(rows)
+            return bool(rows)
+
+    @property
+    def primed(self):
+        return self._last_id is not None
+
+    def cursor(self, last_event_id=None):
+        """Where a new subscriber starts: after last_event_id if given, else after the latest event.
+
+        Only valid once the feed has been polled.
+        """
+        with self._lock:
+            if last_event_id is None:
+                return self._last_id
+            return min(last_event_id, self._last_id)
+
+    def frames_after(self, after):
+        """Frames of the events after id after, and the id to continue from.
+
+        frames is None when events after after have already left the buffer.
+        """
+        with self._lock:
+            if self._last_id is None or self._last_id <= after:
+                return [], after
+            if not self._frames or self._frames[0][0] > after + 1:
+                self._counters['resets'] += 1
+                return None, self._last_id
+            return [frame for event_id, frame in self._frames if event_id > after], self._last_id
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['last_event_id'] = self._last_id or 0
+            return stats
+
+# One feed per property database; browsers follow the one they search
+changes = shards.PerShard(ChangeFeed)
+
+class _Subscriber:
+    __slots__ = ('writer', 'after', 'written_at')
+
+    def __init__(self, writer, after, now):
+        self.writer = writer
+        self.after = after
+        self.written_at = now
+
+class FeedServer:
+    """Serves this process's streams from one asyncio loop and feeds them from one follower thread"""
+
+    def __init__(self, limit=MAX_STREAMS):
+        self.limit = limit
+        self.address = None
+        self._loop = None
+        self._server = None
+        self._threads = []
+        self._stopping = threading.Event()
+        self._subscribers = {}  # database -> set of _Subscriber, touched on the loop only
+        self._following = {}  # database -> open streams, read by the follower
+        self._following_lock = threading.Lock()
+        self._open = 0
+        self._counters = {'streams_opened': 0, 'streams_refused': 0}
+
+    def start(self, bind=FEED_BIND):
+        """Listen on host:port (port 0 picks one) and start following; returns (host, port)"""
+        host, _, port = bind.rpartition(':')
+        ready = threading.Event()
+        failed = []
+        loop_thread = threading.Thread(target=self._run_loop, args=(host or None, int(port), ready, failed),
+                                       name='feed-server', daemon=True)
+        loop_thread.start()
+        ready.wait()
+        if failed:
+            raise failed[0]
+        follower = threading.Thread(target=self._follow, name='feed-follower', daemon=True)
+        follower.start()
+        self._threads = [loop_thread, follower]
+        return self.address
+
+    def stop(self):
+        """Close every stream and stop both threads"""
+        self._stopping.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._shut_down)
+        for thread in self._threads:
+            thread.join(5)
+
+    def stats(self):
+        return {'subscribers': self._open, 'max_streams': self.limit, **self._counters}
+
+    def _run_loop(self, host, port, ready, failed):
+        loop = asyncio.new_event_loop()
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._serve, host, port, reuse_port=True, backlog=1024))
+        except OSError as e:
+            failed.append(e)
+            ready.set()
+            loop.close()
+            return
+        self.address = self._server.sockets[0].getsockname()[:2]
+        self._loop = loop
+        heartbeat = loop.create_task(self._heartbeat())
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            heartbeat.cancel()
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.close()
+
+    def _shut_down(self):
+        self._server.close()
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                subscriber.writer.transport.abort()
+        self._loop.call_later(0.1, self._loop.stop)
+
+    # The follower thread
+
+    def _follow(self):
+        """Poll availability_events of every database with subscribers or an occupancy index here"""
+        connections = {}
+        try:
+            while not self._stopping.wait(POLL_INTERVAL):
+                with self._following_lock:
+                    streamed = set(self._following)
+                indexes = {database: index for database, index in occupancy.index.instances().items() if index.built}
+                following = streamed | set(indexes)
+                for database in list(connections):
+                    if database not in following:
+                        connections.pop(database).close()
+                for database in following:
+                    conn = connections.get(database)
+                    if conn is None:
+                        conn = connections[database] = db.connect(database)
+                    try:
+                        if database in indexes:
+                            indexes[database].follow(conn)
+                        if database in streamed and changes.instance(database).poll(conn):
+                            self._loop.call_soon_threadsafe(self._deliver, database)
+                    except RuntimeError:
+                        return  # the loop has stopped
+                    except Exception:
+                        connections.pop(database).close()
+        finally:
+            for conn in connections.values():
+                conn.close()
+
+    # The loop
+
+    def _deliver(self, database):
+        feed = changes.instance(database)
+        for subscriber in list(self._subscribers.get(database, ())):
+            frames, subscriber.after = feed.frames_after(subscriber.after)
+            if frames is None:
+                self._write(subscriber, f'id: {subscriber.after}\nevent: reset\ndata: {{}}\n\n')
+            elif frames:
+                self._write(subscriber, ''.join(frames))
+
+    def _write(self, subscriber, text):
+        transport = subscriber.writer.transport
+        if transport.is_closing():
+            return
+        subscriber.writer.write(text.encode())
+        subscriber.written_at = self._loop.time()
+        if transport.get_write_buffer_size() > MAX_BACKLOG:
+            transport.abort()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL / 3)
+            idle_since = self._loop.time() - HEARTBEAT_INTERVAL
+            for subscribers in list(self._subscribers.values()):
+                for subscriber in list(subscribers):
+                    if subscriber.written_at <= idle_since:
+                        self._write(subscriber, ': keepalive\n\n')
+
+    async def _serve(self, reader, writer):
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+                method, target, headers = _parse_request(head)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                return
+            if method == 'OPTIONS':
+                # Preflight for the Last-Event-ID header sent on reconnect
+                writer.write(_response('204 No Content', {'Access-Control-Allow-Headers': 'Last-Event-ID, Cache-Control',
+                                                          'Access-Control-Max-Age': '86400'}))
+                return
+            url = urlsplit(target)
+            query = parse_qs(url.query)
+            prop = properties.get_property(query.get('property', [properties.DEFAULT_PROPERTY])[0])
+            if method != 'GET' or url.path != STREAM_PATH or prop is None:
+                writer.write(_response('404 Not Found', body='Not found'))
+                return
+            if self._open >= self.limit:
+                self._counters['streams_refused'] += 1
+                writer.write(_response('503 Service Unavailable', {'Retry-After': str(STREAM_RETRY_MS // 1000)},
+                                       'Too many open streams. Please try again later.'))
+                return
+            try:
+                last_event_id = int(headers['last-event-id']) if 'last-event-id' in headers else None
+            except ValueError:
+                last_event_id = None
+            await self._subscribe(prop['database'], last_event_id, reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _subscribe(self, database, last_event_id, reader, writer):
+        self._open += 1
+        self._counters['streams_opened'] += 1
+        try:
+            feed = changes.instance(database)
+            if not feed.primed:
+                # Settle where the feed starts before handing out a cursor
+                await self._loop.run_in_executor(None, _prime, database)
+            subscriber = _Subscriber(writer, feed.cursor(last_event_id), self._loop.time())
+            writer.write(_response('200 OK', {'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache',
+                                              'X-Accel-Buffering': 'no'}, f'retry: {STREAM_RETRY_MS}\n\n',
+                                   length=False))
+            self._subscribers.setdefault(database, set()).add(subscriber)
+            with self._following_lock:
+                self._following[database] = self._following.get(database, 0) + 1
+            try:
+                if last_event_id is not None:
+                    self._deliver(database)
+                # Browsers send nothing more; wait for them to go away or for the stream's time to run out
+                await asyncio.wait_for(_until_closed(reader), STREAM_MAX_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._subscribers[database].discard(subscriber)
+                with self._following_lock:
+                    self._following[database] -= 1
+                    if not self._following[database]:
+                        del self._following[database]
+        finally:
+            self._open -= 1
+
+def _prime(database):
+    conn = db.connect(database)
+    try:
+        changes.instance(database).poll(conn)
+    finally:
+        conn.close()
+
+async def _until_closed(reader):
+    while await reader.read(1024):
+        pass
+
+def _parse_request(head):
+    request_line, *lines = head.decode('latin-1').split('\r\n')
+    method, target, _ = request_line.split(' ', 2)
+    headers = {}
+    for line in lines:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+def _response(status, headers=None, body='', length=True):
+    lines = [f'HTTP/1.1 {status}', 'Access-Control-Allow-Origin: *']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    if length:
+        lines += ['Content-Type: text/plain', f'Content-Length: {len(body.encode())}', 'Connection: close']
+    else:
+        lines.append('Connection: close')  # the stream ends when the connection does
+    return ('\r\n'.join(lines) + '\r\n\r\n' + body).encode()
+
+server = FeedServer()
+
+def start(bind=FEED_BIND):
+    """Serve this process's streams; called once per worker process"""
+    return server.start(bind)
+
+def stream_url(host, property_id):
+    """URL a page on host (the request's Host header) subscribes to for property_id"""
+    base = FEED_URL
+    if not base:
+        hostname = urlsplit('//' + host).hostname or 'localhost'
+        if ':' in hostname:
+            hostname = f'[{hostname}]'
+        base = f'//{hostname}:{FEED_BIND.rpartition(":")[2]}{STREAM_PATH}'
+    return f'{base}?property={property_id}'
+
+def stats():
+    """This process's feed counters for the current property, and its stream counters"""
+    return dict(changes.stats(), **server.stats())
+
+# Writers record their events with the connection making the change, inside
+# its transaction, so an event is committed (or rolled back) with the change
+# and adds no transaction of its own. None of these commit.
+
+STAY_EVENT_SQL = '''
+    INSERT INTO availability_events (event, data, booking_id, booking_status)
+    SELECT 'stay', json_object('room_id', CAST(?2 AS INTEGER), 'check_in', ?3, 'check_out', ?4,
+                               'available', json(CASE WHEN EXISTS (
+                                   SELECT 1 FROM rooms WHERE room_id = ?2 AND status != 'maintenance'
+                               ) AND NOT EXISTS (
+                                   SELECT 1 FROM bookings
+                                   WHERE room_id = ?2 AND status NOT IN ('cancelled', 'checked_out', 'no_show')
+                                   AND check_in_date < ?4 AND check_out_date > ?3
+                               ) THEN 'true' ELSE 'false' END)),
+           ?1, (SELECT status FROM bookings WHERE booking_id = ?1)
+'''
+
+def stays_changed(conn, bookings):
+    """(booking_id, room_id, check_in, check_out) bookings were made, changed or released.
+
+    Each event says whether the room is now free for those dates, and
+    records the booking's status, as the transaction sees them, so call
+    this after the booking writes.
+    """
+    bookings = [(booking_id, room_id, str(check_in), str(check_out))
+                for booking_id, room_id, check_in, check_out in bookings]
+    conn.executemany(STAY_EVENT_SQL, bookings)
+    _prune(conn, len(bookings))
+
+def rooms_changed(conn, rooms):
+    """(room_id, status) rooms were added or edited, or deleted when status is None"""
+    _record(conn, [('room', {'room_id': room_id, 'status': status}) for room_id, status in rooms])
+
+def rates_changed(conn, start, end):
+    """Prices for the nights [start, end) changed"""
+    _record(conn, [('rates', {'start': str(start), 'end': str(end)})])
+
+def _record(conn, events):
+    conn.executemany('INSERT INTO availability_events (event, data) VALUES (?, ?)',
+                     [(event, json.dumps(data, separators=(',', ':'))) for event, data in events])
+    _prune(conn, len(events))
+
+def _prune(conn, added):
+    """Drop old events once the ids pass a multiple of FEED_PRUNE_EVERY"""
+    if not added:
+        return
+    last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    if last_id // FEED_PRUNE_EVERY != (last_id - added) // FEED_PRUNE_EVERY:
+        conn.execute('DELETE FROM availability_events WHERE event_id <= ?', (last_id - FEED_RETAIN_EVENTS,))
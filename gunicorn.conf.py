@@ -0,0 +1,80 @@
+"""
+gunicorn settings for production serving
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker processes are forked from a master that never imports the app, so
+`kill -HUP <master pid>` is a graceful reload: new workers start on the
+current code (and schema), and old ones finish their requests first.
+Settings can be overridden on the command line (-w, --threads, -b) or
+with the environment variables below.
+"""
+
+import fcntl
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+
+bind = os.environ.get('HOTEL_BIND', '0.0.0.0:8000')
+
+# Processes, and threads per process for ordinary requests. Live
+# availability streams are served on HOTEL_FEED_BIND (default port 8001)
+# by each worker's feed server, which every worker listens on, and do not
+# take these threads; see feed.py.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('HOTEL_THREADS', 8))
+worker_class = 'gthread'
+
+# Seconds a silent worker may live, and in-flight requests get on reload
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then; jitter keeps them from restarting together
+max_requests = 10000
+max_requests_jitter = 1000
+
+preload_app = False
+
+# The worker holding this lock runs the background jobs; see post_worker_init
+JOBS_LOCK_FILE = os.environ.get('HOTEL_JOBS_LOCK', 'hotel_booking.jobs.lock')
+
+_jobs_lock = []
+
+def _prepare_database(server):
+    # In a child process, so the master never imports (and pins) the app's code
+    server.log.info('preparing database')
+    subprocess.run([sys.executable, '-c', 'import app; app.prepare_database()'], check=True)
+
+def on_starting(server):
+    _prepare_database(server)
+
+def on_reload(server):
+    _prepare_database(server)
+
+def post_worker_init(worker):
+    """Size the load limits, warm up and start the feed server before accepting connections, then wait to become the background job runner.
+
+    Exactly one worker holds the jobs lock at a time. The others block on it
+    in a daemon thread, so when that worker exits (reload, max_requests,
+    crash) the next one takes over the jobs.
+    """
+    import feed
+    import throttle
+    from app import warm_up, start_background_jobs
+
+    throttle.configure(worker.cfg.threads)
+    warm_up()
+    feed.start()
+    worker.log.info('worker %s warmed up', worker.pid)
+
+    def run_jobs_when_lock_is_free():
+        lock = open(JOBS_LOCK_FILE, 'a')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _jobs_lock.append(lock)
+        worker.log.info('worker %s runs the background jobs', worker.pid)
+        start_background_jobs()
+
+    threading.Thread(target=run_jobs_when_lock_is_free, name='jobs-lock', daemon=True).start()
@@ -1,52 +1,204 @@
-"""
-Script to initialize the database with sample data
-Run this after the database is created to populate it with sample rooms
-"""
-
-import sqlite3
-import hashlib
-from datetime import date, timedelta
-
-DATABASE = 'hotel_booking.db'
-
-def init_sample_data():
-    """Initialize database with sample data"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    
-    # Sample rooms
-    sample_rooms = [
-        ('101', 'Single', 50.00, 1, 'WiFi, TV, AC', 'available'),
-        ('102', 'Single', 50.00, 1, 'WiFi, TV, AC', 'available'),
-        ('201', 'Double', 80.00, 2, 'WiFi, TV, AC, Mini Bar', 'available'),
-        ('202', 'Double', 80.00, 2, 'WiFi, TV, AC, Mini Bar', 'available'),
-        ('301', 'Suite', 150.00, 4, 'WiFi, TV, AC, Mini Bar, Jacuzzi', 'available'),
-        ('302', 'Suite', 150.00, 4, 'WiFi, TV, AC, Mini Bar, Jacuzzi', 'available'),
-        ('401', 'Deluxe', 200.00, 2, 'WiFi, TV, AC, Mini Bar, Balcony, Ocean View', 'available'),
-        ('402', 'Deluxe', 200.00, 2, 'WiFi, TV, AC, Mini Bar, Balcony, Ocean View', 'available'),
-        ('501', 'Presidential', 500.00, 6, 'WiFi, TV, AC, Mini Bar, Jacuzzi, Balcony, Ocean View, Butler Service', 'available'),
-    ]
-    
-    print("Adding sample rooms...")
-    for room in sample_rooms:
-        try:
-            conn.execute('''
-                INSERT INTO rooms (room_number, room_type, price_per_night, capacity, amenities, status)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', room)
-            print(f"  Added room {room[0]}")
-        except sqlite3.IntegrityError:
-            print(f"  Room {room[0]} already exists, skipping...")
-    
-    conn.commit()
-    conn.close()
-    print("\nSample data initialization complete!")
-    print("\nYou can now run the application with: python app.py")
-
-if __name__ == '__main__':
-    try:
-        init_sample_data()
-    except sqlite3.OperationalError as e:
-        print(f"Error: {e}")
-        print("Make sure the database is initialized first by running app.py once.")
-
+"""
+Script to initialize the database with sample data
+Run this after the database is created to populate it with sample rooms
+
+Pass volumes to bulk-load a synthetic production-sized data set instead:
+    python init_sample_data.py --rooms 5000 --customers 200000 --bookings 1000000
+"""
+
+import argparse
+import itertools
+import random
+import sqlite3
+import hashlib
+import time
+from datetime import date, datetime, timedelta
+
+import amenities
+import feed
+
+DATABASE = 'hotel_booking.db'
+
+def init_sample_data():
+    """Initialize database with sample data"""
+    conn = sqlite3.connect(DATABASE)
+    conn.row_factory = sqlite3.Row
+    
+    # Sample rooms
+    sample_rooms = [
+        ('101', 'Single', 50.00, 1, 'WiFi, TV, AC', 'available'),
+        ('102', 'Single', 50.00, 1, 'WiFi, TV, AC', 'available'),
+        ('201', 'Double', 80.00, 2, 'WiFi, TV, AC, Mini Bar', 'available'),
+        ('202', 'Double', 80.00, 2, 'WiFi, TV, AC, Mini Bar', 'available'),
+        ('301', 'Suite', 150.00, 4, 'WiFi, TV, AC, Mini Bar, Jacuzzi', 'available'),
+        ('302', 'Suite', 150.00, 4, 'WiFi, TV, AC, Mini Bar, Jacuzzi', 'available'),
+        ('401', 'Deluxe', 200.00, 2, 'WiFi, TV, AC, Mini Bar, Balcony, Ocean View', 'available'),
+        ('402', 'Deluxe', 200.00, 2, 'WiFi, TV, AC, Mini Bar, Balcony, Ocean View', 'available'),
+        ('501', 'Presidential', 500.00, 6, 'WiFi, TV, AC, Mini Bar, Jacuzzi, Balcony, Ocean View, Butler Service', 'available'),
+    ]
+    
+    print("Adding sample rooms...")
+    added = []
+    for room in sample_rooms:
+        try:
+            cursor = conn.execute('''
+                INSERT INTO rooms (room_number, room_type, price_per_night, capacity, amenities, status)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', room)
+            added.append((cursor.lastrowid, room[5]))
+            print(f"  Added room {room[0]}")
+        except sqlite3.IntegrityError:
+            print(f"  Room {room[0]} already exists, skipping...")
+    
+    amenities.sync_rooms(conn)
+    # Tell running workers' occupancy indexes about the new rooms
+    feed.rooms_changed(conn, added)
+    conn.commit()
+    conn.close()
+    print("\nSample data initialization complete!")
+    print("\nYou can now run the application with: python app.py")
+
+ROOM_TYPES = [
+    # room_type, price_per_night, capacity, amenities
+    ('Single', 50.00, 1, 'WiFi, TV, AC'),
+    ('Double', 80.00, 2, 'WiFi, TV, AC, Mini Bar'),
+    ('Suite', 150.00, 4, 'WiFi, TV, AC, Mini Bar, Jacuzzi'),
+    ('Deluxe', 200.00, 2, 'WiFi, TV, AC, Mini Bar, Balcony, Ocean View'),
+    ('Presidential', 500.00, 6, 'WiFi, TV, AC, Mini Bar, Jacuzzi, Balcony, Ocean View, Butler Service'),
+]
+PAYMENT_METHODS = ['credit_card', 'debit_card', 'cash', 'online_transfer']
+HISTORY_DAYS = 3 * 365   # bookings start this far in the past...
+FUTURE_DAYS = 365        # ...and run this far into the future
+GENERATE_CHUNK_SIZE = 50000  # bookings built and inserted per executemany()
+
+def generate_data(conn, rooms, customers, bookings, seed=0):
+    """Bulk-load synthetic rooms, customers, bookings and payments.
+
+    Everything is inserted with executemany inside one transaction, the
+    bookings and payments a chunk at a time from a generator. Stays
+    never overlap within a room, so the data set is a valid booking history:
+    past stays are checked out (or cancelled), current ones checked in and
+    future ones confirmed or pending. Every booking that was paid for gets a
+    payment. Returns the number of rows inserted per table.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    conn.row_factory = sqlite3.Row  # amenities.sync_rooms() reads columns by name
+    
+    conn.execute('BEGIN')
+    
+    first_room = _next_id(conn, 'rooms', 'room_id')
+    conn.executemany('''
+        INSERT INTO rooms (room_number, room_type, price_per_night, capacity, amenities, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', ((f"S{first_room + n}",) + ROOM_TYPES[n % len(ROOM_TYPES)] +
+          ('maintenance' if rng.random() < 0.01 else 'available',) for n in range(rooms)))
+    room_prices = {first_room + n: ROOM_TYPES[n % len(ROOM_TYPES)][1] for n in range(rooms)}
+    
+    first_customer = _next_id(conn, 'customers', 'customer_id')
+    conn.executemany('''
+        INSERT INTO customers (first_name, last_name, email, phone, address)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((f"Guest{n}", f"Synthetic{n % 997}", f"guest{first_customer + n}@example.com",
+           f"555{n:07d}", f"{n} Sample Street") for n in range(customers)))
+    
+    first_booking = _next_id(conn, 'bookings', 'booking_id')
+    stays = _generate_bookings(rng, today, room_prices, first_customer, customers, bookings)
+    booking_count = payment_count = 0
+    # Insert in chunks so only GENERATE_CHUNK_SIZE bookings are held in memory
+    while True:
+        booking_rows = list(itertools.islice(stays, GENERATE_CHUNK_SIZE))
+        if not booking_rows:
+            break
+        conn.executemany('''
+            INSERT INTO bookings (customer_id, room_id, check_in_date, check_out_date,
+                                  number_of_guests, total_amount, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', booking_rows)
+        
+        payment_rows = [
+            (first_booking + booking_count + n, row[5], rng.choice(PAYMENT_METHODS), 'completed',
+             f"TXN{first_booking + booking_count + n}SYN", row[7])
+            for n, row in enumerate(booking_rows)
+            if row[6] in ('confirmed', 'checked_in', 'checked_out')
+        ]
+        conn.executemany('''
+            INSERT INTO payments (booking_id, amount, payment_method, payment_status, transaction_id, payment_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', payment_rows)
+        booking_count += len(booking_rows)
+        payment_count += len(payment_rows)
+    
+    amenities.sync_rooms(conn)
+    conn.commit()
+    return {'rooms': rooms, 'customers': customers, 'bookings': booking_count, 'payments': payment_count}
+
+def _generate_bookings(rng, today, room_prices, first_customer, customers, bookings):
+    """Yield booking rows, laying stays end to end per room with random gaps until the quota is met"""
+    rooms = len(room_prices)
+    per_room = bookings // rooms if rooms else 0
+    extra = bookings - per_room * rooms if rooms else 0
+    for offset, room_id in enumerate(room_prices):
+        day = today - timedelta(days=rng.randint(HISTORY_DAYS // 2, HISTORY_DAYS))
+        span = HISTORY_DAYS + FUTURE_DAYS
+        count = per_room + (1 if offset < extra else 0)
+        for _ in range(count):
+            day += timedelta(days=rng.randint(0, max(1, span // max(count, 1) - 4)))
+            nights = rng.randint(1, 7)
+            check_in, check_out = day, day + timedelta(days=nights)
+            day = check_out
+            
+            if check_out <= today:
+                status = 'cancelled' if rng.random() < 0.05 else 'checked_out'
+            elif check_in <= today:
+                status = 'checked_in'
+            else:
+                status = rng.choice(['confirmed', 'confirmed', 'pending', 'cancelled'])
+            created_at = datetime.combine(check_in - timedelta(days=rng.randint(1, 90)), datetime.min.time())
+            created_at += timedelta(seconds=rng.randint(0, 86399))
+            
+            yield (
+                first_customer + rng.randrange(customers) if customers else None,
+                room_id, check_in.isoformat(), check_out.isoformat(), rng.randint(1, 4),
+                room_prices[room_id] * nights, status, created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            )
+
+def _next_id(conn, table, column):
+    """Id the next row inserted into table will get"""
+    row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+    last = row[0] if row else 0
+    return max(last, conn.execute(f'SELECT COALESCE(MAX({column}), 0) FROM {table}').fetchone()[0]) + 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Populate the database with sample or synthetic data')
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--rooms', type=int, help='synthetic rooms to generate')
+    parser.add_argument('--customers', type=int, default=0, help='synthetic customers to generate')
+    parser.add_argument('--bookings', type=int, default=0, help='synthetic bookings to generate')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    if args.rooms is None:
+        init_sample_data()
+        return
+    
+    if args.bookings and not (args.rooms and args.customers):
+        parser.error('--bookings needs at least one room and one customer')
+    
+    conn = sqlite3.connect(args.database, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')  # bulk load; a crash just means re-running
+    started = time.perf_counter()
+    counts = generate_data(conn, args.rooms, args.customers, args.bookings, args.seed)
+    conn.close()
+    
+    print(f"Generated {counts['rooms']} rooms, {counts['customers']} customers, "
+          f"{counts['bookings']} bookings and {counts['payments']} payments "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except sqlite3.OperationalError as e:
+        print(f"Error: {e}")
+        print("Make sure the database is initialized first by running app.py once.")
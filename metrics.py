@@ -0,0 +1,168 @@
+"""
+Request and SQL metrics - recorded per request, served in Prometheus text format
+"""
+
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with the route that ran them
+SLOW_QUERY_MS = 100
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+CONNECTION_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10)
+
+# Distinct statements tracked separately; the rest are grouped as "other"
+MAX_STATEMENT_SERIES = 500
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+
+def normalize_sql(sql):
+    """Collapse whitespace and IN (?, ?, ...) lists so one statement is one series"""
+    return _PLACEHOLDER_LIST.sub('(?...)', _WHITESPACE.sub(' ', sql).strip())
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+class Registry:
+    """Process-wide metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = {}
+        self.routes = {}
+        self.route_queries = {}
+        self.route_connections = {}
+        self.counters = {'queries': 0, 'slow_queries': 0, 'connections_opened': 0, 'requests': 0}
+
+    def record_query(self, sql, seconds):
+        statement = normalize_sql(sql)
+        with self._lock:
+            self.counters['queries'] += 1
+            if statement not in self.statements and len(self.statements) >= MAX_STATEMENT_SERIES:
+                statement = 'other'
+            histogram = self.statements.get(statement)
+            if histogram is None:
+                histogram = self.statements[statement] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def record_slow_query(self):
+        with self._lock:
+            self.counters['slow_queries'] += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.counters['connections_opened'] += 1
+
+    def record_request(self, route, seconds, queries, connections):
+        with self._lock:
+            self.counters['requests'] += 1
+            if route not in self.routes:
+                self.routes[route] = Histogram(LATENCY_BUCKETS)
+                self.route_queries[route] = Histogram(QUERY_COUNT_BUCKETS)
+                self.route_connections[route] = Histogram(CONNECTION_COUNT_BUCKETS)
+            self.routes[route].observe(seconds)
+            self.route_queries[route].observe(queries)
+            self.route_connections[route].observe(connections)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, value in self.counters.items():
+                lines.append(f'# TYPE hotel_{name}_total counter')
+                lines.append(f'hotel_{name}_total {value}')
+            lines.append('# TYPE hotel_request_duration_seconds histogram')
+            for (endpoint, method), histogram in sorted(self.routes.items()):
+                lines += histogram.render('hotel_request_duration_seconds',
+                                          f'endpoint="{endpoint}",method="{method}"')
+            lines.append('# TYPE hotel_request_queries histogram')
+            for (endpoint, method), histogram in sorted(self.route_queries.items()):
+                lines += histogram.render('hotel_request_queries', f'endpoint="{endpoint}",method="{method}"')
+            # New connections, not pool reuses, so a route that stops reusing them shows up
+            lines.append('# TYPE hotel_request_connections histogram')
+            for (endpoint, method), histogram in sorted(self.route_connections.items()):
+                lines += histogram.render('hotel_request_connections', f'endpoint="{endpoint}",method="{method}"')
+            lines.append('# TYPE hotel_sql_duration_seconds histogram')
+            for statement, histogram in sorted(self.statements.items()):
+                lines += histogram.render('hotel_sql_duration_seconds', f'statement="{_escape(statement)}"')
+        return lines
+
+registry = Registry()
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+def record_query(sql, seconds):
+    """Called by the database layer after every statement"""
+    registry.record_query(sql, seconds)
+    route = None
+    if has_request_context():
+        g.sql_queries = g.get('sql_queries', 0) + 1
+        g.sql_seconds = g.get('sql_seconds', 0.0) + seconds
+        route = request.endpoint
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        registry.record_slow_query()
+        logger.warning('slow query (%.1f ms) in %s: %s', seconds * 1000, route or '-', normalize_sql(sql))
+
+def record_connection():
+    """Called by the database layer whenever it opens a new connection"""
+    registry.record_connection()
+    if has_request_context():
+        g.db_connections = g.get('db_connections', 0) + 1
+
+def start_request():
+    g.request_started = time.perf_counter()
+
+def finish_request(response):
+    """Record the request's latency, queries and new connections; adds a Server-Timing header"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    seconds = time.perf_counter() - started
+    queries = g.get('sql_queries', 0)
+    connections = g.get('db_connections', 0)
+    registry.record_request((request.endpoint or 'unknown', request.method), seconds, queries, connections)
+    response.headers['Server-Timing'] = (
+        f'db;dur={g.get("sql_seconds", 0.0) * 1000:.2f};desc="{queries} queries, '
+        f'{connections} new connections", total;dur={seconds * 1000:.2f}'
+    )
+    return response
+
+def render(extra=None):
+    """Everything in Prometheus text format; extra maps metric name -> {label: value}"""
+    lines = registry.render()
+    for name, values in (extra or {}).items():
+        lines.append(f'# TYPE {name} gauge')
+        for label, value in sorted(values.items()):
+            lines.append(f'{name}{{name="{label}"}} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,148 @@
+"""
+Night audit - expires stale pending holds, marks no-shows and checks out overdue stays
+
+Each step works through its bookings in chunks of AUDIT_CHUNK_SIZE, one
+short write transaction per chunk, so live bookings never wait on the
+write lock for long. Every change is recorded in night_audit_log.
+
+Run directly to audit once:
+    python night_audit.py
+    python night_audit.py --dry-run
+"""
+
+import argparse
+import logging
+import threading
+import time
+from datetime import date
+
+import cache
+import database as db
+import feed
+import occupancy
+import properties
+
+logger = logging.getLogger(__name__)
+
+# Pending bookings that have not been paid within this many minutes are released
+PENDING_HOLD_MINUTES = 30
+
+# Bookings changed per write transaction, and the pause between transactions
+AUDIT_CHUNK_SIZE = 200
+AUDIT_CHUNK_PAUSE = 0.05
+
+# How often the background worker runs, in seconds
+AUDIT_INTERVAL = 900
+
+# action -> (bookings to change, new status). Parameters are the hold cutoff
+# ('-30 minutes') and today's date.
+AUDIT_STEPS = {
+    'expired': ('''
+        status = 'pending' AND (created_at < datetime('now', :hold) OR check_in_date < :today)
+    ''', 'cancelled'),
+    'no_show': ('''
+        status = 'confirmed' AND check_in_date < :today
+    ''', 'no_show'),
+    'auto_checkout': ('''
+        status = 'checked_in' AND check_out_date < :today
+    ''', 'checked_out'),
+}
+
+def _audit_chunk(conn, action, where, new_status, params):
+    """Change one chunk of bookings; returns the rows changed"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows = conn.execute(f'''
+            SELECT booking_id, room_id, check_in_date, check_out_date, status FROM bookings
+            WHERE {where}
+            LIMIT :limit
+        ''', params).fetchall()
+        if not rows:
+            conn.rollback()
+            return rows
+        ids = [row['booking_id'] for row in rows]
+        placeholders = ','.join('?' * len(ids))
+        conn.execute(f'''
+            INSERT INTO night_audit_log (booking_id, action, previous_status, new_status)
+            SELECT booking_id, ?, status, ? FROM bookings WHERE booking_id IN ({placeholders})
+        ''', [action, new_status] + ids)
+        conn.execute(f'UPDATE bookings SET status = ? WHERE booking_id IN ({placeholders})', [new_status] + ids)
+        if new_status == 'checked_out':
+            # Free rooms nobody else is staying in
+            room_ids = list({row['room_id'] for row in rows})
+            conn.execute(f'''
+                UPDATE rooms SET status = 'available'
+                WHERE status = 'occupied' AND room_id IN ({','.join('?' * len(room_ids))})
+                AND NOT EXISTS (
+                    SELECT 1 FROM bookings b WHERE b.room_id = rooms.room_id AND b.status = 'checked_in'
+                )
+            ''', room_ids)
+            feed.rooms_changed(conn, conn.execute(
+                f"SELECT room_id, status FROM rooms WHERE room_id IN ({','.join('?' * len(room_ids))})",
+                room_ids).fetchall())
+        feed.stays_changed(conn, [(row['booking_id'], row['room_id'], row['check_in_date'], row['check_out_date'])
+                                  for row in rows])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return rows
+
+def _publish(conn, action, rows):
+    """Bring this process's occupancy index and response cache up to date"""
+    occupancy.index.follow(conn)
+    for row in rows:
+        cache.invalidate_stay(row['check_in_date'], row['check_out_date'],
+                              room_status_changed=action == 'auto_checkout')
+
+def run_audit(conn, today=None, chunk_size=AUDIT_CHUNK_SIZE, pause=AUDIT_CHUNK_PAUSE, dry_run=False):
+    """Run every audit step; returns {action: bookings changed}"""
+    params = {'hold': f'-{PENDING_HOLD_MINUTES} minutes', 'today': (today or date.today()).isoformat(),
+              'limit': chunk_size}
+    changed = {}
+    for action, (where, new_status) in AUDIT_STEPS.items():
+        if dry_run:
+            changed[action] = conn.execute(f'SELECT COUNT(*) FROM bookings WHERE {where}', params).fetchone()[0]
+            continue
+        changed[action] = 0
+        while True:
+            rows = _audit_chunk(conn, action, where, new_status, params)
+            if not rows:
+                break
+            _publish(conn, action, rows)
+            changed[action] += len(rows)
+            if len(rows) < chunk_size:
+                break
+            time.sleep(pause)
+        if changed[action]:
+            logger.info('night audit: %s %d bookings', action, changed[action])
+    return changed
+
+def start_worker(interval=AUDIT_INTERVAL):
+    """Run the audit every interval seconds on a daemon thread"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            properties.for_each(run_audit, 'night audit')
+
+    threading.Thread(target=run, name='night-audit', daemon=True).start()
+    return stop
+
+def main():
+    parser = argparse.ArgumentParser(description='Expire stale holds, mark no-shows and check out overdue stays')
+    parser.add_argument('--database', default=db.DATABASE)
+    parser.add_argument('--date', type=date.fromisoformat, help='audit as of this date (default today)')
+    parser.add_argument('--chunk-size', type=int, default=AUDIT_CHUNK_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='only count the bookings that would change')
+    args = parser.parse_args()
+
+    conn = db.connect(args.database)
+    changed = run_audit(conn, args.date, args.chunk_size, dry_run=args.dry_run)
+    conn.close()
+    verb = 'would change' if args.dry_run else 'changed'
+    for action, count in changed.items():
+        print(f"  {action}: {count} bookings {verb}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+In-memory occupancy index - keeps the nights each room is held for
+
+Built from the database, then kept current from availability_events, which
+every write to bookings and rooms records in its own transaction (see
+feed.py). Applying events in id order gives every process the same view
+whichever process made the change: the writing process follows the events
+right after its commit, and the feed follower thread (see
+feed.FeedServer) picks up everyone else's every POLL_INTERVAL.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left, insort
+
+import shards
+
+# Bookings in these states no longer hold their room
+RELEASED_STATUSES = ('cancelled', 'checked_out', 'no_show')
+
+# Rebuild from the database after this many seconds, as a backstop for
+# writes that bypass availability_events (e.g. SQL run by hand). Rebuilds
+# after the first run on a background thread
+REBUILD_INTERVAL = 300
+
+class OccupancyIndex:
+    """Per-room sorted stay intervals with a running maximum of end dates.
+
+    Dates are stored as ISO strings, which sort the same way as the dates
+    themselves. A room is free for [check_in, check_out) when no stay that
+    starts before check_out ends after check_in.
+    """
+
+    def __init__(self, rebuild_interval=REBUILD_INTERVAL):
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._room_status = {}
+        self._stays = {}
+        self._max_ends = {}
+        self._bookings = {}
+        self._built_at = None
+        self._building = threading.Lock()
+        self._event_id = 0  # the last availability event applied
+
+    @property
+    def built(self):
+        return self._built_at is not None
+
+    def build(self, conn):
+        """Load room statuses and active bookings from the database.
+
+        The tables and the latest event id are read in one snapshot, without
+        holding the lock, so lookups carry on meanwhile; follow() then picks
+        up from that event.
+        """
+        conn.execute('BEGIN')
+        try:
+            rooms = conn.execute('SELECT room_id, status FROM rooms').fetchall()
+            bookings = conn.execute('''
+                SELECT booking_id, room_id, check_in_date, check_out_date FROM bookings
+                WHERE status NOT IN ('cancelled', 'checked_out', 'no_show')
+            ''').fetchall()
+            event_id = conn.execute('SELECT COALESCE(MAX(event_id), 0) FROM availability_events').fetchone()[0]
+        finally:
+            conn.rollback()
+
+        room_status = {room['room_id']: room['status'] for room in rooms}
+        stays = {}
+        by_booking = {}
+        for booking in bookings:
+            stay = (str(booking['check_in_date']), str(booking['check_out_date']), booking['booking_id'])
+            stays.setdefault(booking['room_id'], []).append(stay)
+            by_booking[booking['booking_id']] = (booking['room_id'], stay)
+        max_ends = {}
+        for room_id, room_stays in stays.items():
+            room_stays.sort()
+            max_ends[room_id] = _running_max(room_stays)
+
+        with self._lock:
+            self._room_status, self._stays, self._max_ends, self._bookings = room_status, stays, max_ends, by_booking
+            self._event_id = event_id
+            self._built_at = time.monotonic()
+
+    def follow(self, conn):
+        """Apply the availability events committed since the last one applied.
+
+        Does nothing until the index is built. Rebuilds instead if events it
+        has not seen were already pruned.
+        """
+        if self._built_at is None:
+            return
+        after = self._event_id
+        events = conn.execute('''
+            SELECT event_id, event, data, booking_id, booking_status FROM availability_events
+            WHERE event_id > ? ORDER BY event_id
+        ''', (after,)).fetchall()
+        if events and events[0]['event_id'] != after + 1:
+            self.build(conn)
+            return
+        with self._lock:
+            for event in events:
+                # A concurrent follow() or build() may have got further
+                if event['event_id'] <= self._event_id:
+                    continue
+                data = json.loads(event['data'])
+                if event['event'] == 'stay' and event['booking_id'] is not None:
+                    self.apply_booking(event['booking_id'], data['room_id'], data['check_in'], data['check_out'],
+                                       event['booking_status'])
+                elif event['event'] == 'room' and data['status'] is None:
+                    self.remove_room(data['room_id'])
+                elif event['event'] == 'room':
+                    self.set_room_status(data['room_id'], data['status'])
+                self._event_id = event['event_id']
+
+    def refresh_if_stale(self, connect):
+        """Rebuild using a connection from connect() if never built or too old.
+
+        The first build happens here, as there is nothing to answer from
+        yet; later ones run on a background thread while the current index
+        keeps answering. connect() must not depend on the calling thread.
+        """
+        built_at = self._built_at
+        if built_at is not None and time.monotonic() - built_at < self.rebuild_interval:
+            return
+        if built_at is not None:
+            if self._building.acquire(blocking=False):
+                threading.Thread(target=self._rebuild, args=(connect, True), name='occupancy-rebuild',
+                                 daemon=True).start()
+            return
+        with self._building:
+            if self._built_at is None:
+                self._rebuild(connect)
+
+    def _rebuild(self, connect, release=False):
+        try:
+            conn = connect()
+            try:
+                self.build(conn)
+            finally:
+                conn.close()
+        finally:
+            if release:
+                self._building.release()
+
+    def is_available(self, room_id, check_in, check_out):
+        """True if the room exists, is bookable and is free for the stay"""
+        with self._lock:
+            status = self._room_status.get(room_id)
+            if status is None or status == 'maintenance':
+                return False
+            stays = self._stays.get(room_id)
+            if not stays:
+                return True
+            # Stays starting before check_out are stays[:pos]
+            pos = bisect_left(stays, (check_out,))
+            return pos == 0 or self._max_ends[room_id][pos - 1] <= check_in
+
+    def apply_booking(self, booking_id, room_id, check_in, check_out, status):
+        """Record a booking's current state, adding or releasing its stay; None means it is gone"""
+        with self._lock:
+            self._remove(booking_id)
+            if status is None or status in RELEASED_STATUSES:
+                return
+            stay = (str(check_in), str(check_out), booking_id)
+            insort(self._stays.setdefault(room_id, []), stay)
+            self._bookings[booking_id] = (room_id, stay)
+            self._reindex(room_id)
+
+    def set_room_status(self, room_id, status):
+        """Track a room that was added or edited"""
+        with self._lock:
+            self._room_status[room_id] = status
+
+    def remove_room(self, room_id):
+        """Forget a deleted room and every stay held against it"""
+        with self._lock:
+            self._room_status.pop(room_id, None)
+            for stay in self._stays.pop(room_id, []):
+                self._bookings.pop(stay[2], None)
+            self._max_ends.pop(room_id, None)
+
+    def _remove(self, booking_id):
+        entry = self._bookings.pop(booking_id, None)
+        if entry is None:
+            return
+        room_id, stay = entry
+        stays = self._stays[room_id]
+        stays.remove(stay)
+        self._reindex(room_id)
+
+    def _reindex(self, room_id):
+        self._max_ends[room_id] = _running_max(self._stays.get(room_id, []))
+
+def _running_max(stays):
+    """Latest end date among stays[:i + 1], for every i"""
+    max_ends = []
+    running = ''
+    for stay in stays:
+        running = max(running, stay[1])
+        max_ends.append(running)
+    return max_ends
+
+# One per property database
+index = shards.PerShard(OccupancyIndex)
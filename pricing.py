@@ -0,0 +1,112 @@
+"""
+Pricing engine - nightly prices from the rate calendar and room-type rate plans
+
+A room's price for a night is, in order of precedence:
+    1. its entry in room_rates for that date
+    2. the highest-priority rate plan for its room type covering that date
+    3. rooms.price_per_night
+Every candidate room for a stay is priced together: one query for the
+rate calendar entries in the window, then one pass over a room x night
+price matrix.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import shards
+
+# Rate plans are re-read at least this often, in seconds, so edits made by
+# another process show up; edits made here invalidate the cache at once
+PLAN_CACHE_TTL = 60
+
+# Up to this many rooms, rate calendar entries are looked up by room id;
+# beyond it the whole window is read and filtered in memory
+ROOM_LOOKUP_LIMIT = 200
+
+class RatePlanCache:
+    """The rate_plans table, kept in memory"""
+
+    def __init__(self, ttl=PLAN_CACHE_TTL):
+        self.ttl = ttl
+        self._plans = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, conn):
+        """Plans in ascending priority, so later plans override earlier ones"""
+        with self._lock:
+            if self._plans is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._plans = [
+                    {'room_type': plan['room_type'],
+                     'start': np.datetime64(plan['start_date'], 'D'),
+                     'end': np.datetime64(plan['end_date'], 'D'),
+                     'price': float(plan['price_per_night'])}
+                    for plan in conn.execute('''
+                        SELECT room_type, start_date, end_date, price_per_night FROM rate_plans
+                        ORDER BY priority, plan_id
+                    ''')
+                ]
+                self._loaded_at = time.monotonic()
+            return self._plans
+
+    def invalidate(self):
+        with self._lock:
+            self._plans = None
+
+# One per property database
+plans = shards.PerShard(RatePlanCache)
+
+def nightly_prices(conn, rooms, start, nights):
+    """(len(rooms), nights) array of prices for the nights from start.
+
+    rooms are rows with room_id, room_type and price_per_night; start is a
+    date or YYYY-MM-DD string.
+    """
+    origin = np.datetime64(str(start), 'D')
+    room_ids = np.array([room['room_id'] for room in rooms], dtype=np.int64)
+    room_types = np.array([room['room_type'] for room in rooms], dtype=object)
+    base = np.array([float(room['price_per_night']) for room in rooms])
+    prices = np.repeat(base[:, None], max(nights, 0), axis=1)
+    if not len(rooms) or nights <= 0:
+        return prices
+
+    for plan in plans.get(conn):
+        first = int(np.clip((plan['start'] - origin).astype(np.int64), 0, nights))
+        last = int(np.clip((plan['end'] - origin).astype(np.int64), 0, nights))
+        if first >= last:
+            continue
+        if plan['room_type'] is None:
+            prices[:, first:last] = plan['price']
+        else:
+            prices[room_types == plan['room_type'], first:last] = plan['price']
+
+    window = (str(origin), str(origin + nights))
+    if len(rooms) <= ROOM_LOOKUP_LIMIT:
+        rates = conn.execute(f'''
+            SELECT room_id, rate_date, price_per_night FROM room_rates
+            WHERE room_id IN ({','.join('?' * len(rooms))}) AND rate_date >= ? AND rate_date < ?
+        ''', [int(room_id) for room_id in room_ids] + list(window)).fetchall()
+    else:
+        rates = conn.execute('''
+            SELECT room_id, rate_date, price_per_night FROM room_rates
+            WHERE rate_date >= ? AND rate_date < ?
+        ''', window).fetchall()
+    if rates:
+        rate_rooms = np.array([rate['room_id'] for rate in rates], dtype=np.int64)
+        order = np.argsort(room_ids)
+        rows = order[np.searchsorted(room_ids, rate_rooms, sorter=order).clip(0, len(rooms) - 1)]
+        known = room_ids[rows] == rate_rooms
+        cols = (np.array([rate['rate_date'] for rate in rates], dtype='datetime64[D]') - origin).astype(np.int64)
+        values = np.array([float(rate['price_per_night']) for rate in rates])
+        prices[rows[known], cols[known]] = values[known]
+    return prices
+
+def quote(conn, room, check_in, check_out):
+    """Total price of one room for the stay; raises ValueError unless check_out is after check_in"""
+    nights = (datetime.strptime(check_out, '%Y-%m-%d') - datetime.strptime(check_in, '%Y-%m-%d')).days
+    if nights <= 0:
+        raise ValueError(f'check-out {check_out} must be after check-in {check_in}')
+    return float(nightly_prices(conn, [room], check_in, nights).sum())
@@ -0,0 +1,213 @@
+"""
+Property registry - one SQLite database per hotel
+
+The main property always exists and uses database.DATABASE. Further
+properties are listed in REGISTRY_DATABASE, each with a database file of
+its own (PROPERTY_DATA_DIR/<property_id>.db by default) holding its rooms,
+bookings, rates and counters. Requests pick a property with ?property=
+(remembered in the session, see app.select_property); staff accounts are
+shared and stay in the main database. fan_out() runs a function against
+every property's database in parallel for the cross-property admin views.
+
+Run directly to list or add properties:
+    python properties.py list
+    python properties.py add harbour "Harbour Hotel"
+"""
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database as db
+import shards
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DATABASE = 'properties.db'
+PROPERTY_DATA_DIR = 'property_data'
+
+DEFAULT_PROPERTY = 'main'
+DEFAULT_PROPERTY_NAME = 'Main Hotel'
+
+# The registry is re-read at least this often, in seconds, so properties
+# added by another process show up; adding one here refreshes it at once
+REGISTRY_TTL = 30
+
+# Properties queried at once by fan_out(), and how long each may take, in seconds
+FANOUT_WORKERS = 8
+FANOUT_TIMEOUT = 10
+
+PROPERTY_ID = re.compile(r'[a-z0-9][a-z0-9_-]{0,31}')
+
+REGISTRY_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS properties (
+        property_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        database TEXT NOT NULL UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+class Registry:
+    """Registered properties, read from the registry database and cached"""
+
+    def __init__(self, path=REGISTRY_DATABASE, ttl=REGISTRY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._properties = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=db.BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute(REGISTRY_SCHEMA)
+        return conn
+
+    def _load(self):
+        # No registry file means only the main property; reading must not create one
+        if not os.path.exists(self.path):
+            return []
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(
+                'SELECT property_id, name, database FROM properties ORDER BY property_id')]
+        finally:
+            conn.close()
+
+    def all(self):
+        """Every property, the main one first"""
+        with self._lock:
+            if self._properties is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._properties = self._load()
+                self._loaded_at = time.monotonic()
+            registered = self._properties
+        main = {'property_id': DEFAULT_PROPERTY, 'name': DEFAULT_PROPERTY_NAME, 'database': db.DATABASE}
+        return [main] + registered
+
+    def get(self, property_id):
+        """The property with this id, or None"""
+        for prop in self.all():
+            if prop['property_id'] == property_id:
+                return prop
+        return None
+
+    def register(self, property_id, name, database=None):
+        """Add a property and create its database; raises ValueError if it cannot be added"""
+        property_id = (property_id or '').strip().lower()
+        name = (name or '').strip()
+        if not PROPERTY_ID.fullmatch(property_id):
+            raise ValueError('Property id must be up to 32 lower-case letters, digits, "-" or "_"')
+        if not name:
+            raise ValueError('Property name is required')
+        if self.get(property_id):
+            raise ValueError(f'Property {property_id} already exists')
+        database = database or os.path.join(PROPERTY_DATA_DIR, f'{property_id}.db')
+        if any(os.path.abspath(prop['database']) == os.path.abspath(database) for prop in self.all()):
+            raise ValueError(f'{database} already belongs to another property')
+
+        # Create the schema first, so requests never reach a half-made database
+        if os.path.dirname(database):
+            os.makedirs(os.path.dirname(database), exist_ok=True)
+        db.apply_schema(db.connect(database))
+
+        conn = self._connect()
+        try:
+            conn.execute('INSERT INTO properties (property_id, name, database) VALUES (?, ?, ?)',
+                         (property_id, name, database))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            raise ValueError(f'Property {property_id} already exists')
+        finally:
+            conn.close()
+        self.invalidate()
+        return {'property_id': property_id, 'name': name, 'database': database}
+
+    def invalidate(self):
+        with self._lock:
+            self._properties = None
+
+registry = Registry()
+
+def all_properties():
+    return registry.all()
+
+def get_property(property_id):
+    return registry.get(property_id)
+
+def databases():
+    """Database path of every property, the main one first"""
+    return [prop['database'] for prop in registry.all()]
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='property-fan-out')
+
+def _call(fn, database):
+    with shards.using(database):
+        conn = db.pool.acquire(database)
+        try:
+            return fn(conn)
+        finally:
+            db.pool.release(conn, database)
+
+def fan_out(fn, props=None):
+    """Run fn(conn) against every property's database in parallel.
+
+    Inside fn, the occupancy index, caches and anything else kept per
+    database are the property's own. Returns (property, result, error)
+    for each property in registry order; error is None, or a message when
+    that property failed or took longer than FANOUT_TIMEOUT, so one slow
+    or broken property does not take the whole view down.
+    """
+    props = registry.all() if props is None else props
+    futures = [_executor.submit(_call, fn, prop['database']) for prop in props]
+    results = []
+    for prop, future in zip(props, futures):
+        try:
+            results.append((prop, future.result(timeout=FANOUT_TIMEOUT), None))
+        except Exception as e:
+            logger.warning('property %s failed: %r', prop['property_id'], e)
+            results.append((prop, None, str(e) or type(e).__name__))
+    return results
+
+def for_each(fn, description):
+    """Run fn(conn) against every property's database in turn, for background jobs.
+
+    A property that fails is logged and the rest still run.
+    """
+    for prop in registry.all():
+        with shards.using(prop['database']):
+            conn = db.connect()
+            try:
+                fn(conn)
+            except Exception:
+                logger.exception('%s failed for property %s', description, prop['property_id'])
+            finally:
+                conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='List or add hotel properties')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='list every property and its database')
+    add = commands.add_parser('add', help='register a property and create its database')
+    add.add_argument('property_id')
+    add.add_argument('name')
+    add.add_argument('--database', help=f'database file (default {PROPERTY_DATA_DIR}/<property_id>.db)')
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        try:
+            prop = registry.register(args.property_id, args.name, args.database)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"  added {prop['property_id']} ({prop['name']}) with database {prop['database']}")
+    else:
+        for prop in registry.all():
+            print(f"  {prop['property_id']:<16} {prop['name']:<32} {prop['database']}")
+
+if __name__ == '__main__':
+    main()
@@ -1,73 +1,376 @@
--- Hotel Booking System Database Schema
-
--- Rooms Table
-CREATE TABLE IF NOT EXISTS rooms (
-    room_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    room_number VARCHAR(10) UNIQUE NOT NULL,
-    room_type VARCHAR(50) NOT NULL,
-    price_per_night DECIMAL(10, 2) NOT NULL,
-    capacity INTEGER NOT NULL,
-    amenities TEXT,
-    status VARCHAR(20) DEFAULT 'available' CHECK(status IN ('available', 'occupied', 'maintenance')),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- Customers Table
-CREATE TABLE IF NOT EXISTS customers (
-    customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    first_name VARCHAR(100) NOT NULL,
-    last_name VARCHAR(100) NOT NULL,
-    email VARCHAR(255) UNIQUE NOT NULL,
-    phone VARCHAR(20) NOT NULL,
-    address TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- Staff Table
-CREATE TABLE IF NOT EXISTS staff (
-    staff_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    first_name VARCHAR(100) NOT NULL,
-    last_name VARCHAR(100) NOT NULL,
-    email VARCHAR(255) UNIQUE NOT NULL,
-    phone VARCHAR(20) NOT NULL,
-    role VARCHAR(50) NOT NULL CHECK(role IN ('admin', 'manager', 'receptionist', 'housekeeping')),
-    username VARCHAR(50) UNIQUE NOT NULL,
-    password_hash VARCHAR(255) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- Bookings Table
-CREATE TABLE IF NOT EXISTS bookings (
-    booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    customer_id INTEGER NOT NULL,
-    room_id INTEGER NOT NULL,
-    check_in_date DATE NOT NULL,
-    check_out_date DATE NOT NULL,
-    number_of_guests INTEGER NOT NULL,
-    total_amount DECIMAL(10, 2) NOT NULL,
-    status VARCHAR(20) DEFAULT 'pending' CHECK(status IN ('pending', 'confirmed', 'checked_in', 'checked_out', 'cancelled')),
-    special_requests TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (customer_id) REFERENCES customers(customer_id) ON DELETE CASCADE,
-    FOREIGN KEY (room_id) REFERENCES rooms(room_id) ON DELETE CASCADE
-);
-
--- Payments Table
-CREATE TABLE IF NOT EXISTS payments (
-    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    booking_id INTEGER NOT NULL,
-    amount DECIMAL(10, 2) NOT NULL,
-    payment_method VARCHAR(50) NOT NULL CHECK(payment_method IN ('credit_card', 'debit_card', 'cash', 'online_transfer')),
-    payment_status VARCHAR(20) DEFAULT 'pending' CHECK(payment_status IN ('pending', 'completed', 'failed', 'refunded')),
-    transaction_id VARCHAR(100),
-    payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (booking_id) REFERENCES bookings(booking_id) ON DELETE CASCADE
-);
-
--- Indexes for better performance
-CREATE INDEX IF NOT EXISTS idx_bookings_dates ON bookings(check_in_date, check_out_date);
-CREATE INDEX IF NOT EXISTS idx_bookings_customer ON bookings(customer_id);
-CREATE INDEX IF NOT EXISTS idx_bookings_room ON bookings(room_id);
-CREATE INDEX IF NOT EXISTS idx_payments_booking ON payments(booking_id);
-CREATE INDEX IF NOT EXISTS idx_rooms_status ON rooms(status);
-
+-- Hotel Booking System Database Schema
+
+-- Rooms Table
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_number VARCHAR(10) UNIQUE NOT NULL,
+    room_type VARCHAR(50) NOT NULL,
+    price_per_night DECIMAL(10, 2) NOT NULL,
+    capacity INTEGER NOT NULL,
+    amenities TEXT,
+    status VARCHAR(20) DEFAULT 'available' CHECK(status IN ('available', 'occupied', 'maintenance')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Bits of the room's amenities (see amenities.py); NULL until indexed
+    amenity_mask INTEGER
+);
+
+-- Customers Table
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    phone VARCHAR(20) NOT NULL,
+    address TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Staff Table
+CREATE TABLE IF NOT EXISTS staff (
+    staff_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    phone VARCHAR(20) NOT NULL,
+    role VARCHAR(50) NOT NULL CHECK(role IN ('admin', 'manager', 'receptionist', 'housekeeping')),
+    username VARCHAR(50) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Bookings Table
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id INTEGER NOT NULL,
+    room_id INTEGER NOT NULL,
+    check_in_date DATE NOT NULL,
+    check_out_date DATE NOT NULL,
+    number_of_guests INTEGER NOT NULL,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' CHECK(status IN ('pending', 'confirmed', 'checked_in', 'checked_out', 'cancelled', 'no_show')),
+    special_requests TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES customers(customer_id) ON DELETE CASCADE,
+    FOREIGN KEY (room_id) REFERENCES rooms(room_id) ON DELETE CASCADE
+);
+
+-- Payments Table
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    booking_id INTEGER NOT NULL,
+    amount DECIMAL(10, 2) NOT NULL,
+    payment_method VARCHAR(50) NOT NULL CHECK(payment_method IN ('credit_card', 'debit_card', 'cash', 'online_transfer')),
+    payment_status VARCHAR(20) DEFAULT 'pending' CHECK(payment_status IN ('pending', 'completed', 'failed', 'refunded')),
+    transaction_id VARCHAR(100),
+    payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (booking_id) REFERENCES bookings(booking_id) ON DELETE CASCADE
+);
+
+-- Indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_bookings_dates ON bookings(check_in_date, check_out_date);
+CREATE INDEX IF NOT EXISTS idx_bookings_customer ON bookings(customer_id);
+CREATE INDEX IF NOT EXISTS idx_bookings_room ON bookings(room_id);
+CREATE INDEX IF NOT EXISTS idx_payments_booking ON payments(booking_id);
+CREATE INDEX IF NOT EXISTS idx_rooms_status ON rooms(status);
+
+-- Keyset pagination of the admin bookings list (newest first, per filter)
+CREATE INDEX IF NOT EXISTS idx_bookings_created ON bookings(created_at, booking_id);
+CREATE INDEX IF NOT EXISTS idx_bookings_status_created ON bookings(status, created_at, booking_id);
+CREATE INDEX IF NOT EXISTS idx_bookings_room_created ON bookings(room_id, created_at, booking_id);
+CREATE INDEX IF NOT EXISTS idx_bookings_customer_created ON bookings(customer_id, created_at, booking_id);
+
+-- Date-ranged payment exports, in payment order
+CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(payment_date, payment_id);
+
+
+-- Indexes required by benchmarks/query_plan_audit.py
+-- Overlap checks seek straight to a room's stays that end after the check-in date
+CREATE INDEX IF NOT EXISTS idx_bookings_room_checkout ON bookings(room_id, check_out_date, check_in_date, status);
+-- Calendar windows read only stays that end after the window starts
+CREATE INDEX IF NOT EXISTS idx_bookings_checkout ON bookings(check_out_date, check_in_date, status, room_id);
+-- Home page room list, already in room number order
+CREATE INDEX IF NOT EXISTS idx_rooms_status_number ON rooms(status, room_number);
+-- Revenue reconciliation sums completed payments from the index alone
+CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(payment_status, amount);
+
+-- Seasonal rates per room type (every type when room_type is NULL) for the
+-- nights from start_date up to, not including, end_date. Where plans
+-- overlap, the highest priority wins.
+CREATE TABLE IF NOT EXISTS rate_plans (
+    plan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL,
+    room_type VARCHAR(50),
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    price_per_night DECIMAL(10, 2) NOT NULL,
+    priority INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CHECK(end_date > start_date)
+);
+
+-- Rate calendar: one room's price on one night, overriding any rate plan
+CREATE TABLE IF NOT EXISTS room_rates (
+    room_id INTEGER NOT NULL,
+    rate_date DATE NOT NULL,
+    price_per_night DECIMAL(10, 2) NOT NULL,
+    PRIMARY KEY (room_id, rate_date),
+    FOREIGN KEY (room_id) REFERENCES rooms(room_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_room_rates_date ON room_rates(rate_date, room_id, price_per_night);
+
+-- Night audit: finds stale holds, no-shows and overdue stays by status and date
+CREATE INDEX IF NOT EXISTS idx_bookings_status_dates ON bookings(status, check_in_date, check_out_date);
+
+-- Every booking the night audit changed, and why
+CREATE TABLE IF NOT EXISTS night_audit_log (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    booking_id INTEGER NOT NULL,
+    action VARCHAR(20) NOT NULL CHECK(action IN ('expired', 'no_show', 'auto_checkout')),
+    previous_status VARCHAR(20) NOT NULL,
+    new_status VARCHAR(20) NOT NULL,
+    audited_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_night_audit_log_booking ON night_audit_log(booking_id);
+
+-- Availability changes for the live feed (see feed.py) and the occupancy
+-- index (see occupancy.py), read by every worker process; AUTOINCREMENT so
+-- ids are never reused after pruning. booking_id and booking_status are set
+-- on stay events and kept out of data, which is sent to browsers
+CREATE TABLE IF NOT EXISTS availability_events (
+    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event VARCHAR(20) NOT NULL,
+    data TEXT NOT NULL,
+    booking_id INTEGER,
+    booking_status VARCHAR(20),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Dashboard counters, kept current by the triggers below and checked
+-- against the real tables by stats.reconcile()
+CREATE TABLE IF NOT EXISTS stats (
+    name VARCHAR(50) PRIMARY KEY,
+    value DECIMAL(12, 2) NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO stats (name, value) SELECT 'total_rooms', COUNT(*) FROM rooms;
+INSERT OR IGNORE INTO stats (name, value) SELECT 'available_rooms', COUNT(*) FROM rooms WHERE status = 'available';
+INSERT OR IGNORE INTO stats (name, value) SELECT 'total_bookings', COUNT(*) FROM bookings;
+INSERT OR IGNORE INTO stats (name, value) SELECT 'pending_bookings', COUNT(*) FROM bookings WHERE status = 'pending';
+INSERT OR IGNORE INTO stats (name, value) SELECT 'total_revenue', COALESCE(SUM(amount), 0) FROM payments WHERE payment_status = 'completed';
+
+CREATE TRIGGER IF NOT EXISTS trg_rooms_stats_insert AFTER INSERT ON rooms
+BEGIN
+    UPDATE stats SET value = value + 1 WHERE name = 'total_rooms';
+    UPDATE stats SET value = value + (NEW.status = 'available') WHERE name = 'available_rooms';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rooms_stats_delete AFTER DELETE ON rooms
+BEGIN
+    UPDATE stats SET value = value - 1 WHERE name = 'total_rooms';
+    UPDATE stats SET value = value - (OLD.status = 'available') WHERE name = 'available_rooms';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rooms_stats_update AFTER UPDATE OF status ON rooms
+BEGIN
+    UPDATE stats SET value = value + (NEW.status = 'available') - (OLD.status = 'available')
+    WHERE name = 'available_rooms';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bookings_stats_insert AFTER INSERT ON bookings
+BEGIN
+    UPDATE stats SET value = value + 1 WHERE name = 'total_bookings';
+    UPDATE stats SET value = value + (NEW.status = 'pending') WHERE name = 'pending_bookings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bookings_stats_delete AFTER DELETE ON bookings
+BEGIN
+    UPDATE stats SET value = value - 1 WHERE name = 'total_bookings';
+    UPDATE stats SET value = value - (OLD.status = 'pending') WHERE name = 'pending_bookings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bookings_stats_update AFTER UPDATE OF status ON bookings
+BEGIN
+    UPDATE stats SET value = value + (NEW.status = 'pending') - (OLD.status = 'pending')
+    WHERE name = 'pending_bookings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_payments_stats_insert AFTER INSERT ON payments
+BEGIN
+    UPDATE stats SET value = value + (CASE WHEN NEW.payment_status = 'completed' THEN NEW.amount ELSE 0 END)
+    WHERE name = 'total_revenue';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_payments_stats_delete AFTER DELETE ON payments
+BEGIN
+    UPDATE stats SET value = value - (CASE WHEN OLD.payment_status = 'completed' THEN OLD.amount ELSE 0 END)
+    WHERE name = 'total_revenue';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_payments_stats_update AFTER UPDATE OF amount, payment_status ON payments
+BEGIN
+    UPDATE stats SET value = value
+        + (CASE WHEN NEW.payment_status = 'completed' THEN NEW.amount ELSE 0 END)
+        - (CASE WHEN OLD.payment_status = 'completed' THEN OLD.amount ELSE 0 END)
+    WHERE name = 'total_revenue';
+END;
+
+-- Front desk search: one document per booking with its guest's details and
+-- room number, kept in sync with bookings, customers and rooms by the
+-- triggers below. Phone numbers are indexed as digits only.
+CREATE VIRTUAL TABLE IF NOT EXISTS booking_search USING fts5(
+    first_name, last_name, email, phone, room_number, special_requests,
+    prefix = '2 3'
+);
+
+CREATE VIEW IF NOT EXISTS booking_search_source AS
+SELECT b.booking_id, b.customer_id, b.room_id, c.first_name, c.last_name, c.email,
+       replace(replace(replace(replace(replace(replace(c.phone, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '+', '') AS phone,
+       r.room_number, b.special_requests
+FROM bookings b
+LEFT JOIN customers c ON c.customer_id = b.customer_id
+LEFT JOIN rooms r ON r.room_id = b.room_id;
+
+-- Index bookings that predate the search table
+INSERT INTO booking_search (rowid, first_name, last_name, email, phone, room_number, special_requests)
+SELECT booking_id, first_name, last_name, email, phone, room_number, special_requests FROM booking_search_source
+WHERE NOT EXISTS (SELECT 1 FROM booking_search);
+
+CREATE TRIGGER IF NOT EXISTS trg_bookings_search_insert AFTER INSERT ON bookings
+BEGIN
+    INSERT INTO booking_search (rowid, first_name, last_name, email, phone, room_number, special_requests)
+    SELECT booking_id, first_name, last_name, email, phone, room_number, special_requests FROM booking_search_source
+    WHERE booking_id = NEW.booking_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bookings_search_delete AFTER DELETE ON bookings
+BEGIN
+    DELETE FROM booking_search WHERE rowid = OLD.booking_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bookings_search_update AFTER UPDATE OF customer_id, room_id, special_requests ON bookings
+BEGIN
+    DELETE FROM booking_search WHERE rowid = OLD.booking_id;
+    INSERT INTO booking_search (rowid, first_name, last_name, email, phone, room_number, special_requests)
+    SELECT booking_id, first_name, last_name, email, phone, room_number, special_requests FROM booking_search_source
+    WHERE booking_id = NEW.booking_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customers_search_update AFTER UPDATE OF first_name, last_name, email, phone ON customers
+WHEN OLD.first_name IS NOT NEW.first_name OR OLD.last_name IS NOT NEW.last_name
+  OR OLD.email IS NOT NEW.email OR OLD.phone IS NOT NEW.phone
+BEGIN
+    DELETE FROM booking_search WHERE rowid IN (SELECT booking_id FROM bookings WHERE customer_id = NEW.customer_id);
+    INSERT INTO booking_search (rowid, first_name, last_name, email, phone, room_number, special_requests)
+    SELECT booking_id, first_name, last_name, email, phone, room_number, special_requests FROM booking_search_source
+    WHERE customer_id = NEW.customer_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rooms_search_update AFTER UPDATE OF room_number ON rooms
+WHEN OLD.room_number IS NOT NEW.room_number
+BEGIN
+    DELETE FROM booking_search WHERE rowid IN (SELECT booking_id FROM bookings WHERE room_id = NEW.room_id);
+    INSERT INTO booking_search (rowid, first_name, last_name, email, phone, room_number, special_requests)
+    SELECT booking_id, first_name, last_name, email, phone, room_number, special_requests FROM booking_search_source
+    WHERE room_id = NEW.room_id;
+END;
+
+-- Archive: closed bookings (checked out, cancelled or no-show) older than
+-- archive.ARCHIVE_AFTER_DAYS and their payments are moved here by
+-- archive.py, keeping the live tables the size of current business.
+-- booking_id and payment_id are kept; AUTOINCREMENT never reuses them.
+CREATE TABLE IF NOT EXISTS bookings_archive (
+    booking_id INTEGER PRIMARY KEY,
+    customer_id INTEGER NOT NULL,
+    room_id INTEGER NOT NULL,
+    check_in_date DATE NOT NULL,
+    check_out_date DATE NOT NULL,
+    number_of_guests INTEGER NOT NULL,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    special_requests TEXT,
+    created_at TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS payments_archive (
+    payment_id INTEGER PRIMARY KEY,
+    booking_id INTEGER NOT NULL,
+    amount DECIMAL(10, 2) NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    payment_status VARCHAR(20) NOT NULL,
+    transaction_id VARCHAR(100),
+    payment_date TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_archive_status_dates ON bookings_archive(status, check_in_date, check_out_date);
+CREATE INDEX IF NOT EXISTS idx_bookings_archive_created ON bookings_archive(created_at, booking_id);
+CREATE INDEX IF NOT EXISTS idx_payments_archive_booking ON payments_archive(booking_id);
+CREATE INDEX IF NOT EXISTS idx_payments_archive_date ON payments_archive(payment_date, payment_id);
+CREATE INDEX IF NOT EXISTS idx_payments_archive_status ON payments_archive(payment_status, amount);
+
+-- Live and archived rows together, for reports that span both
+CREATE VIEW IF NOT EXISTS all_bookings AS
+SELECT booking_id, customer_id, room_id, check_in_date, check_out_date, number_of_guests,
+       total_amount, status, special_requests, created_at FROM bookings
+UNION ALL
+SELECT booking_id, customer_id, room_id, check_in_date, check_out_date, number_of_guests,
+       total_amount, status, special_requests, created_at FROM bookings_archive;
+
+CREATE VIEW IF NOT EXISTS all_payments AS
+SELECT payment_id, booking_id, amount, payment_method, payment_status, transaction_id, payment_date FROM payments
+UNION ALL
+SELECT payment_id, booking_id, amount, payment_method, payment_status, transaction_id, payment_date FROM payments_archive;
+
+-- Archiving deletes from the live tables, which the triggers above count
+-- down; counting the archived copies back in keeps the dashboard totals
+-- covering all history
+CREATE TRIGGER IF NOT EXISTS trg_bookings_archive_stats_insert AFTER INSERT ON bookings_archive
+BEGIN
+    UPDATE stats SET value = value + 1 WHERE name = 'total_bookings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_payments_archive_stats_insert AFTER INSERT ON payments_archive
+BEGIN
+    UPDATE stats SET value = value + (CASE WHEN NEW.payment_status = 'completed' THEN NEW.amount ELSE 0 END)
+    WHERE name = 'total_revenue';
+END;
+
+-- Amenities: one row per distinct entry in rooms.amenities, maintained by
+-- amenities.sync_rooms(). Older databases get rooms.amenity_mask from
+-- database.migrate().
+CREATE TABLE IF NOT EXISTS amenities (
+    amenity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(50) UNIQUE NOT NULL COLLATE NOCASE,
+    bit INTEGER UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS room_amenities (
+    room_id INTEGER NOT NULL,
+    amenity_id INTEGER NOT NULL,
+    PRIMARY KEY (room_id, amenity_id),
+    FOREIGN KEY (room_id) REFERENCES rooms(room_id) ON DELETE CASCADE,
+    FOREIGN KEY (amenity_id) REFERENCES amenities(amenity_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_room_amenities_amenity ON room_amenities(amenity_id, room_id);
+
+-- Filtered availability search: one room type in room number order, or
+-- rooms for at least so many guests in capacity order
+CREATE INDEX IF NOT EXISTS idx_rooms_type_number ON rooms(room_type, room_number, capacity);
+CREATE INDEX IF NOT EXISTS idx_rooms_capacity_number ON rooms(capacity, room_number);
+
+-- Rooms waiting for amenities.sync_rooms()
+CREATE INDEX IF NOT EXISTS idx_rooms_amenities_pending ON rooms(room_id) WHERE amenity_mask IS NULL;
+
+CREATE TRIGGER IF NOT EXISTS trg_rooms_amenities_update AFTER UPDATE OF amenities ON rooms
+WHEN OLD.amenities IS NOT NEW.amenities
+BEGIN
+    UPDATE rooms SET amenity_mask = NULL WHERE room_id = NEW.room_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rooms_amenities_delete AFTER DELETE ON rooms
+BEGIN
+    DELETE FROM room_amenities WHERE room_id = OLD.room_id;
+END;
@@ -0,0 +1,70 @@
+"""
+Front desk search - ranked full-text lookups over bookings and their guests
+
+Backed by the booking_search FTS5 table in schema.sql.
+"""
+
+import re
+
+SEARCH_LIMIT = 50
+
+# Shorter terms would prefix-match most of the index
+MIN_TERM_LENGTH = 2
+
+# Column weights for bm25(), in booking_search column order: names and
+# email count most, special requests least
+RANK_WEIGHTS = (10.0, 10.0, 8.0, 8.0, 5.0, 1.0)
+
+_PHONE_TERM = re.compile(r'\+?[\d\-\(\)\.]*\d[\d\-\(\)\.]*')
+_PHONE_PUNCTUATION = re.compile(r'[\-\(\)\.\+]')
+_WORD = re.compile(r'\w+')
+
+def build_match(query):
+    """FTS5 MATCH expression where every term of query must match.
+
+    A term becomes a phrase of its words (so an email address matches as a
+    whole) whose last word may be a prefix; the exact phrase is OR-ed in so
+    exact matches rank above prefix matches. Phone-like terms are reduced
+    to their digits, as phones are indexed; neighbouring ones are joined
+    when punctuation marks them as one number. Returns None when the query
+    has nothing to search for.
+    """
+    terms = []
+    for term in query.split():
+        # Join the groups of a phone number written with spaces, e.g. (555) 010-0100
+        if (terms and _PHONE_TERM.fullmatch(term) and _PHONE_TERM.fullmatch(terms[-1])
+                and _PHONE_PUNCTUATION.search(terms[-1] + term)):
+            terms[-1] += term
+        else:
+            terms.append(term)
+    phrases = []
+    for term in terms:
+        if _PHONE_TERM.fullmatch(term):
+            words = [re.sub(r'\D', '', term)]
+        else:
+            words = _WORD.findall(term)
+        if words and len(''.join(words)) >= MIN_TERM_LENGTH:
+            phrases.append(' '.join(words))
+    if not phrases:
+        return None
+    return ' AND '.join(f'("{phrase}" OR "{phrase}"*)' for phrase in phrases)
+
+def search_bookings(conn, query, limit=SEARCH_LIMIT):
+    """Best-matching bookings first, with their room and guest"""
+    match = build_match(query)
+    if match is None:
+        return []
+    return conn.execute(f'''
+        SELECT b.*, r.room_number, r.room_type, c.first_name, c.last_name, c.email, c.phone, hits.score
+        FROM (
+            SELECT rowid AS booking_id, bm25(booking_search, {', '.join(map(str, RANK_WEIGHTS))}) AS score
+            FROM booking_search
+            WHERE booking_search MATCH ?
+            ORDER BY score
+            LIMIT ?
+        ) hits
+        JOIN bookings b ON b.booking_id = hits.booking_id
+        JOIN rooms r ON b.room_id = r.room_id
+        JOIN customers c ON b.customer_id = c.customer_id
+        ORDER BY hits.score
+    ''', (match, limit)).fetchall()
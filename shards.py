@@ -0,0 +1,67 @@
+"""
+Shard context - which property database the current code is working on
+
+Requests set g.database (see app.select_property) and background jobs
+wrap each property's work in using(); current_database() answers from
+whichever is set and falls back to database.DATABASE. In-process state
+that mirrors one database (the occupancy index, caches, the change feed)
+is kept per database with PerShard, which forwards to the instance for
+the current one.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
+_job = threading.local()
+
+def current_database():
+    """Path of the database the current request or job works on"""
+    if has_app_context() and 'database' in g:
+        return g.database
+    database = getattr(_job, 'database', None)
+    if database is None:
+        import database as db  # database imports this module
+        database = db.DATABASE
+    return database
+
+@contextmanager
+def using(database):
+    """Work on database in this thread until the block exits"""
+    previous = getattr(_job, 'database', None)
+    _job.database = database
+    try:
+        yield database
+    finally:
+        _job.database = previous
+
+class PerShard:
+    """One instance of factory() per database, used through the current one"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def instance(self, database=None):
+        database = database or current_database()
+        instance = self._instances.get(database)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.setdefault(database, self._factory())
+        return instance
+
+    def instances(self):
+        """{database: instance} for every database used so far"""
+        with self._lock:
+            return dict(self._instances)
+
+    def __getattr__(self, name):
+        return getattr(self.instance(), name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            super().__setattr__(name, value)
+        else:
+            setattr(self.instance(), name, value)
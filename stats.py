@@ -0,0 +1,85 @@
+"""
+Dashboard statistics - counters maintained by triggers in schema.sql
+
+Run directly to reconcile the counters once:
+    python stats.py
+"""
+
+import logging
+import threading
+
+import database as db
+import properties
+
+logger = logging.getLogger(__name__)
+
+# How often the background job re-checks the counters, in seconds
+RECONCILE_INTERVAL = 3600
+
+# Ground truth for every counter in the stats table. Totals include the
+# archive; archived bookings are never pending.
+COUNTER_QUERIES = {
+    'total_rooms': "SELECT COUNT(*) FROM rooms",
+    'available_rooms': "SELECT COUNT(*) FROM rooms WHERE status = 'available'",
+    'total_bookings': "SELECT (SELECT COUNT(*) FROM bookings) + (SELECT COUNT(*) FROM bookings_archive)",
+    'pending_bookings': "SELECT COUNT(*) FROM bookings WHERE status = 'pending'",
+    'total_revenue': "SELECT COALESCE(SUM(amount), 0) FROM all_payments WHERE payment_status = 'completed'",
+}
+
+def get_counters(conn):
+    """All dashboard counters from a single read of the stats table"""
+    counters = {name: 0 for name in COUNTER_QUERIES}
+    for row in conn.execute('SELECT name, value FROM stats'):
+        counters[row['name']] = row['value']
+    for name in counters:
+        if name != 'total_revenue':
+            counters[name] = int(counters[name])
+    counters['total_revenue'] = float(counters['total_revenue'])
+    return counters
+
+def reconcile(conn):
+    """Recompute every counter from the real tables and fix any drift.
+
+    Runs under the write lock so no trigger can fire between the count and
+    the fix. Returns {name: (counter_value, actual_value)} for each counter
+    that had drifted.
+    """
+    drift = {}
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        counters = get_counters(conn)
+        # A missing row would leave its triggers updating nothing
+        stored = {row['name'] for row in conn.execute('SELECT name FROM stats')}
+        for name, query in COUNTER_QUERIES.items():
+            actual = conn.execute(query).fetchone()[0]
+            if name not in stored or abs(float(counters[name]) - float(actual)) > 0.005:
+                drift[name] = (counters[name], actual)
+                conn.execute('INSERT OR REPLACE INTO stats (name, value) VALUES (?, ?)', (name, actual))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for name, (counter, actual) in drift.items():
+        logger.warning('stats counter %s drifted: %s, actual %s', name, counter, actual)
+    return drift
+
+def start_reconciler(interval=RECONCILE_INTERVAL):
+    """Reconcile the counters every interval seconds on a daemon thread"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            properties.for_each(reconcile, 'stats reconciliation')
+
+    threading.Thread(target=run, name='stats-reconciler', daemon=True).start()
+    return stop
+
+if __name__ == '__main__':
+    conn = db.connect()
+    drift = reconcile(conn)
+    conn.close()
+    if drift:
+        for name, (counter, actual) in drift.items():
+            print(f"  {name}: {counter} -> {actual}")
+    else:
+        print("All counters match.")
@@ -0,0 +1,46 @@
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database as db
+import init_sample_data
+import properties
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh main database with the sample rooms, and an empty property registry"""
+    monkeypatch.chdir(ROOT)  # schema.sql is read from the working directory
+    monkeypatch.setattr(db, 'DATABASE', str(tmp_path / 'hotel.db'))
+    monkeypatch.setattr(init_sample_data, 'DATABASE', db.DATABASE)
+    monkeypatch.setattr(properties.registry, 'path', str(tmp_path / 'properties.db'))
+    monkeypatch.setattr(properties, 'PROPERTY_DATA_DIR', str(tmp_path / 'property_data'))
+    properties.registry.invalidate()
+    db.pool.clear()
+    db.init_db()
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_sample_data.init_sample_data()
+    yield db.DATABASE
+    db.pool.clear()
+    properties.registry.invalidate()
+
+@pytest.fixture
+def app(database):
+    import app as appmod
+    appmod.app.testing = True
+    return appmod.app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
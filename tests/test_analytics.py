@@ -0,0 +1,44 @@
+from datetime import date
+
+import analytics
+import database as db
+
+START, END = date(2030, 1, 1), date(2030, 1, 31)
+
+def _paid_stays(conn):
+    """Book and fully pay one stay in each of three rooms; returns their room ids"""
+    customer_id = conn.execute("INSERT INTO customers (first_name, last_name, email, phone) "
+                               "VALUES ('Ann', 'Lee', 'ann@example.com', '5550100')").lastrowid
+    room_ids = [row['room_id'] for row in conn.execute('SELECT room_id FROM rooms ORDER BY room_id LIMIT 3')]
+    for n, room_id in enumerate(room_ids):
+        booking_id = conn.execute('''
+            INSERT INTO bookings (customer_id, room_id, check_in_date, check_out_date, number_of_guests,
+                                  total_amount, status)
+            VALUES (?, ?, '2030-01-10', '2030-01-12', 1, ?, 'confirmed')
+        ''', (customer_id, room_id, 100.0 * (n + 1))).lastrowid
+        conn.execute('''
+            INSERT INTO payments (booking_id, amount, payment_method, payment_status, transaction_id)
+            VALUES (?, ?, 'cash', 'completed', ?)
+        ''', (booking_id, 100.0 * (n + 1), f'TXN{booking_id}'))
+    conn.commit()
+    return room_ids
+
+def test_payments_for_deleted_rooms_are_left_out(database):
+    conn = db.connect()
+    try:
+        first, middle, last = _paid_stays(conn)
+        assert analytics.build_report(conn, START, END)['totals']['paid'] == 600.0
+
+        # The middle stay's payment must not be credited to its neighbour
+        conn.execute('DELETE FROM rooms WHERE room_id = ?', (middle,))
+        conn.commit()
+        totals = analytics.build_report(conn, START, END)['totals']
+        assert (totals['revenue'], totals['paid']) == (400.0, 400.0)
+
+        # Nor may a payment for the highest booking id fall off the end
+        conn.execute('DELETE FROM rooms WHERE room_id = ?', (last,))
+        conn.commit()
+        totals = analytics.build_report(conn, START, END)['totals']
+        assert (totals['revenue'], totals['paid']) == (100.0, 100.0)
+    finally:
+        conn.close()
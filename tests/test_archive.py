@@ -0,0 +1,51 @@
+from datetime import date
+
+import archive
+import bulk_io
+import database as db
+import stats
+
+def _book_and_pay(client, room_id, check_in, check_out):
+    booking = dict(first_name='Ann', last_name='Lee', email='ann@example.com', phone='5550100',
+                   room_id=room_id, check_in=check_in, check_out=check_out, number_of_guests=1)
+    location = client.post('/book', data=booking).location
+    booking_id = int(location.rstrip('/').rsplit('/', 1)[1])
+    client.post(f'/payment/{booking_id}', data={'payment_method': 'credit_card'})
+    return booking_id
+
+def _count(conn, table):
+    return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+def test_old_closed_bookings_move_to_the_archive_and_are_still_found(client):
+    stayed = _book_and_pay(client, 1, '2024-01-10', '2024-01-12')
+    no_show = _book_and_pay(client, 2, '2024-01-10', '2024-01-12')
+    recent = _book_and_pay(client, 3, '2029-12-20', '2029-12-22')
+    upcoming = _book_and_pay(client, 4, '2030-02-01', '2030-02-03')
+    conn = db.connect()
+    try:
+        db.transition_bookings(conn, [stayed, recent], 'checked_in')
+        db.transition_bookings(conn, [stayed, recent], 'checked_out')
+        db.transition_bookings(conn, [no_show], 'no_show')
+        counters = stats.get_counters(conn)
+
+        assert archive.run_archive(conn, today=date(2030, 1, 1), dry_run=True) == {'bookings': 2, 'payments': 2}
+        assert archive.run_archive(conn, today=date(2030, 1, 1), chunk_size=1, pause=0) == {
+            'bookings': 2, 'payments': 2}
+        assert [row[0] for row in conn.execute('SELECT booking_id FROM bookings ORDER BY booking_id')] == [
+            recent, upcoming]
+        assert [row[0] for row in conn.execute('SELECT booking_id FROM bookings_archive ORDER BY booking_id')] == [
+            stayed, no_show]
+        assert (_count(conn, 'all_bookings'), _count(conn, 'all_payments')) == (4, 4)
+
+        # The dashboard totals still count the archived rows
+        assert stats.get_counters(conn) == counters
+        assert stats.reconcile(conn) == {}
+        # Nothing left to move
+        assert archive.run_archive(conn, today=date(2030, 1, 1), pause=0) == {'bookings': 0, 'payments': 0}
+    finally:
+        conn.close()
+
+    page = client.get(f'/booking_confirmation/{stayed}')
+    assert page.status_code == 200 and f'TXN{stayed}'.encode() in page.data
+    batches = list(bulk_io.export_rows('bookings'))[1:]
+    assert sorted(row['booking_id'] for batch in batches for row in batch) == [stayed, no_show, recent, upcoming]
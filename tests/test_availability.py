@@ -0,0 +1,67 @@
+from datetime import date
+
+from werkzeug.datastructures import MultiDict
+
+import availability
+import database as db
+
+def _customer(n):
+    return {'first_name': 'Guest', 'last_name': str(n), 'email': f'guest{n}@example.com', 'phone': '555'}
+
+def _search(conn, check_in='2030-01-10', check_out='2030-01-13', **filters):
+    filters = availability.parse_filters(MultiDict({name: str(value) for name, value in filters.items()}))
+    return availability.search_available_rooms(conn, check_in, check_out, filters)
+
+def test_search_leaves_out_booked_and_maintenance_rooms(database):
+    conn = db.connect()
+    try:
+        db.create_booking(conn, _customer(1), 1, '2030-01-12', '2030-01-15', 1)
+        # Stays that only touch the searched dates do not block the room
+        db.create_booking(conn, _customer(2), 2, '2030-01-13', '2030-01-15', 1)
+        db.create_booking(conn, _customer(3), 3, '2030-01-07', '2030-01-10', 1)
+        cancelled = db.create_booking(conn, _customer(4), 4, '2030-01-10', '2030-01-13', 1)
+        db.transition_bookings(conn, [cancelled], 'cancelled')
+        conn.execute("UPDATE rooms SET status = 'maintenance' WHERE room_id = 5")
+        conn.commit()
+
+        rooms = _search(conn)
+        assert [room['room_id'] for room in rooms] == [2, 3, 4, 6, 7, 8, 9]
+        assert {room['room_id']: room['total_amount'] for room in rooms}[9] == 3 * 500.0
+        assert all(room['average_rate'] == room['price_per_night'] for room in rooms)
+    finally:
+        conn.close()
+
+def test_search_filters_sort_and_limit(database):
+    conn = db.connect()
+    try:
+        assert {room['room_type'] for room in _search(conn, guests=4)} == {'Suite', 'Presidential'}
+        assert [room['room_number'] for room in _search(conn, room_type='Double')] == ['201', '202']
+        assert [room['average_rate'] for room in _search(conn, min_price=100, max_price=200, sort='price_desc')] == [
+            200.0, 200.0, 150.0, 150.0]
+        assert [room['room_number'] for room in _search(conn, sort='price', limit=3)] == ['101', '102', '201']
+        assert [room['room_number'] for room in _search(conn, limit=2)] == ['101', '102']
+    finally:
+        conn.close()
+
+def test_the_calendar_agrees_with_the_search(database):
+    conn = db.connect()
+    try:
+        db.create_booking(conn, _customer(1), 1, '2030-01-11', '2030-01-12', 1)
+        calendar = availability.availability_calendar(conn, date(2030, 1, 10), 3)
+        free = {room['room_id'] for room in calendar['rooms'] if all(room['available'])}
+        assert free == {room['room_id'] for room in _search(conn)}
+        assert calendar['rooms'][0]['available'] == [True, False, True]
+    finally:
+        conn.close()
+
+def test_the_search_endpoint_validates_its_input(client):
+    def post(**form):
+        return client.post('/check_availability', data={'check_in': '2030-01-10', 'check_out': '2030-01-13', **form})
+
+    assert post().status_code == 200
+    assert len(post(guests=6).get_json()['rooms']) == 1
+    for form in ({'check_out': '2030-01-10'}, {'check_in': '2020-01-01'}, {'check_in': 'soon'},
+                 {'guests': '0'}, {'sort': 'stars'}, {'min_price': '300', 'max_price': '100'},
+                 {'limit': str(availability.SEARCH_MAX_LIMIT + 1)}):
+        response = post(**form)
+        assert response.status_code == 400 and 'error' in response.get_json()
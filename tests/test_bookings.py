@@ -0,0 +1,161 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import database as db
+
+def _customer(n):
+    return {'first_name': 'Guest', 'last_name': str(n), 'email': f'guest{n}@example.com',
+            'phone': f'555{n:04d}', 'address': ''}
+
+def test_concurrent_bookings_of_one_room_only_let_one_through(database):
+    attempts = 8
+    start = threading.Barrier(attempts)
+    results = []
+
+    def book(n):
+        conn = db.connect()
+        try:
+            start.wait()
+            results.append(db.create_booking(conn, _customer(n), 1, '2030-01-10', '2030-01-13', 1))
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=book, args=(n,)) for n in range(attempts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len([booking_id for booking_id in results if booking_id]) == 1
+    assert results.count(None) == attempts - 1
+    conn = db.connect()
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM bookings WHERE room_id = 1').fetchone()[0] == 1
+    finally:
+        conn.close()
+
+def test_overlapping_stays_are_refused_and_adjacent_ones_allowed(database):
+    conn = db.connect()
+    try:
+        assert db.create_booking(conn, _customer(1), 1, '2030-01-10', '2030-01-13', 1)
+        assert db.create_booking(conn, _customer(2), 1, '2030-01-12', '2030-01-14', 1) is None
+        assert db.create_booking(conn, _customer(3), 1, '2030-01-13', '2030-01-15', 1)
+        assert db.create_booking(conn, _customer(4), 2, '2030-01-12', '2030-01-14', 1)
+    finally:
+        conn.close()
+
+def test_check_in_range_pages_by_latest_check_in_without_repeats(database):
+    conn = db.connect()
+    try:
+        for n in range(7):
+            day = 10 + n % 3  # several bookings share a check-in date
+            assert db.create_booking(conn, _customer(n), n + 1, f'2030-02-{day}', f'2030-02-{day + 2}', 1)
+        filters = {'date_from': '2030-02-01', 'date_to': '2030-02-28'}
+        seen, cursor = [], None
+        while True:
+            rows, cursor = db.list_bookings(conn, filters, cursor, page_size=2)
+            seen.extend(rows)
+            if not cursor:
+                break
+        keys = [(row['check_in_date'], row['check_out_date'], row['booking_id']) for row in seen]
+        assert len(keys) == 7
+        assert keys == sorted(keys, reverse=True)
+        # A cursor from the unfiltered list starts the range from the top
+        _, created_cursor = db.list_bookings(conn, {}, page_size=1)
+        assert db.list_bookings(conn, filters, created_cursor, page_size=7)[0] == seen
+    finally:
+        conn.close()
+
+def test_a_failure_inside_the_booking_transaction_rolls_it_back(database, monkeypatch):
+    def broken_quote(*args):
+        raise ValueError('no price')
+    monkeypatch.setattr(db.pricing, 'quote', broken_quote)
+    conn = db.connect()
+    try:
+        with pytest.raises(ValueError):
+            db.create_booking(conn, _customer(1), 1, '2030-01-10', '2030-01-13', 1)
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM customers WHERE email = 'guest1@example.com'").fetchone()[0] == 0
+    finally:
+        conn.close()
+    # The write lock was released
+    other = db.connect()
+    try:
+        other.execute('BEGIN IMMEDIATE')
+        other.rollback()
+    finally:
+        other.close()
+
+def test_a_busy_database_gives_up_within_the_booking_deadline(database, monkeypatch):
+    monkeypatch.setattr(db, 'BOOKING_MAX_WAIT', 0.3)
+    holder, conn = db.connect(), db.connect()
+    try:
+        holder.execute('BEGIN IMMEDIATE')
+        started = time.monotonic()
+        with pytest.raises(sqlite3.OperationalError):
+            db.create_booking(conn, _customer(1), 1, '2030-01-10', '2030-01-13', 1)
+        assert time.monotonic() - started < 1
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == db.BUSY_TIMEOUT_MS
+    finally:
+        holder.rollback()
+        holder.close()
+        conn.close()
+
+def _booked(conn, n, room_id, check_in='2030-03-10', check_out='2030-03-12'):
+    return db.create_booking(conn, _customer(n), room_id, check_in, check_out, 1)
+
+def test_bulk_status_changes_follow_the_allowed_transitions(admin, database):
+    conn = db.connect()
+    try:
+        pending, confirmed, checked_out = _booked(conn, 1, 1), _booked(conn, 2, 2), _booked(conn, 3, 3)
+        db.transition_bookings(conn, [confirmed], 'confirmed')
+        db.transition_bookings(conn, [checked_out], 'checked_in')
+        db.transition_bookings(conn, [checked_out], 'checked_out')
+    finally:
+        conn.close()
+
+    response = admin.post('/admin/api/bookings/status',
+                          json={'booking_ids': [pending, confirmed, checked_out, 9999], 'status': 'checked_in'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [result['outcome'] for result in body['results']] == ['updated', 'updated', 'not_allowed', 'not_found']
+    assert body['updated'] == 2
+
+    conn = db.connect()
+    try:
+        statuses = dict(conn.execute('SELECT booking_id, status FROM bookings').fetchall())
+        assert statuses == {pending: 'checked_in', confirmed: 'checked_in', checked_out: 'checked_out'}
+        # A refused move leaves the room alone
+        assert conn.execute('SELECT status FROM rooms WHERE room_id = 3').fetchone()[0] == 'available'
+    finally:
+        conn.close()
+
+    response = admin.post(f'/admin/bookings/update_status/{checked_out}', data={'status': 'cancelled'},
+                          follow_redirects=True)
+    assert b'A checked out booking cannot be changed to cancelled' in response.data
+
+def test_a_cancelled_booking_is_only_reinstated_while_its_room_is_free(database):
+    conn = db.connect()
+    try:
+        first = _booked(conn, 1, 1)
+        second = _booked(conn, 2, 1, '2030-03-11', '2030-03-14')
+        assert second is None
+        db.transition_bookings(conn, [first], 'cancelled')
+        second = _booked(conn, 2, 1, '2030-03-11', '2030-03-14')
+        third = _booked(conn, 3, 1, '2030-03-14', '2030-03-16')
+
+        results, changed, _ = db.transition_bookings(conn, [first], 'confirmed')
+        assert results[0]['outcome'] == 'conflict' and not changed
+
+        # Of two cancelled bookings for the same nights only the first comes back
+        db.transition_bookings(conn, [second, third], 'cancelled')
+        results, changed, _ = db.transition_bookings(conn, [second, first, third], 'confirmed')
+        assert [result['outcome'] for result in results] == ['updated', 'conflict', 'updated']
+        assert [row['booking_id'] for row in changed] == [second, third]
+        active = conn.execute("SELECT booking_id FROM bookings WHERE room_id = 1 AND status = 'confirmed'").fetchall()
+        assert sorted(row[0] for row in active) == sorted([second, third])
+    finally:
+        conn.close()
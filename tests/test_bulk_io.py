@@ -0,0 +1,97 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import amenities
+import availability
+import bulk_io
+import database as db
+
+ROOMS_CSV = '''room_number,room_type,price_per_night,capacity,amenities,status
+901,Suite,250,2,"WiFi, Sauna",available
+101,Single,50,1,WiFi,available
+902,Suite,250,2,"Sauna, TV",available
+'''
+
+def test_rooms_imported_row_by_row_get_their_amenities(database):
+    conn = db.connect()
+    try:
+        # Room 101 already exists, so the batch falls back to one row at a time
+        imported, errors = bulk_io.import_csv(conn, 'rooms', ROOMS_CSV.splitlines(True))
+        assert imported == 2
+        assert [line for line, _ in errors] == [3]
+
+        rooms = availability.search_available_rooms(conn, '2030-01-01', '2030-01-02',
+                                                    availability.parse_filters(MultiDict({'amenities': 'Sauna'})))
+        assert sorted(room['room_number'] for room in rooms) == ['901', '902']
+        assert 'Sauna' in amenities.names(conn)
+    finally:
+        conn.close()
+
+CUSTOMERS_CSV = '''first_name,last_name,email,phone,address
+Ann,Lee,ann@example.com,5550100,
+'''
+
+BOOKINGS_CSV = '''customer_email,room_number,check_in_date,check_out_date,number_of_guests,total_amount
+ann@example.com,101,2030-01-10,2030-01-12,1,100
+ann@example.com,102,2030-01-10,2030-01-12,1,
+'''
+
+def test_a_failed_booking_import_rolls_back(database, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('no rates')
+
+    conn = db.connect()
+    try:
+        bulk_io.import_csv(conn, 'customers', CUSTOMERS_CSV.splitlines(True))
+        monkeypatch.setattr(bulk_io.pricing, 'quote', fail)
+        with pytest.raises(RuntimeError):
+            bulk_io.import_csv(conn, 'bookings', BOOKINGS_CSV.splitlines(True))
+        # The first row is not kept and the write lock is released
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0] == 0
+        monkeypatch.undo()
+        assert bulk_io.import_csv(conn, 'bookings', BOOKINGS_CSV.splitlines(True)) == (2, [])
+    finally:
+        conn.close()
+
+def test_bulk_rooms_apply_creates_and_updates_in_one_go(admin):
+    response = admin.post('/admin/api/rooms/bulk', json={'rooms': [
+        {'room_number': '903', 'room_type': 'Suite', 'price_per_night': 250, 'capacity': 2, 'amenities': 'WiFi, Sauna'},
+        {'room_number': '101', 'price_per_night': '65'},
+        {'room_number': '102', 'status': 'maintenance'},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['created'], body['updated']) == (1, 2)
+    assert [(result['action'], result['status']) for result in body['results']] == [
+        ('create', 'available'), ('update', 'available'), ('update', 'maintenance')]
+
+    found = admin.post('/check_availability', data={'check_in': '2030-01-10', 'check_out': '2030-01-11'}).get_json()
+    prices = {room['room_number']: room['price_per_night'] for room in found['rooms']}
+    assert prices['903'] == 250 and prices['101'] == 65 and '102' not in prices
+
+    csv_body = 'room_number,room_type,price_per_night,capacity\n904,Single,55,1\n'
+    response = admin.post('/admin/api/rooms/bulk', data=csv_body, content_type='text/csv')
+    assert response.get_json()['created'] == 1
+
+def test_bulk_rooms_change_nothing_unless_every_row_is_valid(admin, database):
+    response = admin.post('/admin/api/rooms/bulk', json=[
+        {'room_number': '905', 'room_type': 'Suite', 'price_per_night': 250, 'capacity': 2},
+        {'room_number': '101', 'price_per_night': 'cheap'},
+        {'room_number': '999', 'status': 'available'},
+        {'room_number': '905', 'room_type': 'Suite', 'price_per_night': 250, 'capacity': 2},
+        {'room_number': '201', 'action': 'create', 'room_type': 'Double', 'price_per_night': 80, 'capacity': 2},
+    ])
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['applied'] is False
+    assert ['error' in result for result in body['results']] == [False, True, True, True, True]
+
+    conn = db.connect()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM rooms WHERE room_number = '905'").fetchone()[0] == 0
+        assert conn.execute("SELECT price_per_night FROM rooms WHERE room_number = '101'").fetchone()[0] == 50
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+    assert admin.post('/admin/api/rooms/bulk', json=[]).status_code == 400
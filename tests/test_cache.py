@@ -0,0 +1,47 @@
+import time
+
+import cache
+
+def test_the_cache_evicts_the_least_recently_used_and_expires_old_entries():
+    lru = cache.LRUCache(max_entries=2, ttl=0.05)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+    assert lru.get('b') is None and lru.get('a') == 1
+    time.sleep(0.06)
+    assert lru.get('c') is None
+    stats = lru.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['expirations']) == (2, 2, 1, 1)
+
+def _rooms(client, check_in, check_out):
+    response = client.post('/check_availability', data={'check_in': check_in, 'check_out': check_out})
+    return [room['room_id'] for room in response.get_json()['rooms']]
+
+def test_bookings_drop_only_the_searches_they_overlap(client, admin, database):
+    responses = cache.responses.instance(database)
+    assert 1 in _rooms(client, '2030-01-10', '2030-01-12')
+    assert 1 in _rooms(client, '2030-02-10', '2030-02-12')
+    assert 1 in _rooms(client, '2030-01-10', '2030-01-12')
+    assert responses.stats()['hits'] == 1
+
+    booking = dict(first_name='Ann', last_name='Lee', email='ann@example.com', phone='5550100',
+                   room_id=1, check_in='2030-01-11', check_out='2030-01-13', number_of_guests=1)
+    booking_id = int(client.post('/book', data=booking).location.rsplit('/', 1)[1])
+    assert responses.stats()['invalidations'] == 1
+    assert 1 not in _rooms(client, '2030-01-10', '2030-01-12')
+    assert 1 in _rooms(client, '2030-02-10', '2030-02-12')
+    assert responses.stats()['hits'] == 2
+
+    # Cancelling frees the room in the cached search again
+    admin.post(f'/admin/bookings/update_status/{booking_id}', data={'status': 'cancelled'})
+    assert 1 in _rooms(client, '2030-01-10', '2030-01-12')
+
+def test_room_edits_drop_the_home_page(client, admin, database):
+    assert b'Room 101' in client.get('/').data
+    assert b'Room 101' in client.get('/').data
+    assert cache.responses.instance(database).stats()['hits'] == 1
+    admin.post('/admin/rooms/edit/1', data={'room_number': '191', 'room_type': 'Single', 'price_per_night': '50',
+                                            'capacity': '1', 'amenities': 'WiFi', 'status': 'available'})
+    page = client.get('/').data
+    assert b'Room 191' in page and b'Room 101' not in page
@@ -0,0 +1,160 @@
+import socket
+
+import pytest
+
+import database as db
+import feed
+
+def _events(text):
+    return [line.split(': ', 1)[1] for line in text.splitlines() if line.startswith('event: ')]
+
+def _head(conn):
+    # The sample data already recorded its rooms
+    return conn.execute('SELECT MAX(event_id) FROM availability_events').fetchone()[0]
+
+@pytest.fixture
+def feed_server(database, monkeypatch):
+    monkeypatch.setattr(feed, 'POLL_INTERVAL', 0.05)
+    server = feed.FeedServer(limit=2)
+    monkeypatch.setattr(feed, 'server', server)
+    server.start('127.0.0.1:0')
+    yield server
+    server.stop()
+
+def _open_stream(server, headers=''):
+    sock = socket.create_connection(server.address, timeout=5)
+    sock.sendall(f'GET {feed.STREAM_PATH}?property=main HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n'.encode())
+    return sock
+
+def _read_until(sock, text):
+    received = ''
+    while text not in received:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        received += chunk.decode()
+    return received
+
+def test_events_published_elsewhere_reach_every_process(database):
+    # Two feeds stand in for two worker processes tailing the same database
+    first, second = feed.ChangeFeed(), feed.ChangeFeed()
+    conn = db.connect()
+    try:
+        first.poll(conn)
+        second.poll(conn)
+        head = _head(conn)
+        feed.rooms_changed(conn, [(1, 'maintenance')])
+        feed.rates_changed(conn, '2030-01-01', '2030-01-02')
+        conn.commit()
+
+        for process in (first, second):
+            assert process.poll(conn)
+            frames, last_id = process.frames_after(head)
+            assert _events(''.join(frames)) == ['room', 'rates']
+            assert last_id == head + 2
+
+        # A browser resuming on the other process gets only what it missed
+        frames, _ = second.frames_after(head + 1)
+        assert _events(''.join(frames)) == ['rates']
+    finally:
+        conn.close()
+
+def test_subscribers_too_far_behind_are_reset(database):
+    changes = feed.ChangeFeed(size=2)
+    conn = db.connect()
+    try:
+        head = _head(conn)
+        feed.rooms_changed(conn, [(n, 'available') for n in range(4)])
+        conn.commit()
+        changes.poll(conn)
+        assert changes.frames_after(head) == (None, head + 4)
+        frames, _ = changes.frames_after(head + 2)
+        assert len(frames) == 2
+    finally:
+        conn.close()
+
+def test_a_stream_opened_before_any_poll_starts_after_the_latest_event(feed_server):
+    conn = db.connect()
+    try:
+        feed.rooms_changed(conn, [(1, 'available')])
+        conn.commit()
+        latest = _head(conn)
+    finally:
+        conn.close()
+    assert not feed.changes.instance(db.DATABASE).primed
+    sock = _open_stream(feed_server)
+    head = _read_until(sock, 'retry: ')
+    assert head.startswith('HTTP/1.1 200') and 'text/event-stream' in head
+    assert feed.changes.instance(db.DATABASE).cursor() == latest
+    sock.close()
+
+def test_streams_are_capped_per_process_without_request_threads(feed_server):
+    streams = [_open_stream(feed_server) for _ in range(2)]
+    for sock in streams:
+        _read_until(sock, 'retry: ')
+    refused = _open_stream(feed_server)
+    response = _read_until(refused, 'Try again later')
+    assert response.startswith('HTTP/1.1 503') and 'Retry-After' in response
+    refused.close()
+    assert feed_server.stats()['subscribers'] == 2
+    for sock in streams:
+        sock.close()
+
+def test_a_booking_reaches_an_open_stream(feed_server, client):
+    sock = _open_stream(feed_server)
+    _read_until(sock, 'retry: ')
+    client.post('/book', data={'first_name': 'Ann', 'last_name': 'Lee', 'email': 'ann@example.com',
+                               'phone': '5550100', 'room_id': 1, 'check_in': '2030-01-10',
+                               'check_out': '2030-01-12', 'number_of_guests': 1})
+    assert 'event: stay' in _read_until(sock, 'event: stay')
+    sock.close()
+
+def test_a_reconnecting_browser_gets_what_it_missed(feed_server):
+    conn = db.connect()
+    try:
+        feed.rooms_changed(conn, [(n, 'available') for n in range(3)])
+        conn.commit()
+    finally:
+        conn.close()
+    sock = _open_stream(feed_server, 'Last-Event-ID: 1\r\n')
+    received = _read_until(sock, 'id: 3')
+    assert 'id: 1\n' not in received and 'id: 2\n' in received and 'id: 3\n' in received
+    sock.close()
+
+def test_the_home_page_subscribes_on_the_feed_port(client):
+    page = client.get('/').data.decode()
+    assert f'//localhost:{feed.FEED_BIND.rpartition(":")[2]}{feed.STREAM_PATH}?property=main' in page
+
+def test_events_are_written_in_the_changes_own_transaction(database):
+    conn = db.connect()
+    try:
+        booking_ids = []
+        for n in range(3):
+            booking_ids.append(db.create_booking(conn, {'first_name': 'G', 'last_name': str(n), 'email': f'g{n}@example.com',
+                                                        'phone': '555'}, n + 1, '2030-03-01', '2030-03-03', 1))
+        commits = []
+        conn.set_trace_callback(lambda sql: commits.append(sql) if sql.strip().upper() == 'COMMIT' else None)
+        db.transition_bookings(conn, booking_ids, 'cancelled')
+        conn.set_trace_callback(None)
+        assert len(commits) == 1
+        events = conn.execute("SELECT data FROM availability_events WHERE event = 'stay' ORDER BY event_id DESC LIMIT 3")
+        assert all('"available":true' in row['data'] for row in events)
+
+        # An event is rolled back with the change it describes
+        last_id = conn.execute('SELECT MAX(event_id) FROM availability_events').fetchone()[0]
+        conn.execute('BEGIN')
+        feed.stays_changed(conn, [(1, 1, '2030-04-01', '2030-04-02')])
+        conn.rollback()
+        assert conn.execute('SELECT MAX(event_id) FROM availability_events').fetchone()[0] == last_id
+    finally:
+        conn.close()
+
+def test_stay_events_say_whether_the_room_is_still_free(database):
+    conn = db.connect()
+    try:
+        db.create_booking(conn, {'first_name': 'G', 'last_name': 'H', 'email': 'gh@example.com', 'phone': '555'},
+                          '2', '2030-05-01', '2030-05-04', 1)
+        row = conn.execute('SELECT data FROM availability_events ORDER BY event_id DESC LIMIT 1').fetchone()
+        assert row['data'] == '{"room_id":2,"check_in":"2030-05-01","check_out":"2030-05-04","available":false}'
+    finally:
+        conn.close()
@@ -0,0 +1,8 @@
+import re
+
+def test_metrics_export_new_connections_per_request(admin):
+    admin.get('/admin')
+    body = admin.get('/metrics').data.decode()
+    assert '# TYPE hotel_request_connections histogram' in body
+    count = re.search(r'^hotel_request_connections_count\{endpoint="admin_dashboard",method="GET"\} (\d+)$', body, re.M)
+    assert count and int(count.group(1)) >= 1
@@ -0,0 +1,69 @@
+from datetime import date
+
+import database as db
+import night_audit
+
+def _customer(n):
+    return {'first_name': 'Guest', 'last_name': str(n), 'email': f'guest{n}@example.com', 'phone': '555'}
+
+def _statuses(conn):
+    return dict(conn.execute('SELECT booking_id, status FROM bookings').fetchall())
+
+def test_the_audit_expires_holds_marks_no_shows_and_checks_out_overdue_stays(database):
+    conn = db.connect()
+    try:
+        held = db.create_booking(conn, _customer(1), 1, '2030-01-10', '2030-01-12', 1)
+        no_show = db.create_booking(conn, _customer(2), 2, '2030-01-10', '2030-01-12', 1)
+        staying = db.create_booking(conn, _customer(3), 3, '2030-01-10', '2030-01-12', 1)
+        arriving = db.create_booking(conn, _customer(4), 4, '2030-01-20', '2030-01-22', 1)
+        db.transition_bookings(conn, [no_show, staying, arriving], 'confirmed')
+        db.transition_bookings(conn, [staying], 'checked_in')
+
+        changed = night_audit.run_audit(conn, today=date(2030, 1, 15), pause=0)
+        assert changed == {'expired': 1, 'no_show': 1, 'auto_checkout': 1}
+        assert _statuses(conn) == {held: 'cancelled', no_show: 'no_show', staying: 'checked_out',
+                                   arriving: 'confirmed'}
+        log = conn.execute('SELECT booking_id, action, previous_status, new_status FROM night_audit_log '
+                           'ORDER BY log_id').fetchall()
+        assert [tuple(row) for row in log] == [(held, 'expired', 'pending', 'cancelled'),
+                                               (no_show, 'no_show', 'confirmed', 'no_show'),
+                                               (staying, 'auto_checkout', 'checked_in', 'checked_out')]
+        # The no-show's room is free again, and the checked-out guest's room too
+        assert db.room_is_free(conn, 2, '2030-01-10', '2030-01-12')
+        assert conn.execute('SELECT status FROM rooms WHERE room_id = 3').fetchone()[0] == 'available'
+        # Nothing is left to do on a second run
+        assert night_audit.run_audit(conn, today=date(2030, 1, 15), pause=0) == {
+            'expired': 0, 'no_show': 0, 'auto_checkout': 0}
+    finally:
+        conn.close()
+
+def test_a_late_arrival_can_still_check_in_after_being_marked_a_no_show(database):
+    conn = db.connect()
+    try:
+        booking_id = db.create_booking(conn, _customer(1), 1, '2030-01-10', '2030-01-12', 1)
+        db.transition_bookings(conn, [booking_id], 'confirmed')
+        night_audit.run_audit(conn, today=date(2030, 1, 11), pause=0)
+        results, _, room_statuses = db.transition_bookings(conn, [booking_id], 'checked_in')
+        assert results[0]['outcome'] == 'updated' and room_statuses == {1: 'occupied'}
+    finally:
+        conn.close()
+
+def test_databases_from_before_no_shows_accept_them_after_migrating(database):
+    conn = db.connect()
+    try:
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bookings'").fetchone()[0]
+        db._widen_check(conn, 'bookings', sql.replace(", 'no_show')", ')'))
+    finally:
+        conn.close()
+
+    conn = db.connect()
+    try:
+        assert "'no_show'" not in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'bookings'").fetchone()[0]
+        db.migrate(conn)
+        booking_id = db.create_booking(conn, _customer(1), 1, '2030-01-10', '2030-01-12', 1)
+        db.transition_bookings(conn, [booking_id], 'confirmed')
+        db.transition_bookings(conn, [booking_id], 'no_show')
+        assert _statuses(conn)[booking_id] == 'no_show'
+        assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    finally:
+        conn.close()
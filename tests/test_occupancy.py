@@ -0,0 +1,154 @@
+import time
+
+import database as db
+import feed
+import occupancy
+
+def _index(stays, statuses=None):
+    index = occupancy.OccupancyIndex()
+    index._built_at = time.monotonic()
+    for room_id, status in (statuses or {1: 'available', 2: 'available'}).items():
+        index.set_room_status(room_id, status)
+    for booking_id, (room_id, check_in, check_out) in enumerate(stays, 1):
+        index.apply_booking(booking_id, room_id, check_in, check_out, 'confirmed')
+    return index
+
+def test_stays_touching_at_either_end_do_not_overlap():
+    index = _index([(1, '2030-01-10', '2030-01-12')])
+    assert index.is_available(1, '2030-01-08', '2030-01-10')
+    assert index.is_available(1, '2030-01-12', '2030-01-14')
+    assert not index.is_available(1, '2030-01-09', '2030-01-11')
+    assert not index.is_available(1, '2030-01-11', '2030-01-13')
+    assert not index.is_available(1, '2030-01-10', '2030-01-12')
+    assert not index.is_available(1, '2030-01-01', '2030-01-31')
+    assert index.is_available(2, '2030-01-10', '2030-01-12')
+
+def test_a_long_stay_blocks_gaps_between_later_short_ones():
+    # The long stay starts first, so only the running maximum of end dates sees it
+    index = _index([(1, '2030-01-01', '2030-01-20'), (1, '2030-01-05', '2030-01-06'),
+                    (1, '2030-01-10', '2030-01-11')])
+    assert not index.is_available(1, '2030-01-07', '2030-01-09')
+    assert index.is_available(1, '2030-01-20', '2030-01-21')
+
+def test_cancelled_and_checked_out_stays_release_the_room():
+    index = _index([(1, '2030-01-10', '2030-01-12'), (1, '2030-01-12', '2030-01-14')])
+    index.apply_booking(1, 1, '2030-01-10', '2030-01-12', 'cancelled')
+    assert index.is_available(1, '2030-01-10', '2030-01-12')
+    index.apply_booking(2, 1, '2030-01-12', '2030-01-14', 'checked_out')
+    assert index.is_available(1, '2030-01-10', '2030-01-14')
+    # Moving a stay releases its old nights
+    index.apply_booking(3, 1, '2030-01-10', '2030-01-11', 'confirmed')
+    index.apply_booking(3, 1, '2030-01-20', '2030-01-21', 'confirmed')
+    assert index.is_available(1, '2030-01-10', '2030-01-11')
+    assert not index.is_available(1, '2030-01-20', '2030-01-21')
+
+def test_rooms_under_maintenance_unknown_or_deleted_are_not_available():
+    index = _index([(1, '2030-01-10', '2030-01-12')], {1: 'available', 2: 'maintenance'})
+    assert not index.is_available(2, '2030-01-01', '2030-01-02')
+    assert not index.is_available(3, '2030-01-01', '2030-01-02')
+    index.remove_room(1)
+    assert not index.is_available(1, '2030-02-01', '2030-02-02')
+
+def _customer(n):
+    return {'first_name': 'Guest', 'last_name': str(n), 'email': f'guest{n}@example.com', 'phone': '555'}
+
+class _SlowConnection:
+    """Connection that lets another process book a room while the index is reading"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *args):
+        rows = self.conn.execute(sql, *args)
+        if 'FROM bookings' in sql:
+            other = db.connect()
+            db.create_booking(other, _customer(99), 1, '2030-03-01', '2030-03-05', 1)
+            other.close()
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def test_changes_committed_during_a_rebuild_are_followed_afterwards(database):
+    index = occupancy.OccupancyIndex()
+    conn = db.connect()
+    try:
+        index.build(_SlowConnection(conn))
+        # The build read one snapshot, from before the booking
+        assert index.is_available(1, '2030-03-02', '2030-03-03')
+        index.follow(conn)
+        assert not index.is_available(1, '2030-03-02', '2030-03-03')
+    finally:
+        conn.close()
+
+def test_changes_made_by_other_processes_are_followed(database):
+    index = occupancy.OccupancyIndex()
+    conn, other = db.connect(), db.connect()
+    try:
+        index.build(conn)
+        booking_id = db.create_booking(other, _customer(1), 1, '2030-04-01', '2030-04-03', 1)
+        db.transition_bookings(other, [booking_id], 'cancelled')
+        db.create_booking(other, _customer(2), 2, '2030-04-01', '2030-04-03', 1)
+        other.execute("UPDATE rooms SET status = 'maintenance' WHERE room_id = 3")
+        other.execute('DELETE FROM rooms WHERE room_id = 4')
+        feed.rooms_changed(other, [(3, 'maintenance'), (4, None)])
+        other.commit()
+
+        index.follow(conn)
+        assert index.is_available(1, '2030-04-01', '2030-04-03')
+        assert not index.is_available(2, '2030-04-02', '2030-04-04')
+        assert not index.is_available(3, '2030-04-01', '2030-04-03')
+        assert not index.is_available(4, '2030-04-01', '2030-04-03')
+    finally:
+        conn.close()
+        other.close()
+
+def test_an_index_that_missed_pruned_events_is_rebuilt(database):
+    index = occupancy.OccupancyIndex()
+    conn = db.connect()
+    try:
+        index.build(conn)
+        db.create_booking(conn, _customer(1), 1, '2030-04-01', '2030-04-03', 1)
+        db.create_booking(conn, _customer(2), 2, '2030-04-01', '2030-04-03', 1)
+        conn.execute('DELETE FROM availability_events WHERE event_id = (SELECT MIN(event_id) FROM availability_events)')
+        conn.commit()
+        index.follow(conn)
+        assert not index.is_available(1, '2030-04-01', '2030-04-03')
+        assert not index.is_available(2, '2030-04-01', '2030-04-03')
+    finally:
+        conn.close()
+
+def test_stale_rebuilds_run_in_the_background(database):
+    index = occupancy.OccupancyIndex(rebuild_interval=0)
+    index.refresh_if_stale(db.connect)
+    first_build = index._built_at
+    index.refresh_if_stale(db.connect)
+    # The caller does not wait; the index is rebuilt shortly after
+    deadline = time.monotonic() + 5
+    while index._built_at == first_build and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index._built_at != first_build
+
+
+def test_a_room_released_by_another_process_can_be_booked(client, monkeypatch):
+    monkeypatch.setattr(feed, 'POLL_INTERVAL', 0.05)
+    server = feed.FeedServer()
+    server.start('127.0.0.1:0')
+    try:
+        booking = dict(first_name='Ann', last_name='Lee', email='ann@example.com', phone='5550100',
+                       room_id=1, check_in='2030-01-10', check_out='2030-01-12', number_of_guests=1)
+        assert '/payment/' in client.post('/book', data=booking).location
+        assert '/payment/' not in client.post('/book', data=dict(booking, email='bob@example.com')).location
+
+        # Cancelled by another worker; this process's follower picks it up
+        conn = db.connect()
+        booking_id = conn.execute('SELECT MAX(booking_id) FROM bookings').fetchone()[0]
+        db.transition_bookings(conn, [booking_id], 'cancelled')
+        conn.close()
+        deadline = time.monotonic() + 5
+        while not occupancy.index.is_available(1, '2030-01-10', '2030-01-12') and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert '/payment/' in client.post('/book', data=dict(booking, email='bob@example.com')).location
+    finally:
+        server.stop()
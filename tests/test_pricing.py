@@ -0,0 +1,52 @@
+import pytest
+
+import database as db
+import pricing
+
+def _room(conn, room_id):
+    return conn.execute('SELECT room_id, room_type, price_per_night FROM rooms WHERE room_id = ?', (room_id,)).fetchone()
+
+def test_quotes_add_up_rate_plans_and_the_rate_calendar(database):
+    conn = db.connect()
+    try:
+        room = _room(conn, 1)
+        assert pricing.quote(conn, room, '2030-06-01', '2030-06-04') == 3 * 50.0
+
+        conn.execute('''
+            INSERT INTO rate_plans (name, room_type, start_date, end_date, price_per_night, priority)
+            VALUES ('Summer', 'Single', '2030-06-02', '2030-06-10', 70, 1)
+        ''')
+        conn.execute("INSERT INTO room_rates (room_id, rate_date, price_per_night) VALUES (1, '2030-06-03', 100)")
+        conn.commit()
+        pricing.plans.invalidate()
+        # 06-01 base, 06-02 plan, 06-03 calendar
+        assert pricing.quote(conn, room, '2030-06-01', '2030-06-04') == 50.0 + 70.0 + 100.0
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize('check_out', ['2030-06-01', '2030-05-28'])
+def test_quotes_for_empty_or_reversed_stays_are_refused(database, check_out):
+    conn = db.connect()
+    try:
+        with pytest.raises(ValueError, match='must be after check-in'):
+            pricing.quote(conn, _room(conn, 1), '2030-06-01', check_out)
+        assert pricing.nightly_prices(conn, [_room(conn, 1)], '2030-06-01', -3).shape == (1, 0)
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize('check_in, check_out, message', [
+    ('2030-06-05', '2030-06-01', b'Check-out date must be after check-in date'),
+    ('2030-06-05', '2030-06-05', b'Check-out date must be after check-in date'),
+    ('06/05/2030', '2030-06-08', b'Invalid date format'),
+])
+def test_booking_forms_with_bad_stay_dates_are_sent_back(client, check_in, check_out, message):
+    response = client.post('/book', data={'first_name': 'Ann', 'last_name': 'Lee', 'email': 'ann@example.com',
+                                          'phone': '5550100', 'room_id': 1, 'check_in': check_in,
+                                          'check_out': check_out, 'number_of_guests': 1}, follow_redirects=True)
+    assert response.status_code == 200
+    assert message in response.data
+    conn = db.connect()
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0] == 0
+    finally:
+        conn.close()
@@ -0,0 +1,39 @@
+import csv
+import io
+import sqlite3
+from datetime import date, timedelta
+
+import properties
+
+CHECK_IN = (date.today() + timedelta(days=3)).isoformat()
+CHECK_OUT = (date.today() + timedelta(days=5)).isoformat()
+
+def _book(client, room_id, email, property_id=None):
+    query = {'property': property_id} if property_id else {}
+    response = client.post('/book', query_string=query, data={
+        'first_name': 'Guest', 'last_name': email.split('@')[0], 'email': email, 'phone': '5550100',
+        'room_id': room_id, 'check_in': CHECK_IN, 'check_out': CHECK_OUT, 'number_of_guests': 1})
+    assert response.status_code == 302 and '/payment/' in response.location
+
+def _first_room_id(database):
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute('SELECT MIN(room_id) FROM rooms').fetchone()[0]
+    finally:
+        conn.close()
+
+def test_export_streams_the_selected_property(database, admin, client):
+    harbour = properties.registry.register('harbour', 'Harbour Hotel')
+    admin.get('/admin', query_string={'property': 'harbour'})
+    admin.post('/admin/rooms/add', data={'room_number': 'H1', 'room_type': 'Suite', 'capacity': 2,
+                                         'price_per_night': 300, 'amenities': 'WiFi', 'description': '',
+                                         'status': 'available'})
+    _book(client, _first_room_id(database), 'main@example.com', 'main')
+    _book(client, _first_room_id(harbour['database']), 'harbour@example.com', 'harbour')
+
+    response = admin.get('/admin/export/bookings.csv', query_string={'property': 'harbour'})
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['email'] for row in rows] == ['harbour@example.com']
+
+    response = admin.get('/admin/export/bookings.json', query_string={'property': 'main'})
+    assert [row['email'] for row in response.get_json()] == ['main@example.com']
@@ -0,0 +1,69 @@
+import pytest
+
+import database as db
+import search
+
+def _book(conn, first_name, last_name, email, phone, room_id, special_requests=''):
+    customer = {'first_name': first_name, 'last_name': last_name, 'email': email, 'phone': phone}
+    return db.create_booking(conn, customer, room_id, '2030-01-10', '2030-01-12', 1, special_requests)
+
+def _ids(conn, query):
+    return [row['booking_id'] for row in search.search_bookings(conn, query)]
+
+def test_queries_become_safe_match_expressions():
+    assert search.build_match('ann lee') == '("ann" OR "ann"*) AND ("lee" OR "lee"*)'
+    assert search.build_match('ann@example.com') == '("ann example com" OR "ann example com"*)'
+    assert search.build_match('(555) 010-0') == '("5550100" OR "5550100"*)'
+    assert search.build_match('201 2030') == '("201" OR "201"*) AND ("2030" OR "2030"*)'
+    assert search.build_match('a " * -') is None
+
+@pytest.mark.parametrize('query', ['"', 'NEAR(ann lee)', 'ann OR', '*', 'lee^', 'first_name:ann', "o'brien", '(((', 'AND NOT'])
+def test_fts_syntax_in_queries_is_searched_for_not_run(database, query):
+    conn = db.connect()
+    try:
+        search.search_bookings(conn, query)
+    finally:
+        conn.close()
+
+def test_search_matches_prefixes_and_ranks_guest_details_first(database):
+    conn = db.connect()
+    try:
+        by_name = _book(conn, 'Marta', 'Quinn', 'mq@example.com', '555-010-0101', 1)
+        by_request = _book(conn, 'Olav', 'Berg', 'ob@example.com', '555-010-0202', 2, 'Cot for Marta please')
+        in_201 = _book(conn, 'Martin', 'Holm', 'mh@example.com', '555-010-0303', 3)
+
+        assert _ids(conn, 'marta') == [by_name, by_request]
+        assert len(_ids(conn, 'mart')) == 3
+        assert _ids(conn, 'marta quinn') == [by_name]
+        assert _ids(conn, '(555) 010-0202') == [by_request]
+        assert _ids(conn, 'ob@example.com') == [by_request]
+        assert _ids(conn, '201') == [in_201]
+        assert _ids(conn, 'x') == []
+    finally:
+        conn.close()
+
+def test_the_index_follows_guest_room_and_booking_changes(database):
+    conn = db.connect()
+    try:
+        booking_id = _book(conn, 'Ann', 'Lee', 'ann@example.com', '5550100', 1)
+        conn.execute("UPDATE customers SET last_name = 'Park' WHERE email = 'ann@example.com'")
+        conn.execute("UPDATE rooms SET room_number = '111' WHERE room_id = 1")
+        conn.commit()
+        assert _ids(conn, 'lee') == []
+        assert _ids(conn, 'ann park') == _ids(conn, '111') == [booking_id]
+
+        conn.execute('DELETE FROM bookings WHERE booking_id = ?', (booking_id,))
+        conn.commit()
+        assert _ids(conn, 'park') == []
+    finally:
+        conn.close()
+
+def test_the_search_api(admin, database):
+    conn = db.connect()
+    try:
+        booking_id = _book(conn, 'Ann', 'Lee', 'ann@example.com', '5550100', 1)
+    finally:
+        conn.close()
+    found = admin.get('/admin/api/search', query_string={'q': 'ann'}).get_json()['bookings']
+    assert [booking['booking_id'] for booking in found] == [booking_id]
+    assert admin.get('/admin/search', query_string={'q': 'NEAR("'}).status_code == 200
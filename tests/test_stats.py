@@ -0,0 +1,44 @@
+import database as db
+import stats
+
+def _actual(conn):
+    return {name: conn.execute(query).fetchone()[0] for name, query in stats.COUNTER_QUERIES.items()}
+
+def test_counters_follow_every_write(client, admin):
+    booking = dict(first_name='Ann', last_name='Lee', email='ann@example.com', phone='5550100',
+                   room_id=1, check_in='2030-01-10', check_out='2030-01-12', number_of_guests=1)
+    paid = int(client.post('/book', data=booking).location.rsplit('/', 1)[1])
+    client.post(f'/payment/{paid}', data={'payment_method': 'cash'})
+    client.post('/book', data=dict(booking, room_id=2))
+
+    conn = db.connect()
+    try:
+        conn.execute("UPDATE rooms SET status = 'maintenance' WHERE room_id = 3")
+        conn.execute('DELETE FROM rooms WHERE room_id = 9')
+        conn.execute("UPDATE payments SET payment_status = 'refunded' WHERE booking_id = ?", (paid,))
+        conn.execute("INSERT INTO payments (booking_id, amount, payment_method, payment_status) "
+                     "VALUES (?, 25, 'cash', 'completed')", (paid,))
+        conn.commit()
+
+        counters = stats.get_counters(conn)
+        assert counters == _actual(conn)
+        assert counters == {'total_rooms': 8, 'available_rooms': 7, 'total_bookings': 2,
+                            'pending_bookings': 1, 'total_revenue': 25.0}
+        assert stats.reconcile(conn) == {}
+    finally:
+        conn.close()
+
+    page = admin.get('/admin').data.decode()
+    assert '<p class="stat-number">8</p>' in page and '$25.00' in page
+
+def test_reconcile_fixes_drifted_counters(database):
+    conn = db.connect()
+    try:
+        conn.execute("UPDATE stats SET value = 99 WHERE name = 'total_bookings'")
+        conn.execute("DELETE FROM stats WHERE name = 'total_revenue'")
+        conn.commit()
+        assert stats.reconcile(conn) == {'total_bookings': (99, 0), 'total_revenue': (0.0, 0)}
+        assert stats.get_counters(conn) == _actual(conn)
+        assert stats.reconcile(conn) == {}
+    finally:
+        conn.close()
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+import throttle
+
+def test_a_full_limiter_queues_then_sheds():
+    limiter = throttle.Limiter(1, 1, 5)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold():
+        with limiter.slot():
+            holding.set()
+            release.wait(5)
+
+    def wait_in_queue():
+        with limiter.slot():
+            pass
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holding.wait(5)
+    queued = threading.Thread(target=wait_in_queue)
+    queued.start()
+    while limiter.stats()['waiting'] < 1:
+        pass
+
+    # One running and one waiting: the next caller is turned away at once
+    with pytest.raises(throttle.Overloaded):
+        with limiter.slot():
+            pass
+    release.set()
+    holder.join(5)
+    queued.join(5)
+    stats = limiter.stats()
+    assert (stats['admitted'], stats['queued'], stats['shed'], stats['active']) == (2, 1, 1, 0)
+
+def test_callers_that_wait_too_long_are_shed():
+    limiter = throttle.Limiter(1, 4, 0.05)
+    with limiter.slot():
+        with pytest.raises(throttle.Overloaded):
+            with limiter.slot():
+                pass
+    assert limiter.stats()['timed_out'] == 1
+
+def test_limits_leave_threads_free_for_other_requests(monkeypatch):
+    monkeypatch.setattr(throttle, 'search_limiter', throttle.search_limiter)
+    monkeypatch.setattr(throttle, 'booking_limiter', throttle.booking_limiter)
+    throttle.configure(8)
+    assert (throttle.search_limiter.max_concurrent, throttle.search_limiter.max_queue) == (4, 2)
+    assert (throttle.booking_limiter.max_concurrent, throttle.booking_limiter.max_queue) == (2, 2)
+    throttle.configure(1)
+    assert throttle.search_limiter.max_concurrent == throttle.booking_limiter.max_concurrent == 1
+
+def test_shed_searches_get_a_503_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(throttle, 'search_limiter', throttle.Limiter(1, 0, 0))
+    with throttle.search_limiter.slot():
+        response = client.post('/check_availability', data={'check_in': '2030-01-10', 'check_out': '2030-01-12'})
+    assert response.status_code == 503
+    assert 'error' in response.get_json()
+    assert response.headers['Retry-After'] == str(throttle.RETRY_AFTER)
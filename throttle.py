@@ -0,0 +1,142 @@
+"""
+Load control - single-flight coalescing of identical work and bounded
+concurrency with load shedding
+"""
+
+import threading
+from contextlib import contextmanager
+
+# Availability searches computed at once, searches allowed to wait for a
+# slot, and how long they may wait (seconds) before being shed, when the
+# server's thread count is unknown (e.g. the development server)
+SEARCH_MAX_CONCURRENT = 8
+SEARCH_MAX_QUEUE = 64
+SEARCH_QUEUE_TIMEOUT = 2.0
+
+# Bookings write under one lock anyway, so only a few run at once
+BOOK_MAX_CONCURRENT = 4
+BOOK_MAX_QUEUE = 32
+BOOK_QUEUE_TIMEOUT = 2.0
+
+# Under gunicorn, configure() sizes both limiters from the worker's thread
+# count instead: searches may run on this share of the threads and bookings
+# on this share, with this share again waiting for each, so neither can tie
+# up every thread and the rest keep serving other pages
+SEARCH_THREAD_SHARE = 0.5
+BOOK_THREAD_SHARE = 0.25
+QUEUE_THREAD_SHARE = 0.25
+
+# Seconds clients are told to wait after a 503
+RETRY_AFTER = 1
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of queued"""
+
+class SingleFlight:
+    """Concurrent calls with the same key share one computation"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {'leaders': 0, 'coalesced': 0}
+
+    def do(self, key, fn):
+        """fn()'s result, computed once for every caller that arrives while it runs"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = {'done': threading.Event()}
+                self._counters['leaders'] += 1
+                leader = True
+            else:
+                self._counters['coalesced'] += 1
+                leader = False
+
+        if not leader:
+            call['done'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._calls)
+            return stats
+
+class Limiter:
+    """At most max_concurrent callers at a time, max_queue more waiting, the rest shed"""
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self._counters = {'admitted': 0, 'queued': 0, 'shed': 0, 'timed_out': 0}
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the duration of the block; raises Overloaded if none frees up"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._counters['shed'] += 1
+                    raise Overloaded()
+                self._waiting += 1
+                self._counters['queued'] += 1
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self._waiting -= 1
+                if not acquired:
+                    self._counters['timed_out'] += 1
+                    self._counters['shed'] += 1
+            if not acquired:
+                raise Overloaded()
+        with self._lock:
+            self._active += 1
+            self._counters['admitted'] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['active'] = self._active
+            stats['waiting'] = self._waiting
+            stats['max_concurrent'] = self.max_concurrent
+            stats['max_queue'] = self.max_queue
+            return stats
+
+searches = SingleFlight()
+search_limiter = Limiter(SEARCH_MAX_CONCURRENT, SEARCH_MAX_QUEUE, SEARCH_QUEUE_TIMEOUT)
+booking_limiter = Limiter(BOOK_MAX_CONCURRENT, BOOK_MAX_QUEUE, BOOK_QUEUE_TIMEOUT)
+
+def configure(threads):
+    """Size the limiters for a process serving requests on this many threads; call before serving"""
+    global search_limiter, booking_limiter
+    queue = max(1, int(threads * QUEUE_THREAD_SHARE))
+    search_limiter = Limiter(max(1, int(threads * SEARCH_THREAD_SHARE)), queue, SEARCH_QUEUE_TIMEOUT)
+    booking_limiter = Limiter(max(1, int(threads * BOOK_THREAD_SHARE)), queue, BOOK_QUEUE_TIMEOUT)
+
+def stats():
+    """Every counter, for the stats API and /metrics"""
+    return {'search_coalescing': searches.stats(), 'search_admission': search_limiter.stats(),
+            'booking_admission': booking_limiter.stats()}
@@ -0,0 +1,10 @@
+"""
+Production entry point - the Flask app for a WSGI server
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py prepares the database once, warms up every worker before
+it accepts connections and runs the background jobs in one worker.
+"""
+
+from app import app